@@ -0,0 +1 @@
+"""Benchmarks of SymCalc. Run ``python -m benchmarks`` from the root of the repository"""
@@ -0,0 +1,316 @@
+"""Replays the transcripts in the docstrings of :class:`DefaultCalculator` and of the default plugins, checks that the documented output is still produced, and reports the latency of each example and the throughput of the calculator. The results are written as JSON so that runs can be compared::
+
+    python -m benchmarks --repeat 5 --output before.json
+    python -m benchmarks --repeat 5 --compare before.json
+
+Each transcript is replayed in a new :class:`DefaultCalculator` with the default plugins, from a temporary working directory. A transcript only shows the output of the plugin it documents, so an example matches if its documented lines appear in order in the output of the command, ignoring whitespace. The line ``...`` in a transcript stands for any output
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import textwrap
+import time
+from typing import Any, Iterable
+
+import sympy
+from symcalc import DefaultCalculator
+from symcalc.plugins.manifest import manifest
+
+prompt = "Calculator >>> "
+"""The prompt which begins a command in a transcript"""
+
+skipped = {
+    "AddFactorDB": "queries factordb.com",
+    "AddPyperclip": "uses the clipboard",
+    "PerformanceMonitor": "documents timings, which are different in every run",
+}
+"""The sources whose transcripts are not replayed, with the reason"""
+
+
+class Example:
+    """A command of a transcript and its documented output"""
+
+    def __init__(self, command: str, expected: list[str], continuation: list[str] | None = None):
+        """Initializes the example
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The command after the prompt
+        expected : :class:`list[str]`
+            The documented output of the command, without trailing whitespace
+        continuation : :class:`list[str]` | None
+            The following lines of a multi-line command, entered after ``...``
+        """
+        self.command = command
+        self.expected = expected
+        self.continuation = continuation if continuation is not None else []
+
+    def matches(self, output: list[str]) -> bool:
+        """Returns whether the documented lines appear in order in the output of the command. Whitespace is ignored, since the alignment of pretty printed output is not kept exactly in docstrings"""
+        lines = iter(" ".join(line.split()) for line in output)
+        return all(any(line == e for line in lines) for e in (" ".join(e.split()) for e in self.expected if e != "..."))
+
+    def __repr__(self) -> str:
+        return f"Example({self.command!r}, {self.expected!r})"
+
+
+class Transcript:
+    """A session documented in a ``code-block`` of a docstring"""
+
+    def __init__(self, source: str, index: int, examples: list[Example]):
+        """Initializes the transcript
+
+        Parameters
+        ----------
+        source : :class:`str`
+            The name of the class whose docstring contains the transcript
+        index : :class:`int`
+            The position of the transcript among those of the source
+        examples : :class:`list[Example]`
+            The commands of the session, in order
+        """
+        self.source = source
+        self.index = index
+        self.examples = examples
+
+    @staticmethod
+    def extract(source: str, docstring: str | None) -> list[Transcript]:
+        """Extracts the transcripts from the ``code-block`` directives of a docstring. Blocks without a prompt are ignored
+
+        Parameters
+        ----------
+        source : :class:`str`
+            The name of the class which the docstring belongs to
+        docstring : :class:`str` | None
+            The docstring
+
+        Returns
+        -------
+        :class:`list[Transcript]`
+            The transcripts, in the order they appear
+        """
+        transcripts = []
+        lines = (docstring or "").split("\n")
+        for i, directive in enumerate(lines):
+            if not directive.strip().startswith(".. code-block::"):
+                continue
+            # The block is every following line which is blank or indented further than the directive
+            indent = len(directive) - len(directive.lstrip())
+            block = []
+            for line in lines[i + 1 :]:
+                if line.strip() and len(line) - len(line.lstrip()) <= indent:
+                    break
+                block.append(line)
+            examples: list[Example] = []
+            for line in textwrap.dedent("\n".join(block)).strip("\n").split("\n"):
+                line = line.rstrip()
+                if line.startswith(prompt):
+                    examples.append(Example(line[len(prompt) :], []))
+                elif examples and not examples[-1].expected and (line.startswith("... ") or (line == "..." and examples[-1].continuation)):
+                    # A bare ``...`` is a blank continuation line only after other continuation lines, and otherwise stands for any output
+                    examples[-1].continuation.append(line[4:])
+                elif examples:
+                    examples[-1].expected.append(line)
+            for example in examples:
+                while example.expected and not example.expected[-1]:
+                    example.expected.pop()
+            if examples:
+                transcripts.append(Transcript(source, len(transcripts), examples))
+        return transcripts
+
+    @staticmethod
+    def collect(sources: Iterable[str] | None = None) -> list[Transcript]:
+        """Extracts the transcripts of :class:`DefaultCalculator` and of the plugins in the manifest, except those in :data:`skipped`
+
+        Parameters
+        ----------
+        sources : Iterable[:class:`str`] | None
+            The names of the classes to extract from, or ``None`` for all of them
+
+        Returns
+        -------
+        :class:`list[Transcript]`
+            The transcripts
+        """
+        docstrings = [("DefaultCalculator", DefaultCalculator.__doc__)] + [(entry.name, entry.load().__doc__) for entry in manifest]
+        wanted = set(sources) if sources is not None else None
+        transcripts = []
+        for source, docstring in docstrings:
+            if source in skipped or (wanted is not None and source not in wanted):
+                continue
+            transcripts += Transcript.extract(source, docstring)
+        return transcripts
+
+    def replay(self) -> list[tuple[list[str], int]]:
+        """Replays the transcript in a new calculator with the default plugins
+
+        Returns
+        -------
+        :class:`list[tuple[list[str], int]]`
+            The output lines of each example, and the time taken by the example in ns
+        """
+        calc = DefaultCalculator().register_default_plugins()
+        results = []
+        for example in self.examples:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                start = time.perf_counter_ns()
+                calc.command(example.command)
+                for line in example.continuation:
+                    calc.command(line)
+                duration = time.perf_counter_ns() - start
+            results.append(([line.rstrip() for line in output.getvalue().rstrip().split("\n")] if output.getvalue().strip() else [], duration))
+        return results
+
+
+def run(transcripts: list[Transcript], repeat: int = 5) -> dict[str, Any]:
+    """Replays each transcript ``repeat`` times and records the latency of every example
+
+    Parameters
+    ----------
+    transcripts : :class:`list[Transcript]`
+        The transcripts to replay
+    repeat : :class:`int`
+        The number of times to replay each transcript. The output of the first replay is checked
+
+    Returns
+    -------
+    :class:`dict[str, Any]`
+        The results, which can be written as JSON. See :func:`main`
+    """
+    sympy.init_printing(wrap_line=False)
+    examples = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for transcript in transcripts:
+                runs = [transcript.replay() for i in range(repeat)]
+                for i, example in enumerate(transcript.examples):
+                    output = runs[0][i][0]
+                    durations = [r[i][1] for r in runs]
+                    examples.append(
+                        {
+                            "source": transcript.source,
+                            "transcript": transcript.index,
+                            "command": example.command,
+                            "match": example.matches(output),
+                            "expected": example.expected,
+                            "output": output,
+                            "durations": durations,
+                            "median": int(statistics.median(durations)),
+                            "min": min(durations),
+                        }
+                    )
+        finally:
+            os.chdir(cwd)
+    total = sum(e["median"] for e in examples)
+    return {
+        "time": datetime.datetime.now().astimezone().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sympy": sympy.__version__,
+        "repeat": repeat,
+        "examples": examples,
+        "summary": {
+            "examples": len(examples),
+            "matched": sum(e["match"] for e in examples),
+            "total": total,
+            "throughput": len(examples) / (total / 1e9) if total else 0.0,
+        },
+    }
+
+
+def git_commit() -> str | None:
+    """Returns the commit of the repository which is being benchmarked, or ``None`` if it is unknown"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_duration(ns: float) -> str:
+    """Formats a duration in ns with 3 significant figures"""
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.3g} {unit}"
+    return f"{ns:.3g} ns"
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None = None) -> list[str]:
+    """Formats the results as a table, with the change of each median latency from a baseline
+
+    Parameters
+    ----------
+    results : :class:`dict[str, Any]`
+        The results of :func:`run`
+    baseline : :class:`dict[str, Any]` | None
+        Earlier results to compare against. Examples are matched by their source, transcript, and command
+
+    Returns
+    -------
+    :class:`list[str]`
+        The lines of the report
+    """
+    before = {}
+    if baseline is not None:
+        before = {(e["source"], e["transcript"], e["command"]): e["median"] for e in baseline["examples"]}
+    lines = []
+    for e in results["examples"]:
+        change = ""
+        old = before.get((e["source"], e["transcript"], e["command"]))
+        if old:
+            change = f" ({(e['median'] - old) / old:+.1%})"
+        status = "ok" if e["match"] else "MISMATCH"
+        lines.append(f"{status:8} {e['source']}[{e['transcript']}] `{e['command']}`: median {format_duration(e['median'])}{change}, min {format_duration(e['min'])}")
+    summary = results["summary"]
+    lines.append(f"{summary['matched']}/{summary['examples']} examples matched")
+    throughput = f"{summary['throughput']:.1f} commands/s"
+    if baseline is not None and baseline["summary"]["throughput"]:
+        throughput += f" ({summary['throughput'] / baseline['summary']['throughput'] - 1:+.1%} from {baseline.get('commit') or 'baseline'})"
+    lines.append(f"Total median latency {format_duration(summary['total'])}, throughput {throughput}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the benchmarks from the command line
+
+    The results are a JSON object with the ``time`` of the run, the git ``commit``, the ``python`` and ``sympy`` versions, the number of times each transcript was replayed as ``repeat``, a ``summary``, and the ``examples``. Each example has its ``source`` and ``transcript``, the ``command``, whether the output was a ``match``, the ``expected`` and the actual ``output``, and its ``durations``, ``median`` and ``min`` in ns
+
+    Returns
+    -------
+    :class:`int`
+        ``1`` if ``--check`` was given and an example did not match, ``0`` otherwise
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Replay the documented examples of SymCalc and report their latency")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="the number of times to replay each transcript")
+    parser.add_argument("-o", "--output", help="the path to write the results to as JSON")
+    parser.add_argument("-c", "--compare", help="the path of earlier results to compare against")
+    parser.add_argument("-s", "--source", action="append", help="only replay the transcripts of this class, can be repeated")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if an example does not match its documented output")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = run(Transcript.collect(args.source), args.repeat)
+    for line in report(results, baseline):
+        print(line)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.check and results["summary"]["matched"] != results["summary"]["examples"]:
+        return 1
+    return 0
@@ -1,10 +1,33 @@
 """SymCalc is a symbolic calculator built purely in Python on top of the SymPy library. """
 
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from .calc import Calculator
 from .command import CalculatorCommand
 from .context import CalculatorContext
 from .defaultcalc import DefaultCalculator
 from .plugin import CalculatorPlugin
+from .result import CalculatorResult
+
+if TYPE_CHECKING:
+    from .metrics import CalculatorMetrics
+    from .worker import CalculatorWorker, CalculatorZygote
+
+lazy_exports = {"CalculatorMetrics": ".metrics", "CalculatorWorker": ".worker", "CalculatorZygote": ".worker"}
+"""The exports which are only imported when first used, keyed by name, with the module which defines them. Keeps their dependencies out of the start of the calculator"""
+
+
+def __getattr__(name: str) -> Any:
+    if name not in lazy_exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(lazy_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *lazy_exports])
 
 
 def use():
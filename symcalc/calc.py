@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import ast
 import code
+import contextlib
+import ctypes
+import functools
+import inspect
+import io
+import numbers
+import sys
+import threading
+import time
+import tokenize
 import traceback
-from collections import defaultdict
-from typing import Any, Callable, NoReturn
+import types
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, Callable, Iterable, NoReturn
 
 import sympy
 
+if TYPE_CHECKING:
+    import asyncio
+
 
 class Calculator:  # type: ignore
     pass
@@ -15,11 +31,142 @@ class Calculator:  # type: ignore
 from .command import CalculatorCommand
 from .context import CalculatorContext
 from .plugin import CalculatorPlugin
+from .result import CalculatorResult
+
+
+def timed(phase: str):
+    """A decorator to record the inclusive time spent in a phase of the interaction in :attr:`CalculatorResult.timings`, and to record the phase as a span in :attr:`CalculatorResult.spans`"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self: Calculator, *args, **kwargs):
+            result = self.result
+            if result is None:
+                return func(self, *args, **kwargs)
+            with result.span(phase, "phase"):
+                start = time.perf_counter_ns()
+                try:
+                    return func(self, *args, **kwargs)
+                finally:
+                    result.timings[phase] += time.perf_counter_ns() - start
+
+        return wrapper
+
+    return decorator
+
+
+_missing = object()
+_no_span = contextlib.nullcontext()
 
 
 class Calculator:
     """An interactive console containing plugins and the console"""
 
+    class Settings(dict):
+        """The settings of a :class:`Calculator`. Any change to the settings invalidates the plugin dispatch tables of the calculator"""
+
+        def __init__(self, calc: Calculator):
+            super().__init__()
+            self.calc = calc
+
+        def __setitem__(self, key: str, value: bool) -> None:
+            if key not in self or self[key] != value:
+                self.calc.dispatch_tables.clear()
+            super().__setitem__(key, value)
+
+        def __delitem__(self, key: str) -> None:
+            super().__delitem__(key)
+            self.calc.dispatch_tables.clear()
+
+        def __ior__(self, other):
+            self.update(other)
+            return self
+
+        def update(self, *args, **kwargs) -> None:
+            super().update(*args, **kwargs)
+            self.calc.dispatch_tables.clear()
+
+        def setdefault(self, key: str, default: bool | None = None):
+            if key not in self:
+                self.calc.dispatch_tables.clear()
+            return super().setdefault(key, default)  # type: ignore
+
+        def pop(self, *args):
+            self.calc.dispatch_tables.clear()
+            return super().pop(*args)
+
+        def popitem(self):
+            self.calc.dispatch_tables.clear()
+            return super().popitem()
+
+        def clear(self) -> None:
+            super().clear()
+            self.calc.dispatch_tables.clear()
+
+    class DisplayHook:
+        """Replacement for :func:`sys.displayhook` while calculators are interpreting code. Dispatches to the calculator interpreting code in the current thread, so that multiple calculators can interpret code in different threads at once"""
+
+        def __init__(self):
+            self.local = threading.local()
+            self.lock = threading.Lock()
+            self.active = 0
+            self.original = sys.displayhook
+            """The display hook which was replaced, used to display values outside of the calculators"""
+
+        def __call__(self, value: Any) -> None:
+            calc = getattr(self.local, "calc", None)
+            if calc is None:
+                self.original(value)
+            else:
+                calc.handle_display(value)
+
+        def push(self, calc: Calculator) -> Calculator | None:
+            """Installs the hook if needed, and dispatches to the given calculator in the current thread. Returns the calculator that was previously dispatched to in the current thread"""
+            with self.lock:
+                if self.active == 0:
+                    self.original = sys.displayhook
+                self.active += 1
+                sys.displayhook = self
+            previous = getattr(self.local, "calc", None)
+            self.local.calc = calc
+            return previous
+
+        def pop(self, previous: Calculator | None) -> None:
+            """Restores the calculator that was previously dispatched to in the current thread, and the replaced display hook once no calculators are interpreting code"""
+            self.local.calc = previous
+            with self.lock:
+                self.active -= 1
+                if self.active == 0:
+                    sys.displayhook = self.original
+
+    display_hook = DisplayHook()
+    """The display hook shared by all calculators"""
+
+    class CallableInfo:
+        """Describes how a value of the calculator context can be called, as returned by :meth:`Calculator.inspect_callable`"""
+
+        def __init__(self, value: Any):
+            """Inspects the given value
+
+            Parameters
+            ----------
+            value : Any
+                The value to inspect
+            """
+            self.function_class = isinstance(value, sympy.core.function.FunctionClass)
+            """Whether the value is an undefined or applied SymPy function, such as :class:`sympy.sin`"""
+            self.number = isinstance(value, numbers.Number | sympy.core.Expr)
+            """Whether the value is a number or a SymPy expression, which is multiplied instead of called"""
+            self.spec: inspect.FullArgSpec | None = None
+            """The argument specification of the value, or ``None`` if it is not callable or cannot be inspected"""
+            if callable(value):
+                try:
+                    self.spec = inspect.getfullargspec(value)
+                except TypeError:
+                    pass
+            self.unary = self.function_class or self.spec is not None and (len(self.spec.args) == 1 or (not self.spec.args and self.spec.varargs is not None))
+            """Whether the value is a function of a single variable"""
+
     def __init__(self, context: CalculatorContext | None = None, directive_prefix: str = "/"):
         """Initializes the calculator
 
@@ -34,21 +181,54 @@ class Calculator:
         self.context = context if context is not None else CalculatorContext()
         # Settings
         self.directive_prefix = directive_prefix
-        self.settings: dict[str, bool] = {}
+        self.dispatch_tables: dict[tuple[str, ...], list[CalculatorPlugin]] = {}
+        self.settings: dict[str, bool] = Calculator.Settings(self)
         self.context.settings = self.settings
         # Command storage
         self.queued_commands: list[str] = []
         self.current_command = None
         self.incomplete_command = None
+        # Structured output
+        self.result: CalculatorResult | None = None
+        """The result of the current or most recent interaction"""
+        self.silent = False
+        """Whether output is only recorded in :attr:`Calculator.result` instead of also being printed"""
+        self.displayhook = sys.displayhook
         # Prepare the calculator interperter
         self.console = code.InteractiveConsole(self.context.__dict__)
         self.console.write = self.handle_error_output
+        self.code_cache: OrderedDict[tuple[str, int], types.CodeType] = OrderedDict()
+        """The most recently compiled code, keyed by the source and the compiler flags"""
+        self.code_cache_size = 256
+        """The maximum number of compiled code objects to keep in :attr:`Calculator.code_cache`"""
+        # Versioned index of the calculator context
+        self.symbol_index: dict[str, Any] = {k: v for k, v in self.context.__dict__.items() if k != "_"}
+        """The bindings of the calculator context as of :attr:`Calculator.context_version`, except for ``_``. Should not be modified"""
+        self._context_version = 0
+        self.callable_cache: OrderedDict[int, tuple[Any, Calculator.CallableInfo]] = OrderedDict()
+        """The most recently inspected values of :meth:`Calculator.inspect_callable`, keyed by identity. Cleared when :attr:`Calculator.context_version` changes"""
+        self.callable_cache_size = 1024
+        """The maximum number of values to keep in :attr:`Calculator.callable_cache`"""
+        self.callable_cache_version = self._context_version
+        """The :attr:`Calculator.context_version` which :attr:`Calculator.callable_cache` was filled at"""
+        # Asynchronous execution
+        self.executor: Executor | None = None
+        """The executor which runs the commands of :meth:`Calculator.acommand` and :meth:`Calculator.aevaluate`. ``None`` uses the default executor of the event loop"""
+        self.async_lock: asyncio.Lock | None = None
+        self.interrupt_grace = 1.0
+        """The number of seconds :meth:`Calculator.acommand` and :meth:`Calculator.aevaluate` wait for a command to stop once it is interrupted. Only Python code can be interrupted, so a command still running after the grace period, such as a long computation in C, is abandoned: the error is raised, and the next command waits for the abandoned one to finish"""
+        self.interrupt_lock = threading.Lock()
+        self.interrupt_thread: int | None = None
+        self.interrupted_command: CalculatorCommand | None = None
         # Strict Python mode
         self.strict_python = False
         # List of plugins and directives
         self.plugin_priorities = defaultdict(list)
         self.plugins = []
         self.directives: dict[str, Callable[[Calculator, str], None]] = {}
+        # Pipeline counters
+        self.counters: defaultdict[str, int] = defaultdict(int)
+        """The work done by the pipeline during the session. See :meth:`Calculator.count`"""
 
     def handle_error_output(self, data: str) -> None:
         """Method for handling stderr output written to the console interpreter. The data is generally passed to plugins.
@@ -75,8 +255,86 @@ class Calculator:
         if self.current_command.abort or self.current_command.resend_command:
             return
         if self.current_command.print_error:
+            self.write_error(data)
+
+    def handle_output(self, data: str) -> None:
+        """Method for handling output written by the calculator and its plugins. The data is recorded in :attr:`Calculator.result` and printed unless the calculator is silent
+
+        Parameters
+        ----------
+        data : :class:`str`
+            The line of output, without a trailing newline
+        """
+        if self.result is not None:
+            self.result.output.append(data)
+        if not self.silent:
+            print(data)
+
+    def handle_warning(self, data: str) -> None:
+        """Method for handling warnings and reminders written by plugins. The data is recorded in :attr:`Calculator.result` and printed unless the calculator is silent
+
+        Parameters
+        ----------
+        data : :class:`str`
+            The warning, without a trailing newline
+        """
+        if self.result is not None:
+            self.result.warnings.append(data)
+        if not self.silent:
+            print(data)
+
+    def write_error(self, data: str) -> None:
+        """Records the error in :attr:`Calculator.result` and prints it unless the calculator is silent
+
+        Parameters
+        ----------
+        data : :class:`str`
+            The error, including any trailing newline
+        """
+        if self.result is not None:
+            self.result.errors.append(data)
+        if not self.silent:
             print(data, end="")
 
+    def write_plugin_exception(self, message: str, plugin: CalculatorPlugin | None = None) -> None:
+        """Records the exception currently being handled along with a message describing the failing plugin, and counts it as ``"plugin_error"``
+
+        Parameters
+        ----------
+        message : :class:`str`
+            The message to output after the traceback
+        plugin : :class:`CalculatorPlugin` | None
+            The failing plugin, whose errors are also counted as ``"plugin_error.<plugin>"``
+        """
+        self.count("plugin_error")
+        if plugin is not None:
+            self.count(f"plugin_error.{plugin.name}")
+        if self.silent:
+            if self.result is not None:
+                self.result.errors.append(traceback.format_exc())
+        else:
+            traceback.print_exc()
+        self.handle_output(message)
+
+    def handle_display(self, value: Any) -> None:
+        """Replacement for :func:`sys.displayhook` while the calculator is interpreting code. Records the displayed value as ``_`` in the calculator context before passing it to the original hook
+
+        Parameters
+        ----------
+        value : Any
+            The value to display
+        """
+        if value is None:
+            return
+        if self.result is not None:
+            self.result.value = value
+        if self.current_command is not None:
+            self.current_command.value = value
+        self.context.__dict__["_"] = value
+        if self.silent:
+            return
+        self.displayhook(value)
+
     def register_plugin(self, plugin: CalculatorPlugin) -> Calculator:
         """
         Register the given plugin
@@ -93,13 +351,133 @@ class Calculator:
         """
         self.plugin_priorities[plugin.priority].append(plugin)
         plugin.hook(self)
+        self.check_bindings()
         self.plugins: list[CalculatorPlugin] = []
         keys = list(self.plugin_priorities.keys())
         keys.sort()
         for k in keys:
             self.plugins.extend(self.plugin_priorities[k])
+        self.dispatch_tables.clear()
         return self
 
+    def get_dispatch(self, *hooks: str) -> list[CalculatorPlugin]:
+        """Gets the plugins, in order of priority, which should be notified of an event. Plugins which do not override any of the given hooks or whose toggles are disabled are skipped. The table is cached until a plugin is registered or a setting changes
+
+        Parameters
+        ----------
+        *hooks : :class:`str`
+            The names of the :class:`CalculatorPlugin` methods called for the event
+
+        Returns
+        -------
+        :class:`list[CalculatorPlugin]`
+            The plugins to notify
+        """
+        plugins = self.dispatch_tables.get(hooks)
+        if plugins is None:
+            plugins = self.dispatch_tables[hooks] = [plugin for plugin in self.plugins if any(self.should_dispatch(plugin, hook) for hook in hooks)]
+        return plugins
+
+    def should_dispatch(self, plugin: CalculatorPlugin, hook: str) -> bool:
+        """Checks whether the plugin overrides the given hook and whether the toggles guarding it are enabled
+
+        Parameters
+        ----------
+        plugin : :class:`CalculatorPlugin`
+            The plugin to check
+        hook : :class:`str`
+            The name of the :class:`CalculatorPlugin` method
+
+        Returns
+        -------
+        :class:`bool`
+            Whether calling the hook could have an effect
+        """
+        func = getattr(plugin, hook)
+        func = getattr(func, "__func__", func)
+        if func is getattr(CalculatorPlugin, hook):
+            return False
+        if not hasattr(func, "toggle_settings"):
+            return True
+        settings = func.toggle_settings if func.toggle_settings is not None else (plugin.setting_name,)
+        # Unregistered toggles are dispatched so that the plugin reports the error itself
+        return all(s not in self.settings or self.settings[s] for s in settings)
+
+    def span(self, name: str, category: str, detail: str | None = None) -> CalculatorResult.Span | contextlib.nullcontext:
+        """Creates a span in :attr:`Calculator.result` to record a part of the interaction, or a context manager which does nothing if there is no result. See :class:`CalculatorResult.Span`
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the span
+        category : :class:`str`
+            The kind of span
+        detail : :class:`str` | None
+            Additional information about the span
+        """
+        result = self.result
+        return _no_span if result is None else result.span(name, category, detail)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Increments a counter of :attr:`Calculator.counters` for the session, and of :attr:`CalculatorResult.counters` for the current interaction if there is one
+
+        The calculator counts the following, some of which are also counted for the plugin responsible as ``"<counter>.<plugin>"``:
+
+        - ``"compile_command"``: compiles with :func:`code.compile_command`, of which the trial compiles of plugins with :meth:`Calculator.compile_command` are also counted per plugin
+        - ``"resend"``: resends of a command to the plugins
+        - ``"ast.parse"``, ``"ast.unparse"`` and ``"symtable"``: conversions done by :class:`CalculatorCommand`
+        - ``"ast.transform"``: passes over the AST by :meth:`CalculatorPlugin.transform_command`
+        - ``"ast.commit"``: transformed trees committed to the command, each of which is unparsed again when the plaintext command is next read
+        - ``"interpret"``: lines run with :meth:`Calculator.interpret`, also counted per plugin
+        - ``"code_cache.hit"`` and ``"code_cache.miss"``: lookups of :attr:`Calculator.code_cache`
+        - ``"plugin_error"``: exceptions raised by plugins, also counted per plugin
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the counter
+        n : :class:`int`
+            The amount to add
+        """
+        self.counters[name] += n
+        result = self.result
+        if result is not None:
+            result.counters[name] += n
+
+    def active_plugin(self) -> str | None:
+        """Returns the name of the plugin whose hook is currently running, or ``None`` if the calculator is not calling a plugin or there is no result recording spans"""
+        result = self.result
+        if result is None:
+            return None
+        for span in reversed(result.active_spans):
+            if span.category not in ("phase", "statement"):
+                return span.name
+        return None
+
+    def compile_command(self, source: str) -> types.CodeType | None:
+        """Compiles a command with :func:`code.compile_command`, and counts the attempt as ``"compile_command"``. Plugins should use this for trial compiles so that the attempts are attributed to them
+
+        Parameters
+        ----------
+        source : :class:`str`
+            The source of the command
+
+        Returns
+        -------
+        :class:`types.CodeType` | None
+            The compiled code, or ``None`` if the command is incomplete
+
+        Raises
+        ------
+        :class:`SyntaxError`
+            If the command is invalid
+        """
+        self.count("compile_command")
+        plugin = self.active_plugin()
+        if plugin is not None:
+            self.count(f"compile_command.{plugin}")
+        return code.compile_command(source)
+
     def register_directive(self, name: str, callback: Callable[[Calculator, str], None]) -> None:
         """Register a directive
 
@@ -119,6 +497,7 @@ class Calculator:
             raise ValueError(f"{name} is already a directive in this calculator")
         self.directives[name] = callback
 
+    @timed("begin_interaction")
     def notify_plugins_begin_interaction(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of the beginning of an interaction
 
@@ -127,22 +506,23 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("begin_interaction"):
             try:
-                plugin.begin_interaction(command_data)
+                with self.span(plugin.name, "begin_interaction"):
+                    plugin.begin_interaction(command_data)
                 if command_data == "" or command_data.command is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after interaction initialization. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after interaction initialization. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during interaction initialization. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during interaction initialization. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 self.notify_plugins_fail(command_data)
                 return
 
+    @timed("parse")
     def notify_plugins_parse(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of a command to be parsed
 
@@ -151,21 +531,22 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("parse_command"):
             try:
-                plugin.parse_command(command_data)
+                with self.span(plugin.name, "parse_command"):
+                    plugin.parse_command(command_data)
                 if command_data == "" or command_data.command is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after parsing. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after parsing. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during parsing. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during parsing. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 return
 
+    @timed("handle")
     def notify_plugins_command(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of a command to be processed
 
@@ -174,21 +555,42 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        transformers = self.get_dispatch("transform_command")
+        handlers = self.get_dispatch("handle_command")
+        tree = None
+        for plugin in self.get_dispatch("transform_command", "handle_command"):
             try:
-                plugin.handle_command(command_data)
+                if plugin in transformers:
+                    # Chain the transformations on the same tree
+                    if tree is None:
+                        tree = command_data.command_ast
+                    with self.span(plugin.name, "transform_command"):
+                        transformed = plugin.transform_command(command_data, tree)
+                    self.count("ast.transform")
+                    if transformed is not None:
+                        tree = transformed
+                if plugin in handlers:
+                    if tree is not None:
+                        self.count("ast.commit")
+                        command_data.command_ast = ast.fix_missing_locations(tree)
+                        tree = None
+                    with self.span(plugin.name, "handle_command"):
+                        plugin.handle_command(command_data)
                 if command_data == "" or command_data.command is None or command_data.command_ast is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after processing. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after processing. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during processing. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during processing. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 return
+        if tree is not None:
+            self.count("ast.commit")
+            command_data.command_ast = ast.fix_missing_locations(tree)
 
+    @timed("resend")
     def notify_plugins_resend(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of a resent command to be processed
 
@@ -197,21 +599,77 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        self.count("resend")
+        for plugin in self.get_dispatch("handle_resend"):
             try:
-                plugin.handle_resend(command_data)
+                with self.span(plugin.name, "handle_resend"):
+                    plugin.handle_resend(command_data)
                 if command_data == "" or command_data.command is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after resend processing. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after resend processing. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during resend processing. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during resend processing. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 return
 
+    @timed("repair")
+    def notify_plugins_repair(self, command_data: CalculatorCommand) -> None:
+        """Notify all plugins of each token of a command with invalid syntax to repair any implicit syntax in a single pass. Sets :attr:`CalculatorCommand.resend_command` if the command was changed
+
+        Parameters
+        ----------
+        command_data : :class:`CalculatorCommand`
+            The command which triggered this event
+        """
+        plugins = self.get_dispatch("repair_token")
+        if not plugins:
+            return
+        source = command_data.command
+        try:
+            tokens = [t for t in tokenize.generate_tokens(io.StringIO(source).readline) if t.type != tokenize.ERRORTOKEN or not t.string.isspace()]
+        except (tokenize.TokenError, SyntaxError):
+            return
+        offsets = [0]
+        for line in source.splitlines(keepends=True):
+            offsets.append(offsets[-1] + len(line))
+        repaired = []
+        position = 0
+        index = 0
+        while index < len(tokens):
+            repair = None
+            for plugin in plugins:
+                try:
+                    with self.span(plugin.name, "repair_token"):
+                        repair = plugin.repair_token(command_data, tokens, index)
+                except AssertionError:
+                    raise
+                except Exception:
+                    self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during syntax repair. Aborting command.", plugin)
+                    command_data.abort = True
+                if command_data.abort:
+                    return
+                if repair is not None:
+                    break
+            if repair is None:
+                index += 1
+                continue
+            text, count = repair
+            count = max(count, 1)
+            start = tokens[index].start
+            end = tokens[min(index + count, len(tokens)) - 1].end
+            repaired.append(source[position : offsets[start[0] - 1] + start[1]])
+            repaired.append(text)
+            position = offsets[end[0] - 1] + end[1]
+            index += count
+        repaired.append(source[position:])
+        if (command := "".join(repaired)) != source:
+            command_data.command = command
+            command_data.resend_command = True
+
+    @timed("syntax_error")
     def notify_plugins_syntax_error(self, command_data: CalculatorCommand, data: str, exc: SyntaxError) -> None:
         """Notify all plugins of a syntax error
 
@@ -220,18 +678,18 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("handle_syntax_error_obj", "handle_syntax_error"):
             try:
-                plugin.handle_syntax_error_obj(command_data, exc)
-                plugin.handle_syntax_error(command_data, data)
+                with self.span(plugin.name, "handle_syntax_error"):
+                    plugin.handle_syntax_error_obj(command_data, exc)
+                    plugin.handle_syntax_error(command_data, data)
                 if command_data == "" or command_data.command is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after syntax error handling. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after syntax error handling. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during syntax error handling. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during syntax error handling. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 self.notify_plugins_fail(command_data)
@@ -239,6 +697,7 @@ class Calculator:
             if command_data.resend_command:
                 return
 
+    @timed("runtime_error")
     def notify_plugins_runtime_error(self, command_data: CalculatorCommand, data: str) -> None:
         """Notify all plugins of a runtime error
 
@@ -247,17 +706,17 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("handle_runtime_error"):
             try:
-                plugin.handle_runtime_error(command_data, data)
+                with self.span(plugin.name, "handle_runtime_error"):
+                    plugin.handle_runtime_error(command_data, data)
                 if command_data == "" or command_data.command is None or command_data.command_ast is None:
-                    print(f"Plugin {plugin.__class__.__name__} returned an invalid command after runtime error handling. Aborting.")
+                    self.handle_output(f"Plugin {plugin.__class__.__name__} returned an invalid command after runtime error handling. Aborting.")
                     command_data.abort = True
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during runtime error handling. Aborting command.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during runtime error handling. Aborting command.", plugin)
                 command_data.abort = True
             if command_data.abort:
                 self.notify_plugins_fail(command_data)
@@ -265,6 +724,7 @@ class Calculator:
             if command_data.resend_command:
                 return
 
+    @timed("success")
     def notify_plugins_success(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of a successful command
 
@@ -274,16 +734,38 @@ class Calculator:
             The command which triggered this event
         """
         command_data.success = True
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("command_success"):
             try:
-                plugin.command_success(command_data)
+                with self.span(plugin.name, "command_success"):
+                    plugin.command_success(command_data)
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during success handling.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during success handling.", plugin)
                 return
 
+    @timed("result")
+    def notify_plugins_result(self, command_data: CalculatorCommand, value: Any) -> None:
+        """Notify all plugins of the value displayed by a successful command
+
+        Parameters
+        ----------
+        command_data : :class:`CalculatorCommand`
+            The command which triggered this event
+        value : Any
+            The value displayed by the command
+        """
+        for plugin in self.get_dispatch("command_result"):
+            try:
+                with self.span(plugin.name, "command_result"):
+                    plugin.command_result(command_data, value)
+            except AssertionError:
+                raise
+            except Exception:
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during result handling.", plugin)
+                return
+
+    @timed("fail")
     def notify_plugins_fail(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of a failed command
 
@@ -293,16 +775,51 @@ class Calculator:
             The command which triggered this event
         """
         command_data.success = False
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("command_fail"):
             try:
-                plugin.command_fail(command_data)
+                with self.span(plugin.name, "command_fail"):
+                    plugin.command_fail(command_data)
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during failure handling.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during failure handling.", plugin)
                 return
 
+    def notify_plugins_begin_execution(self, command_data: CalculatorCommand) -> None:
+        """Notify all plugins that code of a command is about to be executed
+
+        Parameters
+        ----------
+        command_data : :class:`CalculatorCommand`
+            The command which triggered this event
+        """
+        for plugin in self.get_dispatch("begin_execution"):
+            try:
+                with self.span(plugin.name, "begin_execution"):
+                    plugin.begin_execution(command_data)
+            except AssertionError:
+                raise
+            except Exception:
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception before execution.", plugin)
+
+    def notify_plugins_end_execution(self, command_data: CalculatorCommand) -> None:
+        """Notify all plugins that code of a command was executed
+
+        Parameters
+        ----------
+        command_data : :class:`CalculatorCommand`
+            The command which triggered this event
+        """
+        for plugin in self.get_dispatch("end_execution"):
+            try:
+                with self.span(plugin.name, "end_execution"):
+                    plugin.end_execution(command_data)
+            except AssertionError:
+                raise
+            except Exception:
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception after execution.", plugin)
+
+    @timed("end_interaction")
     def notify_plugins_end_interaction(self, command_data: CalculatorCommand) -> None:
         """Notify all plugins of the end of an interaction
 
@@ -311,14 +828,14 @@ class Calculator:
         command_data : :class:`CalculatorCommand`
             The command which triggered this event
         """
-        for plugin in self.plugins:
+        for plugin in self.get_dispatch("end_interaction"):
             try:
-                plugin.end_interaction(command_data)
+                with self.span(plugin.name, "end_interaction"):
+                    plugin.end_interaction(command_data)
             except AssertionError:
                 raise
             except Exception:
-                traceback.print_exc()
-                print(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during interaction conclusion.")
+                self.write_plugin_exception(f"Plugin {plugin.__class__.__name__} encountered a runtime exception during interaction conclusion.", plugin)
                 return
 
     def mksym(self, s: str, /, **kwargs) -> sympy.Symbol | tuple[sympy.Symbol]:
@@ -340,6 +857,7 @@ class Calculator:
                 self.context.__dict__[str(name)] = name
         except TypeError:
             self.context.__dict__[s] = syms
+        self.bindings_changed()
         return syms
 
     def getsym(self, s: str) -> Any:
@@ -360,9 +878,9 @@ class Calculator:
         Any
             The retrieved variable
         """
-        if s in __builtins__.keys():
-            return __builtins__[s]
-        return self.context.__dict__[s]
+        if s in self.context.__dict__:
+            return self.context.__dict__[s]
+        return CalculatorContext.base[s]
 
     def chksym(self, s: str) -> bool:
         """Checks if a variable exists in the calculator context
@@ -379,7 +897,57 @@ class Calculator:
         """
         if s == "_":
             return False
-        return s in self.context.__dict__.keys() or s in __builtins__.keys()
+        return s in self.context.__dict__ or s in CalculatorContext.base
+
+    @property
+    def context_version(self) -> int:
+        """A number which increases whenever a binding in the calculator context is added, removed, or rebound to a different object, except for the last displayed value ``_``. Plugins can use this to cache lookups in the context between commands
+
+        The version is increased by :meth:`Calculator.bindings_changed` when bindings are made by :meth:`Calculator.mksym`, by the code run by :meth:`Calculator.interpret`, by the hooks of registered plugins, or directly on the context between commands
+
+        Returns
+        -------
+        :class:`int`
+            The version of the calculator context
+        """
+        return self._context_version
+
+    def bindings_changed(self) -> None:
+        """Records that bindings in the calculator context were made. Increases :attr:`Calculator.context_version` and refreshes :attr:`Calculator.symbol_index`"""
+        self.symbol_index = {k: v for k, v in self.context.__dict__.items() if k != "_"}
+        self._context_version += 1
+
+    def check_bindings(self) -> None:
+        """Calls :meth:`Calculator.bindings_changed` if a binding in the calculator context was added, removed, or rebound since :attr:`Calculator.symbol_index` was refreshed. Used after code which can make any binding has run"""
+        bindings = self.context.__dict__
+        index = self.symbol_index
+        if len(bindings) - ("_" in bindings) != len(index) or any(index.get(k, _missing) is not v for k, v in bindings.items() if k != "_"):
+            self.bindings_changed()
+
+    def inspect_callable(self, value: Any) -> Calculator.CallableInfo:
+        """Inspects how a value can be called, such as whether it is a function of a single variable. The result is cached by the identity of the value until :attr:`Calculator.context_version` changes, for at most :attr:`Calculator.callable_cache_size` values
+
+        Parameters
+        ----------
+        value : Any
+            The value to inspect
+
+        Returns
+        -------
+        :class:`Calculator.CallableInfo`
+            The description of the value
+        """
+        if self.callable_cache_version != self._context_version:
+            self.callable_cache.clear()
+            self.callable_cache_version = self._context_version
+        cached = self.callable_cache.get(id(value))
+        if cached is None or cached[0] is not value:
+            cached = self.callable_cache[id(value)] = (value, Calculator.CallableInfo(value))
+            if len(self.callable_cache) > self.callable_cache_size:
+                self.callable_cache.popitem(last=False)
+        else:
+            self.callable_cache.move_to_end(id(value))
+        return cached[1]
 
     def reset(self) -> None:
         """Throws away the buffer from previous commands"""
@@ -415,17 +983,29 @@ class Calculator:
         :class:`bool`
             ``False`` if more input is required to complete the command, ``True`` otherwise
         """
+        if self.current_command is None:
+            self.result = CalculatorResult(command)
+            # Bindings can be made directly on the context between commands
+            self.check_bindings()
         if self.incomplete_command is not None:
             try:
                 self.incomplete_command.buffer.append(command)
+                self.count("compile_command")
                 if code.compile_command("\n".join(self.incomplete_command.buffer)) is None:
                     return False
+                if self.result is not None:
+                    self.result.complete = True
+                    self.result.handled_command = "\n".join(self.incomplete_command.buffer)
+                    errors = len(self.result.errors)
                 self.interpret("\n".join(self.incomplete_command.buffer))
+                if self.result is not None:
+                    self.result.success = len(self.result.errors) == errors
             except AssertionError:
                 raise
             except Exception as e:
-                print("".join(traceback.format_exception(e)).strip() + "\n", end="")
+                self.write_error("".join(traceback.format_exception(e)).strip() + "\n")
             self.incomplete_command = None
+            self.current_command = None
             return True
 
         self.reset()
@@ -452,12 +1032,16 @@ class Calculator:
             self.current_command = None
             return True
         if command_data.command.startswith(self.directive_prefix):
-            if (c := command_data.command.removeprefix(self.directive_prefix)) in self.directives:
+            c = command_data.command.removeprefix(self.directive_prefix)
+            if c not in self.directives and c:
+                # The text after the name of the directive is passed as its argument
+                c = c.split(maxsplit=1)[0]
+            if c in self.directives:
                 self.directives[c](self, command_data.command.removeprefix(self.directive_prefix + c).strip())
                 self.notify_plugins_end_interaction(command_data)
                 self.current_command = None
                 return True
-            print("Unknown command.")
+            self.handle_output("Unknown command.")
             self.notify_plugins_end_interaction(command_data)
             self.current_command = None
             return True
@@ -472,10 +1056,13 @@ class Calculator:
             return True
 
         # Attempt to compile the code
+        repaired = False
         while True:
             command_data.resend_command = False
             command_data.success = False
             try:
+                # Compiled directly so that the traceback of a syntax error starts at the command
+                self.count("compile_command")
                 compiled = code.compile_command(command_data.command)
                 if compiled is None:
                     command_data.multiline_command = True
@@ -484,6 +1071,19 @@ class Calculator:
                     command_data.valid_syntax = True
                 break
             except SyntaxError as e:
+                if not repaired:
+                    # Repair the implicit syntax in a single pass before falling back to handling each syntax error
+                    repaired = True
+                    self.notify_plugins_repair(command_data)
+                    if command_data.resend_command and not command_data.abort:
+                        self.notify_plugins_resend(command_data)
+                    if command_data.abort:
+                        self.notify_plugins_fail(command_data)
+                        self.notify_plugins_end_interaction(command_data)
+                        self.current_command = None
+                        return True
+                    if command_data.resend_command:
+                        continue
                 # Handle any syntax errors
                 self.current_command.print_error = True
                 self.current_command.success = False
@@ -494,7 +1094,7 @@ class Calculator:
                     if not command_data.abort:
                         continue
                 if self.current_command.print_error:
-                    print(data, end="")
+                    self.write_error(data)
                 self.notify_plugins_fail(command_data)
                 self.notify_plugins_end_interaction(command_data)
                 self.current_command = None
@@ -531,6 +1131,8 @@ class Calculator:
                 return True
         else:
             # Treat as Python code
+            if self.result is not None:
+                self.result.complete = False
             self.incomplete_command = CalculatorCommand(self, command)
             self.incomplete_command.buffer = []
             if not command.startswith(self.directive_prefix):
@@ -550,33 +1152,46 @@ class Calculator:
         :class:`bool`
             Whether the command was successful
         """
-        self.current_command = command_data
-        self.notify_plugins_command(command_data)
-        if command_data.abort:
-            self.notify_plugins_fail(command_data)
-            return False
-        # Execute the command
-        command_data.success = True
-        self.interpret(command_data.command)
-        while command_data.resend_command:
-            self.notify_plugins_resend(command_data)
+        with self.span("statement", "statement", command_data.command):
+            self.current_command = command_data
+            self.notify_plugins_command(command_data)
             if command_data.abort:
-                command_data.success = False
-                break
-            command_data.resend_command = False
+                self.notify_plugins_fail(command_data)
+                return False
+            # Execute the command
             command_data.success = True
+            command_data.value = None
             self.interpret(command_data.command)
-        # Notify success or failure
-        if command_data.success:
-            self.notify_plugins_success(command_data)
-        else:
-            self.notify_plugins_fail(command_data)
-        for qc in self.queued_commands:
-            self.command(qc)
-        self.incomplete_command = None
-        self.current_command = None
-        return command_data.success
+            while command_data.resend_command:
+                self.notify_plugins_resend(command_data)
+                if command_data.abort:
+                    command_data.success = False
+                    break
+                command_data.resend_command = False
+                command_data.success = True
+                command_data.value = None
+                self.interpret(command_data.command)
+            # Notify success or failure
+            if self.result is not None:
+                if self.result.handled_command is None:
+                    self.result.handled_command = command_data.command
+                    self.result.success = command_data.success
+                else:
+                    self.result.handled_command += "\n" + command_data.command
+                    self.result.success = self.result.success and command_data.success
+            if command_data.success:
+                self.notify_plugins_success(command_data)
+                if command_data.value is not None:
+                    self.notify_plugins_result(command_data, command_data.value)
+            else:
+                self.notify_plugins_fail(command_data)
+            for qc in self.queued_commands:
+                self.command(qc)
+            self.incomplete_command = None
+            self.current_command = None
+            return command_data.success
 
+    @timed("execute")
     def interpret(self, line: str) -> None:
         """Interpret the given line as input
 
@@ -585,7 +1200,207 @@ class Calculator:
         line : :class:`str`
             The line to push to the underlying :class:`code.InteractiveConsole`. Must be valid Python
         """
-        self.console.push(line)
+        self.count("interpret")
+        plugin = self.active_plugin()
+        if plugin is not None:
+            self.count(f"interpret.{plugin}")
+        previous = Calculator.display_hook.push(self)
+        self.displayhook = Calculator.display_hook.original
+        # A completed multi-line command executes its buffer. Code run by plugins from their hooks is not an execution of the command
+        command = (self.incomplete_command if self.incomplete_command is not None else self.current_command) if plugin is None else None
+        with self.interrupt_lock:
+            interrupted = self.current_command is not None and self.interrupted_command is self.current_command
+            if not interrupted:
+                self.interrupt_thread = threading.get_ident()
+        try:
+            if interrupted:
+                self.console.write("KeyboardInterrupt\n")
+                return
+            if command is not None:
+                self.notify_plugins_begin_execution(command)
+            try:
+                self.run_line(line)
+            finally:
+                with self.interrupt_lock:
+                    self.interrupt_thread = None
+                if command is not None:
+                    self.notify_plugins_end_execution(command)
+        except KeyboardInterrupt:
+            # The interruption arrived after the console finished running the code
+            self.console.showtraceback()
+        finally:
+            Calculator.display_hook.pop(previous)
+            self.check_bindings()
+
+    def run_line(self, line: str) -> None:
+        """Compiles and runs the given line in the underlying :class:`code.InteractiveConsole`, reusing the compiled code from :attr:`Calculator.code_cache`
+
+        Parameters
+        ----------
+        line : :class:`str`
+            The line to run. Must be valid Python
+        """
+        if self.console.buffer:
+            self.console.push(line)
+            return
+        key = (line, self.console.compile.compiler.flags)
+        compiled = self.code_cache.get(key)
+        if compiled is None:
+            self.count("code_cache.miss")
+            try:
+                compiled = self.console.compile(line, self.console.filename, "single")
+            except (OverflowError, SyntaxError, ValueError):
+                compiled = None
+            if compiled is None:
+                # Let the console report the error or buffer the incomplete input
+                self.console.push(line)
+                return
+            self.code_cache[key] = compiled
+            if len(self.code_cache) > self.code_cache_size:
+                self.code_cache.popitem(last=False)
+        else:
+            self.count("code_cache.hit")
+            self.code_cache.move_to_end(key)
+        self.console.runcode(compiled)
+
+    def interrupt(self) -> bool:
+        """Interrupts the current command as if by ``SIGINT``, and can be called from any thread. Code being executed is interrupted with :class:`KeyboardInterrupt`, and code which is yet to be executed for the command is skipped. The plugins are notified of the failed command as usual
+
+        Returns
+        -------
+        :class:`bool`
+            Whether there was a command to interrupt
+        """
+        with self.interrupt_lock:
+            command = self.current_command
+            if command is None:
+                return False
+            if self.interrupted_command is not command:
+                self.interrupted_command = command
+                if self.interrupt_thread is not None:
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.interrupt_thread), ctypes.py_object(KeyboardInterrupt))
+                    self.interrupt_thread = None
+            return True
+
+    def evaluate(self, command: str) -> CalculatorResult:
+        """Push a command to the calculator without printing any output
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The command to be pushed to the calculator
+
+        Returns
+        -------
+        :class:`CalculatorResult`
+            The structured result of the interaction. If more input is required, :attr:`CalculatorResult.complete` is ``False``
+        """
+        silent = self.silent
+        self.silent = True
+        try:
+            self.command(command)
+        finally:
+            self.silent = silent
+        assert self.result is not None
+        return self.result
+
+    def evaluate_many(self, commands: Iterable[str]) -> list[CalculatorResult]:
+        """Push a batch of commands to the calculator in order without printing any output
+
+        Parameters
+        ----------
+        commands : Iterable[:class:`str`]
+            The commands to be pushed to the calculator
+
+        Returns
+        -------
+        :class:`list[CalculatorResult]`
+            The structured result of each interaction
+        """
+        return [self.evaluate(command) for command in commands]
+
+    async def acommand(self, command: str, timeout: float | None = None) -> bool:
+        """Push a command to the calculator without blocking the event loop. See :meth:`Calculator.command`
+
+        The command is run by :attr:`Calculator.executor`, and commands of the same calculator are run one at a time. If the command times out or the task is cancelled, the command is interrupted with :meth:`Calculator.interrupt`, and the error is raised once the plugins have been notified of the failed command, or once :attr:`Calculator.interrupt_grace` has passed if the command cannot be interrupted
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The command to be pushed to the calculator
+        timeout : :class:`float` | None
+            The maximum number of seconds to wait for the command, or ``None`` to wait indefinitely
+
+        Returns
+        -------
+        :class:`bool`
+            ``False`` if more input is required to complete the command, ``True`` otherwise
+
+        Raises
+        ------
+        :class:`TimeoutError`
+            The command did not finish within the timeout
+        """
+        return await self.run_async(self.command, command, timeout)
+
+    async def aevaluate(self, command: str, timeout: float | None = None) -> CalculatorResult:
+        """Push a command to the calculator without printing any output or blocking the event loop. See :meth:`Calculator.evaluate` and :meth:`Calculator.acommand`
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The command to be pushed to the calculator
+        timeout : :class:`float` | None
+            The maximum number of seconds to wait for the command, or ``None`` to wait indefinitely
+
+        Returns
+        -------
+        :class:`CalculatorResult`
+            The structured result of the interaction
+
+        Raises
+        ------
+        :class:`TimeoutError`
+            The command did not finish within the timeout. The partial result is available in :attr:`Calculator.result`
+        """
+        return await self.run_async(self.evaluate, command, timeout)
+
+    async def run_async(self, func: Callable[[str], Any], command: str, timeout: float | None) -> Any:
+        """Runs a method of the calculator with :attr:`Calculator.executor`, interrupting it on timeout or cancellation"""
+        # Only imported by asynchronous callers, which have already imported asyncio
+        import asyncio
+
+        if self.async_lock is None:
+            self.async_lock = asyncio.Lock()
+        lock = self.async_lock
+        await lock.acquire()
+        release = True
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, func, command)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Wait for the interrupted command to finish, so that the plugins are notified in order before the next command
+                deadline = loop.time() + self.interrupt_grace
+                while not future.done() and loop.time() < deadline:
+                    self.interrupt()
+                    try:
+                        await asyncio.wait([future], timeout=0.05)
+                    except asyncio.CancelledError:
+                        pass
+                if not future.done():
+                    # The command is running code which cannot be interrupted, and keeps the lock until it finishes
+                    release = False
+                    if self.result is not None:
+                        self.result.warnings.append(f"The command could not be interrupted and was abandoned after {self.interrupt_grace} seconds. It keeps running until it finishes")
+                    future.add_done_callback(lambda f: (f.cancelled() or f.exception(), lock.release()))
+                elif not future.cancelled():
+                    future.exception()
+                raise
+        finally:
+            if release:
+                lock.release()
 
     def interact(self, prompt: str = "Calculator") -> NoReturn:
         """Start an interactive prompt with the calculator
@@ -1,5 +1,6 @@
 import ast
 import symtable
+from typing import Any
 
 from .calc import Calculator
 
@@ -12,6 +13,7 @@ class CalculatorCommand:
         self._command = command
         self._command_ast = None
         self._command_symtable = None
+        self._command_stale = False
         self._valid_syntax = False
         self.multiline_command = False
         """Whether the command is a multi-line command."""
@@ -21,28 +23,36 @@ class CalculatorCommand:
         self.resend_command = False
         self.print_error = False
         self.success = False
+        self.value: Any = None
+        """The value displayed by the command after it was executed, or ``None`` if no value was displayed"""
 
     @property
     def command(self) -> str:
-        """The plaintext command. Setting this with :attr:`CalculatorCommand.valid_syntax` ``True`` updates the symbol table and the AST
+        """The plaintext command. Setting this with :attr:`CalculatorCommand.valid_syntax` ``True`` updates the AST and invalidates the symbol table. If the AST was set, the plaintext command is generated from it when first read
 
         Raises
         ------
         :class:`SyntaxError`
             When setting the command to one with invalid Python syntax when  :attr:`CalculatorCommand.valid_syntax` is ``True``
         """
+        if self._command_stale:
+            self.calc.count("ast.unparse")
+            self._command = ast.unparse(self._command_ast)  # type: ignore
+            self._command_stale = False
         return self._command
 
     @command.setter
     def command(self, value: str) -> None:
-        if self.valid_syntax and self._command != value:
+        if self.valid_syntax and (self._command_stale or self._command != value):
+            self.calc.count("ast.parse")
             self._command_ast = ast.parse(value, filename="<input>", mode="single")
-            self._command_symtable = symtable.symtable(value, filename="<input>", compile_type="single")
+            self._command_symtable = None
         self._command = value
+        self._command_stale = False
 
     @property
     def valid_syntax(self) -> bool:
-        """Whether the plaintext command is valid syntax. Setting this to ``True`` updates the symbol table and the AST
+        """Whether the plaintext command is valid syntax. Setting this to ``True`` updates the AST and invalidates the symbol table
 
         Raises
         ------
@@ -53,14 +63,15 @@ class CalculatorCommand:
 
     @valid_syntax.setter
     def valid_syntax(self, value: bool) -> None:
-        self._valid_syntax = value
         if value:
-            self._command_ast = ast.parse(self._command, filename="<input>", mode="single")
-            self._command_symtable = symtable.symtable(self._command, filename="<input>", compile_type="single")
+            self.calc.count("ast.parse")
+            self._command_ast = ast.parse(self.command, filename="<input>", mode="single")
+            self._command_symtable = None
+        self._valid_syntax = value
 
     @property
     def command_ast(self) -> ast.AST:
-        """The AST of the command. Setting this implies :attr:`CalculatorCommand.valid_syntax` and updates the plaintext command
+        """The AST of the command. Setting this implies :attr:`CalculatorCommand.valid_syntax`. The AST becomes the source of truth for the command; the plaintext command and the symbol table are regenerated from it only when they are next read. The locations of the nodes refer to the plaintext command the AST was parsed from
 
         Raises
         ------
@@ -74,11 +85,13 @@ class CalculatorCommand:
     @command_ast.setter
     def command_ast(self, value: ast.AST) -> None:
         self._valid_syntax = True
-        self.command = ast.unparse(value)
+        self._command_ast = value
+        self._command_symtable = None
+        self._command_stale = True
 
     @property
     def command_symtable(self) -> symtable.SymbolTable:
-        """The symbol table of the command.
+        """The symbol table of the command. Generated from the plaintext command when first read after a change
 
         Raises
         ------
@@ -87,7 +100,10 @@ class CalculatorCommand:
         """
         if not self._valid_syntax:
             raise ValueError("Attempted to get the AST of a command without valid syntax")
-        return self._command_symtable  # type: ignore
+        if self._command_symtable is None:
+            self.calc.count("symtable")
+            self._command_symtable = symtable.symtable(self.command, filename="<input>", compile_type="single")
+        return self._command_symtable
 
     def __str__(self) -> str:
         return self.command
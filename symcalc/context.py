@@ -1,14 +1,98 @@
+import builtins
+import importlib
+import inspect
 from typing import Any
 
 import sympy
 
+# The module attributes of SymPy, such as __name__, are kept in each session to emulate the globals of a module
+_module_attributes = {k: v for k, v in sympy.__dict__.items() if k.startswith("__") and k.endswith("__") and k != "__builtins__"}
+
 
 class CalculatorContext:
-    """Contains all of the available methods and variables for a :class:`Calculator`. The attribute :attr:`CalculatorContext.__dict__` is meant to emulate :func:`globals()`"""
+    """Contains all of the available methods and variables for a :class:`Calculator`. The attribute :attr:`CalculatorContext.__dict__` is meant to emulate :func:`globals()`
+
+    The context is layered. :attr:`CalculatorContext.__dict__` only holds the bindings of the session, and the builtins and SymPy are provided by the shared :attr:`CalculatorContext.base` through ``__builtins__``, so creating a context does not copy SymPy
+    """
+
+    class LazyObject:
+        """A proxy for a module, or an attribute of a module, which is only imported when the proxy is first used. Plugins can bind heavy dependencies to the context with lazy objects, so that they do not slow down the import of SymCalc
+
+        .. code-block::
+
+            setattr(calc.context, "pyperclip", CalculatorContext.LazyObject("pyperclip"))
+        """
+
+        def __init__(self, module: str, attribute: str | None = None):
+            """Initializes the proxy without importing the module
+
+            Parameters
+            ----------
+            module : :class:`str`
+                The absolute name of the module to import
+            attribute : :class:`str` | None
+                The name of the attribute of the module to proxy, or ``None`` to proxy the module itself
+            """
+            # Mangled names, so that the attributes of the proxied object are not shadowed
+            self.__module = module
+            self.__attribute = attribute
+            self.__target = None
+            self.__loaded = False
+
+        def resolve(self) -> Any:
+            """Imports the module if it has not been imported, and returns the proxied object"""
+            if not self.__loaded:
+                target = importlib.import_module(self.__module)
+                if self.__attribute is not None:
+                    target = getattr(target, self.__attribute)
+                self.__target = target
+                self.__loaded = True
+            return self.__target
+
+        def __getattr__(self, name: str) -> Any:
+            # Only called for the attributes of the proxied object
+            if name.startswith("_LazyObject__"):
+                raise AttributeError(name)
+            return getattr(self.resolve(), name)
+
+        def __dir__(self) -> list[str]:
+            return dir(self.resolve())
+
+        def __repr__(self) -> str:
+            return repr(self.resolve())
+
+        def __str__(self) -> str:
+            return str(self.resolve())
+
+    class LazyCallable(LazyObject):
+        """A :class:`CalculatorContext.LazyObject` for a callable, which is imported when it is first called or inspected. A dependency which is only used inside a method of a plugin can instead be imported in that method
+
+        .. code-block::
+
+            setattr(calc.context, "parse_latex", CalculatorContext.LazyCallable("sympy.parsing.latex", "parse_latex"))
+        """
+
+        def __call__(self, *args, **kwargs) -> Any:
+            return self.resolve()(*args, **kwargs)
+
+        @property
+        def __signature__(self) -> inspect.Signature:
+            return inspect.signature(self.resolve())
+
+    base: dict[str, Any] = {k: v for k, v in builtins.__dict__.items() if k != "_"} | {k: v for k, v in sympy.__dict__.items() if k != "__builtins__"}
+    """The namespace shared by all contexts, containing the builtins and SymPy. Should not be modified"""
 
     settings: dict[str, Any]
 
     def __init__(self):
         """Initializes the default calculator context"""
+        self.__dict__["__builtins__"] = CalculatorContext.base
         self.__dict__["sympy"] = sympy
-        self.__dict__.update(sympy.__dict__)
+        self.__dict__.update(_module_attributes)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called when the name is not bound in the session
+        try:
+            return CalculatorContext.base[name]
+        except KeyError:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'") from None
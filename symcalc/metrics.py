@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Iterable
+
+from .calc import Calculator
+from .command import CalculatorCommand
+from .plugin import CalculatorPlugin
+from .result import CalculatorResult
+
+if TYPE_CHECKING:
+    import http.server
+
+
+class CalculatorMetrics:
+    """Collects metrics of calculator sessions, and exposes them in the OpenMetrics text format for Prometheus and compatible monitoring systems
+
+    Sessions are attached with :meth:`CalculatorMetrics.attach`, which records every interaction of the calculator. The results of sessions in other processes, such as those returned by :meth:`CalculatorWorker.evaluate`, can be recorded with :meth:`CalculatorMetrics.record`. The metrics are written to a file with :meth:`CalculatorMetrics.write`, or served over HTTP with :meth:`CalculatorMetrics.serve`
+
+    .. code-block::
+
+        metrics = CalculatorMetrics()
+        calc = metrics.attach(DefaultCalculator().register_default_plugins())
+        server = metrics.serve(9464)
+
+    The following metrics are exposed:
+
+    - ``symcalc_sessions_total`` and ``symcalc_active_sessions``: the sessions attached, and those which have not been garbage collected
+    - ``symcalc_interactions_total``: the interactions recorded, labelled by whether they succeeded
+    - ``symcalc_interaction_duration_seconds`` and ``symcalc_phase_duration_seconds``: histograms of the latency of each interaction and of each phase of the interactions
+    - ``symcalc_resends_total``: the commands resent to the plugins after being changed
+    - ``symcalc_plugin_errors_total``: the runtime exceptions raised by each plugin
+    - ``symcalc_terminations_total``: the commands stopped by a :class:`CalculatorWorker`, labelled by the limit which stopped them
+    - ``symcalc_out_store_size``: the number of values stored in ``out`` by :class:`OutputStore` in the active sessions
+    """
+
+    default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    """The default upper bounds of the latency histograms, in seconds"""
+
+    content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    """The content type of the OpenMetrics text format"""
+
+    class Histogram:
+        """A histogram of latencies with fixed buckets"""
+
+        def __init__(self, buckets: Iterable[float]):
+            """Initializes an empty histogram
+
+            Parameters
+            ----------
+            buckets : Iterable[:class:`float`]
+                The upper bounds of the buckets, in seconds. A bucket for ``+Inf`` is always added
+            """
+            self.buckets = sorted(buckets)
+            """The upper bounds of the buckets, in seconds"""
+            self.counts = [0] * (len(self.buckets) + 1)
+            """The number of values in each bucket, not cumulative. The last bucket holds the values above every bound"""
+            self.count = 0
+            self.sum = 0.0
+
+        def observe(self, value: float) -> None:
+            """Records a latency, in seconds"""
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                i = len(self.buckets)
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    class MetricsPlugin(CalculatorPlugin):
+        """Helper plugin which records each interaction of an attached session in :class:`CalculatorMetrics`"""
+
+        def __init__(self, metrics: CalculatorMetrics):
+            super().__init__(self.__class__.__name__, 9999)
+            self.metrics = metrics
+
+        def end_interaction(self, command: CalculatorCommand) -> None:
+            self.metrics.record(command.calc.result)
+
+    def __init__(self, buckets: Iterable[float] = default_buckets):
+        """Initializes the metrics without any sessions
+
+        Parameters
+        ----------
+        buckets : Iterable[:class:`float`]
+            The upper bounds of the latency histograms, in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.sessions = 0
+        """The number of sessions attached"""
+        self.active_sessions: weakref.WeakSet[Calculator] = weakref.WeakSet()
+        """The attached sessions which have not been garbage collected"""
+        self.interactions = {"success": 0, "error": 0}
+        """The number of interactions recorded, keyed by whether they succeeded"""
+        self.interaction_duration = CalculatorMetrics.Histogram(self.buckets)
+        self.phase_duration: dict[str, CalculatorMetrics.Histogram] = {}
+        """The latency histogram of each phase of the interactions, keyed by the phase"""
+        self.resends = 0
+        self.plugin_errors: dict[str, int] = {}
+        """The number of runtime exceptions raised by each plugin, keyed by the name of the plugin"""
+        self.terminations: dict[str, int] = {}
+        """The number of commands stopped by a :class:`CalculatorWorker`, keyed by :attr:`CalculatorResult.terminated`"""
+
+    def attach(self, calc: Calculator) -> Calculator:
+        """Records every interaction of a calculator from now on, and counts it as a session
+
+        Parameters
+        ----------
+        calc : :class:`Calculator`
+            The calculator of the session
+
+        Returns
+        -------
+        :class:`Calculator`
+            The same calculator
+        """
+        calc.register_plugin(CalculatorMetrics.MetricsPlugin(self))
+        with self.lock:
+            self.sessions += 1
+            self.active_sessions.add(calc)
+        return calc
+
+    def record(self, result: CalculatorResult | None) -> None:
+        """Records the result of an interaction. The phase which ends the interaction is still running when it is recorded by an attached session, and is not included in the latencies
+
+        Parameters
+        ----------
+        result : :class:`CalculatorResult` | None
+            The result of the interaction, or ``None`` to record nothing
+        """
+        if result is None:
+            return
+        finished = [span for span in result.spans if span.end]
+        errors = {k.removeprefix("plugin_error."): n for k, n in result.counters.items() if k.startswith("plugin_error.")}
+        with self.lock:
+            self.interactions["success" if result.success else "error"] += 1
+            if finished:
+                self.interaction_duration.observe((max(span.end for span in finished) - finished[0].start) / 1e9)
+            for phase, duration in result.timings.items():
+                histogram = self.phase_duration.get(phase)
+                if histogram is None:
+                    histogram = self.phase_duration[phase] = CalculatorMetrics.Histogram(self.buckets)
+                histogram.observe(duration / 1e9)
+            self.resends += result.counters.get("resend", 0)
+            for plugin, n in errors.items():
+                self.plugin_errors[plugin] = self.plugin_errors.get(plugin, 0) + n
+            if result.terminated is not None:
+                self.terminations[result.terminated] = self.terminations.get(result.terminated, 0) + 1
+
+    def out_store_size(self) -> int:
+        """Returns the number of values stored in ``out`` by :class:`OutputStore` in the active sessions"""
+        size = 0
+        for calc in list(self.active_sessions):
+            out = getattr(calc.context, "out", None)
+            if isinstance(out, list):
+                # The first element is a placeholder so that the values are indexed from 1
+                size += max(len(out) - 1, 0)
+        return size
+
+    @staticmethod
+    def format_value(value: float) -> str:
+        """Formats a number as an OpenMetrics value"""
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    @staticmethod
+    def format_labels(**labels: str) -> str:
+        """Formats the labels of a sample, escaping their values"""
+        if not labels:
+            return ""
+        escaped = {k: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in labels.items()}
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+    def exposition(self) -> str:
+        """Returns the metrics in the OpenMetrics text format"""
+        fmt = CalculatorMetrics.format_value
+        labels = CalculatorMetrics.format_labels
+        lines = []
+
+        def metric(name: str, kind: str, help: str) -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help}")
+
+        def histogram(name: str, h: CalculatorMetrics.Histogram, **extra: str) -> None:
+            cumulative = 0
+            for bound, n in zip([*h.buckets, math.inf], h.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{labels(**extra, le=fmt(float(bound)))} {cumulative}")
+            lines.append(f"{name}_count{labels(**extra)} {h.count}")
+            lines.append(f"{name}_sum{labels(**extra)} {fmt(h.sum)}")
+
+        with self.lock:
+            metric("symcalc_sessions", "counter", "Calculator sessions attached")
+            lines.append(f"symcalc_sessions_total {self.sessions}")
+            metric("symcalc_active_sessions", "gauge", "Attached calculator sessions which are still alive")
+            lines.append(f"symcalc_active_sessions {len(self.active_sessions)}")
+            metric("symcalc_interactions", "counter", "Calculator interactions recorded")
+            for outcome, n in self.interactions.items():
+                lines.append(f"symcalc_interactions_total{labels(result=outcome)} {n}")
+            metric("symcalc_interaction_duration_seconds", "histogram", "Latency of calculator interactions")
+            histogram("symcalc_interaction_duration_seconds", self.interaction_duration)
+            metric("symcalc_phase_duration_seconds", "histogram", "Latency of each phase of calculator interactions")
+            for phase, h in sorted(self.phase_duration.items()):
+                histogram("symcalc_phase_duration_seconds", h, phase=phase)
+            metric("symcalc_resends", "counter", "Commands resent to the plugins after being changed")
+            lines.append(f"symcalc_resends_total {self.resends}")
+            metric("symcalc_plugin_errors", "counter", "Runtime exceptions raised by plugins")
+            for plugin, n in sorted(self.plugin_errors.items()):
+                lines.append(f"symcalc_plugin_errors_total{labels(plugin=plugin)} {n}")
+            metric("symcalc_terminations", "counter", "Commands stopped by a calculator worker")
+            for reason, n in sorted(self.terminations.items()):
+                lines.append(f"symcalc_terminations_total{labels(reason=reason)} {n}")
+            metric("symcalc_out_store_size", "gauge", "Values stored in out by the active sessions")
+            lines.append(f"symcalc_out_store_size {self.out_store_size()}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Writes the metrics to a file in the OpenMetrics text format. The file is replaced atomically, so that it can be read by a collector at any time
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path of the file
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.exposition())
+        os.replace(temporary, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "http.server.ThreadingHTTPServer":
+        """Serves the metrics over HTTP from a background thread, in the OpenMetrics text format
+
+        Parameters
+        ----------
+        port : :class:`int`
+            The port to listen on, or ``0`` to choose a free port
+        host : :class:`str`
+            The address to listen on. Only local connections are accepted by default
+
+        Returns
+        -------
+        :class:`http.server.ThreadingHTTPServer`
+            The running server. The metrics are served at every path. Call ``shutdown()`` and ``server_close()`` to stop it
+        """
+        # Only imported when serving, since it is slow to import
+        import http.server
+
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CalculatorMetrics.content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="symcalc-metrics", daemon=True).start()
+        return server
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import ast
+import functools
+import tokenize
 from abc import ABC
+from typing import Any
 
 from .calc import Calculator
 from .command import CalculatorCommand
@@ -65,6 +69,46 @@ class CalculatorPlugin(ABC):
         """
         pass
 
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
+        """An AST transformation to be applied by the plugin, meant to be overriden by subclasses. The given command is guaranteed to be valid Python syntax.
+
+        Consecutive transformations, in order of priority, are applied to the same tree and :attr:`CalculatorCommand.command_ast` is only set once, before the next plugin which handles the command. Until then, the plaintext command and the symbol table are not updated, and the locations of the original nodes refer to :attr:`CalculatorCommand.command`
+
+        Parameters
+        ----------
+        command : :class:`CalculatorCommand`
+            The command to be transformed
+        tree : :class:`ast.AST`
+            The AST of the command, including the transformations of plugins which ran before this one
+
+        Returns
+        -------
+        :class:`ast.AST` | None
+            The transformed AST, or ``None`` to leave the tree unchanged
+        """
+        return tree
+
+    def repair_token(self, command: CalculatorCommand, tokens: list[tokenize.TokenInfo], index: int) -> tuple[str, int] | None:
+        """Repairs implicit syntax at a token of the command, meant to be overriden by subclasses. When a command has invalid Python syntax, the calculator tokenizes it once and offers every token to the plugins in order of priority, before any syntax error is handled. The first plugin to return a repair replaces the tokens, and the remaining plugins are not called for that token.
+
+        The command should not be modified by this method, but it can be aborted.
+
+        Parameters
+        ----------
+        command : :class:`CalculatorCommand`
+            The command with invalid syntax
+        tokens : :class:`list[tokenize.TokenInfo]`
+            All of the tokens of the command, excluding whitespace, which are not modified by previous repairs
+        index : :class:`int`
+            The index of the current token
+
+        Returns
+        -------
+        :class:`tuple[str, int]` | None
+            The text to replace the source of the tokens with and the number of tokens replaced, starting at the current token. ``None`` if the token does not need to be repaired
+        """
+        return None
+
     def handle_syntax_error_obj(self, command: CalculatorCommand, exc: SyntaxError) -> None:
         """The syntax error to be handled by the plugin, meant to be overriden by subclasses. The given command is guaranteed to be invalid Python syntax, and the object can be modified in place.
 
@@ -109,6 +153,26 @@ class CalculatorPlugin(ABC):
         """Proxies a command to be resent to the calculator. This occurs after a runtime or syntax error. No guarantees are made about the validity of the syntax, and the given command can be modified in place"""
         pass
 
+    def begin_execution(self, command: CalculatorCommand) -> None:
+        """Notifies the plugin just before code of the command is executed by :meth:`Calculator.interpret`. A command can be executed several times, such as once per statement or again after it is resent. Not called for code which plugins run from their own hooks
+
+        Parameters
+        ----------
+        command : :class:`CalculatorCommand`
+            The command being executed, or the completed multi-line command whose buffer is executed
+        """
+        pass
+
+    def end_execution(self, command: CalculatorCommand) -> None:
+        """Notifies the plugin just after code of the command was executed by :meth:`Calculator.interpret`, whether or not it raised an exception. A completed multi-line command ends its interaction here, and :meth:`CalculatorPlugin.end_interaction` is not called for it
+
+        Parameters
+        ----------
+        command : :class:`CalculatorCommand`
+            The command which was executed, or the completed multi-line command whose buffer was executed, in which case it is :attr:`Calculator.incomplete_command`
+        """
+        pass
+
     def command_success(self, command: CalculatorCommand) -> None:
         """Notifies the plugin after a successful command.
 
@@ -121,6 +185,18 @@ class CalculatorPlugin(ABC):
         """
         pass
 
+    def command_result(self, command: CalculatorCommand, value: Any) -> None:
+        """Notifies the plugin of the value displayed by a successful command, after all plugins have been notified of the success. Not called if the command did not display a value.
+
+        Parameters
+        ----------
+        command : :class:`CalculatorCommand`
+            The command that was executed
+        value : Any
+            The value displayed by the command
+        """
+        pass
+
     def command_fail(self, command: CalculatorCommand) -> None:
         """Notifies the plugin after a failed command. This could be due to ``SIGINT``, an uncaught error, or other failing conditions
 
@@ -193,28 +269,32 @@ class CalculatorPlugin(ABC):
 
     @staticmethod
     def if_enabled(func):
-        """A decorator to ensure that a function is only called when the plugin is enabled. Must have called :func:`CalculatorPlugin.register_toggle` first"""
+        """A decorator to ensure that a function is only called when the plugin is enabled. Must have called :func:`CalculatorPlugin.register_toggle` first. The :class:`Calculator` does not dispatch to the wrapped method while the plugin is disabled"""
 
+        @functools.wraps(func)
         def wrapper(self, command, *args, **kwargs) -> None:
             if self.setting_name is None:
                 raise ValueError("A toggle for the plugin has not been registered")
             if command.calc.settings[self.setting_name]:
-                func(self, command, *args, **kwargs)
+                return func(self, command, *args, **kwargs)
 
+        wrapper.toggle_settings = None  # type: ignore
         return wrapper
 
     @staticmethod
     def if_external_enabled(*status):
-        """A decorator factory to ensure that a function is only called when some external setting is enabled"""
+        """A decorator factory to ensure that a function is only called when some external setting is enabled. The :class:`Calculator` does not dispatch to the wrapped method while any of the settings are disabled"""
 
         def decorator(func):
+            @functools.wraps(func)
             def wrapper(self, command, *args, **kwargs) -> None:
                 run = True
                 for s in status:
                     run = run and command.calc.settings[s]
                 if run:
-                    func(self, command, *args, **kwargs)
+                    return func(self, command, *args, **kwargs)
 
+            wrapper.toggle_settings = status  # type: ignore
             return wrapper
 
         return decorator
@@ -1,26 +1,12 @@
-import sys
-from types import ModuleType
-
 from ..plugin import CalculatorPlugin
-from .additions import *
-from .functionality import *
-from .meta import *
-from .notation import *
-from .output import *
-from .reminders import *
-from .user import *
+from . import manifest
 
 _plugins = None
 
 
-def get_plugins():
+def get_plugins() -> list[type[CalculatorPlugin]]:
+    """Returns the plugins listed in the manifest, followed by the plugins in :mod:`symcalc.plugins.user`. The modules of the plugins are imported on the first call"""
     global _plugins
     if _plugins is None:
-        _plugins = []
-        for x in (self := sys.modules[__name__]).__dir__():
-            if isinstance(m := self.__getattribute__(x), ModuleType):
-                for c in m.__dir__():
-                    t = m.__getattribute__(c)
-                    if isinstance(t, type) and issubclass(t, CalculatorPlugin) and t != CalculatorPlugin:
-                        _plugins.append(t)
+        _plugins = [entry.load() for entry in manifest.manifest] + manifest.discover(["user"])
     return _plugins
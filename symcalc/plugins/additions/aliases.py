@@ -2,10 +2,8 @@ from __future__ import annotations
 
 import sympy
 import sympy.functions.combinatorial.factorials
-import sympy.parsing.latex
-import sympy.parsing.mathematica
-import sympy.parsing.maxima
 from symcalc.calc import Calculator
+from symcalc.context import CalculatorContext
 from symcalc.plugin import CalculatorPlugin
 
 
@@ -21,9 +19,9 @@ class AddAliases(CalculatorPlugin):
         setattr(calc.context, "getsym", calc.getsym)
         setattr(calc.context, "chksym", calc.chksym)
 
-        setattr(calc.context, "parse_latex", sympy.parsing.latex.parse_latex)
-        setattr(calc.context, "parse_maxima", sympy.parsing.maxima.parse_maxima)
-        setattr(calc.context, "parse_mathematica", sympy.parsing.mathematica.parse_mathematica)
+        setattr(calc.context, "parse_latex", CalculatorContext.LazyCallable("sympy.parsing.latex", "parse_latex"))
+        setattr(calc.context, "parse_maxima", CalculatorContext.LazyCallable("sympy.parsing.maxima", "parse_maxima"))
+        setattr(calc.context, "parse_mathematica", CalculatorContext.LazyCallable("sympy.parsing.mathematica", "parse_mathematica"))
 
         setattr(calc.context, "nCr", lambda n, k: sympy.functions.combinatorial.factorials.binomial(n, k))
         setattr(calc.context, "ncr", lambda n, k: sympy.functions.combinatorial.factorials.binomial(n, k))
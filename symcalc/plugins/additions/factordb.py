@@ -2,7 +2,6 @@ from __future__ import annotations
 
 from typing import Any
 
-import requests
 import sympy
 
 from ...calc import Calculator
@@ -59,4 +58,6 @@ class AddFactorDB(CalculatorPlugin):
         :class:`AddFactorDB.FactorDBResponse`
             The response from FactorDB
         """
+        import requests
+
         return AddFactorDB.FactorDBResponse(n, requests.get("http://factordb.com/api", params={"query": str(n)}).json())
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-import pyperclip
-
 from ...calc import Calculator
+from ...context import CalculatorContext
 from ...plugin import CalculatorPlugin
 
 
@@ -22,6 +21,6 @@ class AddPyperclip(CalculatorPlugin):
 
     def hook(self, calc: Calculator) -> None:
         """Updates the calculator context"""
-        setattr(calc.context, "pyperclip", pyperclip)
-        setattr(calc.context, "copy", pyperclip.copy)
-        setattr(calc.context, "paste", pyperclip.paste)
+        setattr(calc.context, "pyperclip", CalculatorContext.LazyObject("pyperclip"))
+        setattr(calc.context, "copy", CalculatorContext.LazyCallable("pyperclip", "copy"))
+        setattr(calc.context, "paste", CalculatorContext.LazyCallable("pyperclip", "paste"))
@@ -69,7 +69,7 @@ class AutoExact(CalculatorPlugin):
         self.register_toggle(calc, "ax", "auto_exact", True)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the tree to apply the substitution
         self.checker.current_command = command
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
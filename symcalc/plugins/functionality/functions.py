@@ -41,7 +41,7 @@ class AutoFunction(CalculatorPlugin):
                         create = False
                         break
                 if create:
-                    print(f"New function: {node.func.id}")
+                    self.calc.handle_warning(f"New function: {node.func.id}")
                     setattr(self.calc.context, node.func.id, sympy.Function(node.func.id))
             # Do not explore node.func
             args = []
@@ -67,6 +67,6 @@ class AutoFunction(CalculatorPlugin):
         self.checker = AutoFunction.CheckCalls(calc)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST and check for undefined functions
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
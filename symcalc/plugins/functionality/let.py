@@ -89,8 +89,11 @@ class LetStatements(CalculatorPlugin):
                 self.let_symbols[command.calc.mksym(sym.id)] = value  # type: ignore
         if isinstance(command.command_ast, ast.Module | ast.Interactive) and isinstance(command.command_ast.body[-1], ast.Assign):
             self.last_result = None
-        elif not self.letting:
-            command.calc.interpret("try:\n\tlet_check_symbols(_)\nexcept NameError: pass\n")
+
+    @CalculatorPlugin.if_enabled
+    def command_result(self, command: CalculatorCommand, value: Any) -> None:
+        if not self.letting:
+            self.let_check_symbols(value)
             if self.current_command_found_symbols:
                 try:
                     output = self.last_result
@@ -105,7 +108,7 @@ class LetStatements(CalculatorPlugin):
                     setattr(command.calc.context, "__let_statement_eval", lse)
                     if not self.subs_occured:
                         self.subs_occured = True
-                        print("----- which evaluates to:")
+                        command.calc.handle_output("----- which evaluates to:")
                         command.calc.queue_command("__let_statement_eval")
                 except AttributeError:
                     pass
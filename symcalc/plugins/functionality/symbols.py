@@ -34,7 +34,7 @@ class AutoSymbol(CalculatorPlugin):
                 if self.calc.settings["auto_symbol_char"]:
                     self.calc.mksym(",".join(list(node.id)))
                 else:
-                    print(f"New symbol: {node.id}")
+                    self.calc.handle_warning(f"New symbol: {node.id}")
                     self.calc.mksym(node.id)
             return self.generic_visit(node)
 
@@ -48,6 +48,6 @@ class AutoSymbol(CalculatorPlugin):
         self.checker = AutoSymbol.CheckNames(calc)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST and check for undefined symbols
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
@@ -0,0 +1,159 @@
+"""The manifest of the plugins included with SymCalc, which lists each plugin without importing it. The manifest is generated by introspecting the plugins, and should be regenerated with ``python -m symcalc.plugins.manifest`` when a plugin is added or changed"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Iterable
+
+from ..plugin import CalculatorPlugin
+
+groups = ["additions", "functionality", "meta", "notation", "output", "reminders"]
+"""The packages of the plugins included in the manifest, in order"""
+
+hooks = ["begin_interaction", "parse_command", "handle_command", "transform_command", "repair_token", "handle_syntax_error_obj", "handle_syntax_error", "handle_runtime_error", "handle_resend", "begin_execution", "end_execution", "command_success", "command_result", "command_fail", "end_interaction"]
+"""The methods of :class:`CalculatorPlugin` which are called by the calculator"""
+
+
+class PluginEntry:
+    """An entry of the manifest, which describes a plugin and imports it on demand"""
+
+    def __init__(self, name: str, module: str, priority: int, hooks: tuple[str, ...] = (), context: tuple[str, ...] = (), directives: tuple[str, ...] = ()):
+        """Initializes the entry
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the plugin class
+        module : :class:`str`
+            The absolute name of the module which defines the plugin
+        priority : :class:`int`
+            The priority of the plugin
+        hooks : :class:`tuple[str, ...]`
+            The methods of :class:`CalculatorPlugin` which the plugin overrides
+        context : :class:`tuple[str, ...]`
+            The names which the plugin binds in the calculator context when it is registered
+        directives : :class:`tuple[str, ...]`
+            The directives which the plugin registers
+        """
+        self.name = name
+        self.module = module
+        self.priority = priority
+        self.hooks = hooks
+        self.context = context
+        self.directives = directives
+
+    def load(self) -> type[CalculatorPlugin]:
+        """Imports the module of the plugin if it has not been imported, and returns the plugin class"""
+        return getattr(importlib.import_module(self.module), self.name)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PluginEntry) and repr(self) == repr(other)
+
+    def __repr__(self) -> str:
+        def names(t: tuple[str, ...]) -> str:
+            return "(" + ", ".join(f'"{x}"' for x in t) + ("," if len(t) == 1 else "") + ")"
+
+        return f'PluginEntry("{self.name}", "{self.module}", {self.priority}, hooks={names(self.hooks)}, context={names(self.context)}, directives={names(self.directives)})'
+
+    @staticmethod
+    def inspect(plugin: type[CalculatorPlugin]) -> PluginEntry:
+        """Creates the entry of a plugin by instantiating it and registering it with an empty :class:`Calculator`
+
+        Parameters
+        ----------
+        plugin : :class:`type[CalculatorPlugin]`
+            The plugin class
+
+        Returns
+        -------
+        :class:`PluginEntry`
+            The entry of the plugin
+        """
+        from ..calc import Calculator
+
+        calc = Calculator()
+        context = set(calc.context.__dict__)
+        directives = set(calc.directives)
+        instance = plugin()
+        calc.register_plugin(instance)
+        return PluginEntry(
+            plugin.__name__,
+            plugin.__module__,
+            instance.priority,
+            hooks=tuple(h for h in hooks if getattr(plugin, h) is not getattr(CalculatorPlugin, h)),
+            context=tuple(k for k in calc.context.__dict__ if k not in context),
+            directives=tuple(k for k in calc.directives if k not in directives),
+        )
+
+
+def discover(packages: Iterable[str]) -> list[type[CalculatorPlugin]]:
+    """Imports every module listed in ``__all__`` of the given packages of :mod:`symcalc.plugins`, and returns the plugin classes defined in them
+
+    Parameters
+    ----------
+    packages : Iterable[:class:`str`]
+        The names of the packages, such as ``"notation"``
+
+    Returns
+    -------
+    :class:`list[type[CalculatorPlugin]]`
+        The plugin classes, in the order of the packages and their ``__all__``
+    """
+    plugins = []
+    for package in packages:
+        for name in importlib.import_module(f"{__package__}.{package}").__all__:
+            module = importlib.import_module(f"{__package__}.{package}.{name}")
+            for t in module.__dict__.values():
+                if isinstance(t, type) and issubclass(t, CalculatorPlugin) and t.__module__ == module.__name__:
+                    plugins.append(t)
+    return plugins
+
+
+def generate() -> list[PluginEntry]:
+    """Generates the manifest by introspecting every plugin in :data:`groups`"""
+    return [PluginEntry.inspect(plugin) for plugin in discover(groups)]
+
+
+# fmt: off
+manifest = [
+    PluginEntry("AddAliases", "symcalc.plugins.additions.aliases", -1, hooks=(), context=("mksym", "getsym", "chksym", "parse_latex", "parse_maxima", "parse_mathematica", "nCr", "ncr", "nPr", "npr", "plot_3d", "plot_3d_parametric_line", "plot_3d_parametric_surface", "graph", "graph_implicit", "graph_parametric", "graph3d", "graph_3d", "graph3d_parametric_line", "graph_3d_parametric_line", "graph3d_parametric_surface", "graph_3d_parametric_surface", "differentiate", "derivative", "arcsin", "arccos", "arctan", "arcsec", "arccsc", "arccot", "arcsinh", "arccosh", "arctanh", "arcsech", "arccsch", "arccoth", "sindeg", "cosdeg", "tandeg", "secdeg", "cscdeg", "cotdeg", "asindeg", "acosdeg", "atandeg", "asecdeg", "acscdeg", "acotdeg", "arcsindeg", "arccosdeg", "arctandeg", "arcsecdeg", "arccscdeg", "arccotdeg"), directives=()),
+    PluginEntry("AddCisFunction", "symcalc.plugins.additions.cis", -1, hooks=(), context=("cis",), directives=()),
+    PluginEntry("AddExternalLinks", "symcalc.plugins.additions.external_links", -1, hooks=(), context=("desmos", "symbolab", "wolframalpha", "sympygamma"), directives=()),
+    PluginEntry("AddFactorDB", "symcalc.plugins.additions.factordb", -1, hooks=(), context=("factordb",), directives=()),
+    PluginEntry("AddNewtonsMethod", "symcalc.plugins.additions.newton", -1, hooks=(), context=("newton",), directives=()),
+    PluginEntry("AddnIntegrate", "symcalc.plugins.additions.nintegrate", -1, hooks=(), context=("nintegrate",), directives=()),
+    PluginEntry("AddPyperclip", "symcalc.plugins.additions.pyperclip", -1, hooks=(), context=("pyperclip", "copy", "paste"), directives=()),
+    PluginEntry("AutoExact", "symcalc.plugins.functionality.exact", 5, hooks=("transform_command",), context=(), directives=("ax",)),
+    PluginEntry("AutoFunction", "symcalc.plugins.functionality.functions", 22, hooks=("transform_command",), context=(), directives=("af",)),
+    PluginEntry("LetStatements", "symcalc.plugins.functionality.let", 900, hooks=("parse_command", "command_success", "command_result", "end_interaction"), context=("let_check_symbols",), directives=("ls",)),
+    PluginEntry("AutoSymbol", "symcalc.plugins.functionality.symbols", 23, hooks=("transform_command",), context=(), directives=("as", "asc")),
+    PluginEntry("PerformanceMonitor", "symcalc.plugins.meta.performance", 0, hooks=("begin_interaction", "parse_command", "handle_command", "handle_syntax_error", "handle_runtime_error", "handle_resend", "end_execution", "command_success", "command_fail", "end_interaction"), context=(), directives=("pp", "pm", "importtime", "perfstats", "counters", "trace", "slowlog", "prof", "mem", "sample")),
+    PluginEntry("PrintCommand", "symcalc.plugins.meta.print_command", 999, hooks=("parse_command", "handle_command", "handle_resend"), context=(), directives=("pc",)),
+    PluginEntry("NotationConstants", "symcalc.plugins.notation.constants", 50, hooks=("transform_command",), context=("constants",), directives=("nc",)),
+    PluginEntry("NotationExponent", "symcalc.plugins.notation.exponent", 3, hooks=("handle_command",), context=(), directives=("ne",)),
+    PluginEntry("NotationFactorial", "symcalc.plugins.notation.factorial", 20, hooks=("transform_command", "repair_token", "handle_syntax_error_obj"), context=(), directives=("na",)),
+    PluginEntry("NotationFunction", "symcalc.plugins.notation.function", 70, hooks=("parse_command", "transform_command", "repair_token", "handle_syntax_error_obj"), context=("MathFunction",), directives=("nf",)),
+    PluginEntry("NotationFunctionExponent", "symcalc.plugins.notation.function_exponent", 24, hooks=("transform_command",), context=(), directives=("nfe",)),
+    PluginEntry("NotationInterval", "symcalc.plugins.notation.interval", 61, hooks=("parse_command",), context=(), directives=("ni",)),
+    PluginEntry("NotationMultiplyCall", "symcalc.plugins.notation.multiply_call", 21, hooks=("parse_command", "transform_command", "repair_token", "handle_syntax_error_obj"), context=(), directives=("nm",)),
+    PluginEntry("NotationOriginVectors", "symcalc.plugins.notation.origin_vectors", 22, hooks=("transform_command",), context=(), directives=("nov",)),
+    PluginEntry("NotationSolve", "symcalc.plugins.notation.solve", 80, hooks=("transform_command",), context=(), directives=("ns",)),
+    PluginEntry("NotationVector", "symcalc.plugins.notation.vector", 20, hooks=("transform_command",), context=(), directives=("nv",)),
+    PluginEntry("OutputDecimal", "symcalc.plugins.output.decimal", 200, hooks=("command_success", "command_result"), context=("output_decimal", "check_number"), directives=("od",)),
+    PluginEntry("OutputStore", "symcalc.plugins.output.store", 210, hooks=("command_result",), context=("out", "output_store"), directives=("os",)),
+    PluginEntry("ReminderFunctionClass", "symcalc.plugins.reminders.function_class", 10, hooks=("command_result",), context=("output_functionclass",), directives=("rfc",)),
+    PluginEntry("ReminderMathConstants", "symcalc.plugins.reminders.math_constants", 4, hooks=("handle_command",), context=(), directives=()),
+    PluginEntry("ReminderTwoLetterSymbol", "symcalc.plugins.reminders.two_letter_symbol", 4, hooks=("handle_command", "command_success"), context=(), directives=("r2",)),
+]
+"""The plugins included with SymCalc, in the order they are registered by :class:`DefaultCalculator`"""
+# fmt: on
+
+
+if __name__ == "__main__":
+    with open(__file__) as f:
+        source = f.read()
+    start = source.index("manifest = [\n") + len("manifest = [\n")
+    end = source.index("]\n", start)
+    entries = "".join(f"    {entry!r},\n" for entry in generate())
+    with open(__file__, "w") as f:
+        f.write(source[:start] + entries + source[end:])
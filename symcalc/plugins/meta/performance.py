@@ -1,9 +1,24 @@
 from __future__ import annotations
 
+import cProfile
+import datetime
+import json
+import logging
+import logging.handlers
+import math
+import os
+import pstats
+import subprocess
+import sys
+import threading
 import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable
 
 from ...calc import Calculator
 from ...command import CalculatorCommand
+from ...result import CalculatorResult
 from ...plugin import CalculatorPlugin
 
 
@@ -48,6 +63,80 @@ class PerformanceMonitor(CalculatorPlugin):
         - Command execution took 1.51 ms
         - Success handling took 0.991 ms
 
+
+    After the profile, the spans recorded in :attr:`CalculatorResult.spans` are printed as a tree, with the time spent in each phase, each statement, and each call to a plugin
+
+    .. code-block::
+
+        Spans:
+         - parse took 3.87 ms
+           - NotationMultiplyCall.parse_command took 3.54 ms
+           - LetStatements.parse_command took 0.217 ms
+         ...
+
+    The latency of every phase, statement, and plugin hook is also aggregated across the session, whether or not the profile is printed. The directive ``/perfstats`` reports the count and the percentiles of each, and ``/perfstats reset`` clears them
+
+    .. code-block::
+
+        Calculator >>> /perfstats
+        ----------[ Performance Statistics ]----------
+         - interaction: 12 calls, p50 2.41 ms, p90 4.9 ms, p99 7.68 ms, max 7.68 ms
+         - statement: 14 calls, p50 1.92 ms, p90 3.46 ms, p99 5.63 ms, max 5.63 ms
+         - NotationMultiplyCall.parse_command: 12 calls, p50 0.118 ms, p90 0.31 ms, p99 3.54 ms, max 3.54 ms
+         ...
+
+    The calculator counts the hidden work done for each command, such as trial compiles, resends, and conversions between the plaintext command and its AST, in :attr:`CalculatorResult.counters` and :attr:`Calculator.counters`. The counters of the last command are printed with the profile, and the directive ``/counters`` reports the counters of the session, with those of the last command in brackets. ``/counters reset`` clears them
+
+    .. code-block::
+
+        Calculator >>> /counters
+        ----------[ Pipeline Counters ]----------
+         - ast.parse: 31 (3)
+         - compile_command: 18 (4)
+         - compile_command.NotationMultiplyCall: 6 (2)
+         - resend: 4 (2)
+         ...
+
+    The spans of every interaction can be written to a file with ``/trace <path>``, until the trace is stopped with ``/trace``. A path ending with ``.jsonl`` is written as JSON lines with one span per line, and any other path is written in the Chrome Trace Event format, which can be loaded in Perfetto or ``chrome://tracing``. Timestamps are from :func:`time.perf_counter_ns`
+
+    The directives ``/prof`` and ``/mem`` profile the next command with :mod:`cProfile` and :mod:`tracemalloc`, including the code of SymPy which it runs. ``/prof`` prints the SymPy functions with the most cumulative time, and ``/mem`` prints the peak memory allocated and the sites with the most memory allocated. The results are kept in :attr:`PerformanceMonitor.last_profile` and :attr:`PerformanceMonitor.last_memory`
+
+    .. code-block::
+
+        Calculator >>> /prof
+        Calculator >>> simplify(sin(x)**2 + cos(x)**2)
+        1
+        ----------[ Profile ]----------
+        Top SymPy functions by cumulative time:
+         - sympy/simplify/simplify.py:435(simplify): 1 calls, 0.243 s cumulative, 0.197 ms own
+         ...
+
+    The directive ``/sample <rate> [path]`` samples the stack of every command from a background thread while it is executed, at the given rate per second, until sampling is stopped with ``/sample off``. Sampling does not slow down the command like ``/prof``, so it is better suited to commands which run for seconds inside SymPy. The stacks of each command are appended to the file in the collapsed format, which can be rendered as a flame graph by ``flamegraph.pl`` or speedscope
+
+    .. code-block::
+
+        Calculator >>> /sample 200 factor.folded
+        Sampling 200 times per second to factor.folded
+        Calculator >>> factorint(2**128 + 1)
+        {59649589127497217: 1, 5704689200685129054721: 1}
+
+    Commands which take longer than a threshold can be logged to a rotating file with ``/slowlog <ms> [path]``, and the log is stopped with ``/slowlog off``. Each line of the log is a JSON record with the raw and the handled command, the number of resends, the pipeline counters, the time spent in each phase and plugin hook, and the type of the result. Commands under the threshold are not recorded, so the log can be left enabled
+
+    The directive ``/importtime`` reports the time taken to import SymCalc in a new interpreter, broken down by package and by SymCalc module
+
+    .. code-block::
+
+        Calculator >>> /importtime
+        ----------[ Import Time ]----------
+        Importing `symcalc` took 0.52 s
+        Packages:
+         - sympy took 0.45 s
+         - symcalc took 23.1 ms
+         ...
+        Slowest modules of symcalc:
+         - symcalc.plugins took 14.3 ms
+         ...
+
     """
 
     class PerformanceEvent:
@@ -64,11 +153,11 @@ class PerformanceMonitor(CalculatorPlugin):
 
         def start(self) -> None:
             """Starts the event, logging the time"""
-            self.start_time = time.time_ns()
+            self.start_time = time.perf_counter_ns()
 
         def end(self) -> None:
             """Ends the event, logging the time"""
-            self.end_time = time.time_ns()
+            self.end_time = time.perf_counter_ns()
             self.duration = self.end_time - self.start_time
 
         def get_duration(self) -> int:
@@ -77,7 +166,11 @@ class PerformanceMonitor(CalculatorPlugin):
 
         def get_duration_str(self) -> str:
             """Returns a formated duration of the event as a str"""
-            dur = self.get_duration()
+            return PerformanceMonitor.PerformanceEvent.format_duration(self.get_duration())
+
+        @staticmethod
+        def format_duration(dur: float) -> str:
+            """Returns a formated duration, given in ns, as a str"""
             unit = "ns"
             if dur >= 100:
                 dur /= 1000
@@ -99,6 +192,120 @@ class PerformanceMonitor(CalculatorPlugin):
             """Returns the event name"""
             return self.event_name
 
+    class LatencyHistogram:
+        """A histogram of latencies with bounded memory. Values are counted in logarithmic buckets, each split into linear sub-buckets, so that percentiles are reported with a bounded relative error regardless of the number of values recorded"""
+
+        def __init__(self, precision: int = 4):
+            """Initializes an empty histogram
+
+            Parameters
+            ----------
+            precision : :class:`int`
+                The number of bits of each value which are kept. The relative error of a percentile is at most ``2 ** (1 - precision)``
+            """
+            self.precision = precision
+            self.buckets: dict[int, int] = {}
+            """The number of values in each bucket, keyed by the largest value of the bucket"""
+            self.count = 0
+            self.total = 0
+            self.min = 0
+            self.max = 0
+
+        def record(self, value: int) -> None:
+            """Records a value, in ns"""
+            value = max(value, 0)
+            shift = max(value.bit_length() - self.precision, 0)
+            bucket = ((value >> shift) + 1 << shift) - 1
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            self.min = value if self.count == 0 else min(self.min, value)
+            self.max = max(self.max, value)
+            self.count += 1
+            self.total += value
+
+        def percentile(self, percent: float) -> int:
+            """Returns the largest value of the bucket containing the given percentile, limited to the maximum value recorded. ``0`` if the histogram is empty"""
+            rank = max(math.ceil(self.count * percent / 100), 1)
+            for bucket in sorted(self.buckets):
+                rank -= self.buckets[bucket]
+                if rank <= 0:
+                    return min(bucket, self.max)
+            return self.max
+
+    class MemoryReport:
+        """Data class for the memory allocated by a command, as traced by :mod:`tracemalloc`"""
+
+        def __init__(self, peak: int, current: int, snapshot: tracemalloc.Snapshot):
+            self.peak = peak
+            """The peak size of the memory traced while the command ran, in bytes"""
+            self.current = current
+            """The size of the memory traced which was still allocated after the command, in bytes"""
+            self.snapshot = snapshot
+            """The snapshot of the memory which was still allocated after the command"""
+
+        def top(self, limit: int = 10) -> list[tracemalloc.Statistic]:
+            """Returns the sites which allocated the most memory that was still allocated after the command"""
+            return self.snapshot.statistics("lineno")[:limit]
+
+    class StackSampler:
+        """Samples the stack of a thread from a background thread while the thread is running :meth:`Calculator.interpret`. Unlike :mod:`cProfile`, the sampled thread runs at full speed, so the times of long commands are not distorted"""
+
+        interpret_code = Calculator.interpret.__wrapped__.__code__  # type: ignore
+
+        def __init__(self, thread_id: int, interval: float = 0.005, filename: str = "<console>"):
+            """Initializes the sampler without starting it
+
+            Parameters
+            ----------
+            thread_id : :class:`int`
+                The identifier of the thread to sample, from :func:`threading.get_ident`
+            interval : :class:`float`
+                The time between samples, in seconds. Samples may be delayed while the sampled thread holds the GIL, see :func:`sys.setswitchinterval`
+            filename : :class:`str`
+                The filename of the code compiled by the calculator. Stacks are collapsed from the outermost frame of the command, and the frames of the calculator which run it are left out
+            """
+            self.thread_id = thread_id
+            self.interval = interval
+            self.filename = filename
+            self.samples = 0
+            """The number of stacks sampled"""
+            self.stacks: dict[str, int] = {}
+            """The number of samples of each collapsed stack. The frames of a stack are separated by semicolons, from the outermost to the innermost"""
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self.run, name="symcalc-stack-sampler", daemon=True)
+
+        def start(self) -> None:
+            self.thread.start()
+
+        def stop(self) -> None:
+            self.stopped.set()
+            self.thread.join()
+
+        def run(self) -> None:
+            while not self.stopped.wait(self.interval):
+                self.sample()
+
+        def sample(self) -> None:
+            """Samples the stack of the thread once. Nothing is recorded unless the thread is running :meth:`Calculator.interpret`"""
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None and frame.f_code is not PerformanceMonitor.StackSampler.interpret_code:
+                frames.append(frame)
+                frame = frame.f_back
+            if frame is None or not frames:
+                return
+            frames.reverse()
+            for i, f in enumerate(frames):
+                if f.f_code.co_filename == self.filename:
+                    frames = frames[i:]
+                    break
+            stack = ";".join(f"{f.f_code.co_name} ({PerformanceMonitor.short_path(f.f_code.co_filename)}:{f.f_code.co_firstlineno})" for f in frames)
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+        def collapsed(self) -> str:
+            """Returns the stacks in the collapsed format read by ``flamegraph.pl`` and speedscope, with one stack and its number of samples per line"""
+            return "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items()))
+
     class PerformanceProfile:
         """Data class to store the events of a calculator command"""
 
@@ -107,6 +314,7 @@ class PerformanceMonitor(CalculatorPlugin):
             self.enabled = False
             self.active_event = None
             self.title = False
+            self.output: Callable[[str], None] = print
 
         def enable(self):
             self.enabled = True
@@ -163,25 +371,47 @@ class PerformanceMonitor(CalculatorPlugin):
                 return
             if not self.title:
                 self.title = True
-                print("----------[ Performance ]----------")
-            print("Events:")
+                self.output("----------[ Performance ]----------")
+            self.output("Events:")
             for e in self.event_list:
-                print(f" - {e.get_event_str()}")
-            print("Profile:")
+                self.output(f" - {e.get_event_str()}")
+            self.output("Profile:")
             for e in self.event_list:
-                print(f" - {e.get_time_str()}")
+                self.output(f" - {e.get_time_str()}")
+
+        def print_spans(self, result: CalculatorResult | None) -> None:
+            """Prints the finished spans of an interaction as a tree, with the time spent in each phase, statement, and plugin hook"""
+            if not self.enabled or result is None:
+                return
+            self.output("Spans:")
+            for depth, span in result.walk_spans():
+                name = span.name if span.category in ("phase", "statement") else f"{span.name}.{span.category}"
+                detail = f" `{span.detail}`" if span.detail is not None else ""
+                duration = f"took {PerformanceMonitor.PerformanceEvent.format_duration(span.duration)}" if span.end else "is running"
+                self.output(f"{'  ' * depth} - {name}{detail} {duration}")
+
+        def print_counters(self, result: CalculatorResult | None) -> None:
+            """Prints the pipeline counters of an interaction"""
+            if not self.enabled or result is None or not result.counters:
+                return
+            self.output("Counters: " + ", ".join(f"{name} {n}" for name, n in sorted(result.counters.items())))
 
     class PerformanceMonitorHelper(CalculatorPlugin):
         """Helper plugin for PerformanceMonitor"""
 
-        def __init__(self, profile: PerformanceMonitor.PerformanceProfile):
+        def __init__(self, monitor: PerformanceMonitor):
             super().__init__(self.__class__.__name__, 9999)
-            self.profile = profile
+            self.monitor = monitor
+            self.profile = monitor.profile
 
         def begin_interaction(self, command: CalculatorCommand) -> None:
             # Executed after all plugins have been notified of the interaction
             self.profile.end_event()
 
+        def begin_execution(self, command: CalculatorCommand) -> None:
+            # Executed after all plugins have been notified of the execution, so that only the executed code is profiled
+            self.monitor.start_profilers(command.calc.console.filename)
+
         def parse_command(self, command: CalculatorCommand) -> None:
             # Executed after all of the command parsing is complete
             self.profile.end_event()
@@ -212,30 +442,511 @@ class PerformanceMonitor(CalculatorPlugin):
             # Executed after all of the failure handling is complete
             self.profile.end_event()
 
-        @CalculatorPlugin.if_external_enabled("performance_monitor")
         def end_interaction(self, command: CalculatorCommand) -> None:
             # Executed after everything is complete
+            self.monitor.stop_profilers(command.calc)
+            self.monitor.record(command.calc.result)
+            if not command.calc.settings["performance_monitor"]:
+                return
             self.profile.end_event()
             self.profile.print()
+            self.profile.print_spans(command.calc.result)
+            self.profile.print_counters(command.calc.result)
             self.profile.clear()
             self.profile.disable()
 
     def __init__(self):
         super().__init__(self.__class__.__name__, 0)
         self.profile = PerformanceMonitor.PerformanceProfile()
-        self.helper = PerformanceMonitor.PerformanceMonitorHelper(self.profile)
+        self.profile_next = False
+        """Whether the next command should be profiled with :mod:`cProfile`"""
+        self.trace_memory_next = False
+        """Whether the memory of the next command should be traced with :mod:`tracemalloc`"""
+        self.profiler: cProfile.Profile | None = None
+        self.tracing_memory = False
+        self.started_tracing = False
+        """Whether ``/mem`` started :mod:`tracemalloc`, which is then stopped after the command. Tracing which was already running is left running"""
+        self.memory_report: PerformanceMonitor.MemoryReport | None = None
+        """The memory traced by ``/mem`` while the current command was executed, which is reported when the command ends"""
+        self.last_profile: pstats.Stats | None = None
+        """The profile of the last command profiled by ``/prof``"""
+        self.last_memory: PerformanceMonitor.MemoryReport | None = None
+        """The memory report of the last command traced by ``/mem``"""
+        self.sampler: PerformanceMonitor.StackSampler | None = None
+        self.sample_interval: float | None = None
+        """The time between the samples of the stack, in seconds, or ``None`` if the commands are not sampled"""
+        self.sample_file = None
+        """The file which the collapsed stacks are written to, or ``None`` if the commands are not sampled"""
+        self.last_samples: PerformanceMonitor.StackSampler | None = None
+        """The sampler of the last command sampled by ``/sample``"""
+        self.interactions = 0
+        """The number of interactions recorded"""
+        self.slow_threshold: int | None = None
+        """The duration of an interaction, in ns, above which it is written to the slow command log, or ``None`` if the log is disabled"""
+        self.slow_log: logging.handlers.RotatingFileHandler | None = None
+        self.trace_file = None
+        """The file which the spans are written to, or ``None`` if they are not traced"""
+        self.trace_format = "chrome"
+        self.stats: dict[str, PerformanceMonitor.LatencyHistogram] = {}
+        """The latency histogram of each phase, statement, and plugin hook across the session, keyed by name"""
+        self.last_counters: dict[str, int] = {}
+        """The pipeline counters of the last command which was executed. See :attr:`CalculatorResult.counters`"""
+        self.helper = PerformanceMonitor.PerformanceMonitorHelper(self)
 
     def hook(self, calc: Calculator) -> None:
         # Register the helper and toggles for this plugin
         self.register_toggle(calc, "pp", "performance_monitor", False)
         self.register_raw_toggle(calc, "pm", "performance_monitor", False)
+        self.profile.output = calc.handle_output
         calc.register_plugin(self.helper)
+        calc.register_directive("importtime", self.report_import_time)
+        calc.register_directive("perfstats", self.report_stats)
+        calc.register_directive("counters", self.report_counters)
+        calc.register_directive("trace", self.trace_directive)
+        calc.register_directive("slowlog", self.slow_log_directive)
+        calc.register_directive("prof", lambda calc, command: setattr(self, "profile_next", True))
+        calc.register_directive("mem", lambda calc, command: setattr(self, "trace_memory_next", True))
+        calc.register_directive("sample", self.sample_directive)
+
+    def start_profilers(self, filename: str = "<console>") -> None:
+        """Starts the profilers requested for the command, or resumes them if they were paused after other code of the command was executed, and starts the stack sampler if the commands are sampled. Called just before code of the command is executed
+
+        Parameters
+        ----------
+        filename : :class:`str`
+            The filename of the code compiled by the calculator, see :class:`PerformanceMonitor.StackSampler`
+        """
+        if self.profile_next:
+            self.profile_next = False
+            self.profiler = cProfile.Profile()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another profiler is already active
+                self.profiler = None
+        if self.trace_memory_next:
+            self.trace_memory_next = False
+            self.tracing_memory = True
+            self.memory_report = None
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start()
+        if self.tracing_memory:
+            tracemalloc.reset_peak()
+        if self.sample_interval is not None and self.sampler is None:
+            # The sampler only records stacks while code is executed, so it keeps running until the command ends
+            self.sampler = PerformanceMonitor.StackSampler(threading.get_ident(), self.sample_interval, filename)
+            self.sampler.start()
+
+    def pause_profilers(self) -> None:
+        """Pauses the profilers just after code of the command was executed, so that the plugins notified between the statements of the command are not measured"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.tracing_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.memory_report is not None:
+                peak = max(peak, self.memory_report.peak)
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            self.memory_report = PerformanceMonitor.MemoryReport(peak, current, snapshot)
+
+    def stop_profilers(self, calc: Calculator) -> None:
+        """Stops the profilers once the command ends and outputs their reports"""
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.last_profile = pstats.Stats(self.profiler)
+            self.profiler = None
+            self.report_profile(calc, self.last_profile)
+        if self.tracing_memory:
+            self.tracing_memory = False
+            if self.started_tracing:
+                self.started_tracing = False
+                tracemalloc.stop()
+            if self.memory_report is not None:
+                self.last_memory = self.memory_report
+                self.memory_report = None
+                self.report_memory(calc, self.last_memory)
+        if self.sampler is not None:
+            self.sampler.stop()
+            if self.sampler.samples:
+                self.last_samples = self.sampler
+                if self.sample_file is not None:
+                    self.sample_file.write(self.sampler.collapsed())
+                    self.sample_file.flush()
+            self.sampler = None
+
+    @staticmethod
+    def short_path(filename: str) -> str:
+        """Shortens the path of a module to start at its top level package"""
+        parts = filename.replace("\\", "/").split("/")
+        for package in ("sympy", "symcalc", "mpmath"):
+            if package in parts:
+                return "/".join(parts[len(parts) - parts[::-1].index(package) - 1 :])
+        return filename
+
+    def report_profile(self, calc: Calculator, stats: pstats.Stats, limit: int = 15) -> None:
+        """Outputs the SymPy functions with the most cumulative time in a profile, or every function if SymPy was not called"""
+        fmt = PerformanceMonitor.PerformanceEvent.format_duration
+        functions = sorted(stats.stats.items(), key=lambda x: -x[1][3])  # type: ignore
+        sympy_functions = [f for f in functions if "/sympy/" in f[0][0].replace("\\", "/")]
+        calc.handle_output("----------[ Profile ]----------")
+        calc.handle_output(f"Top {'SymPy functions' if sympy_functions else 'functions'} by cumulative time:")
+        for (filename, line, name), (_, calls, own, cumulative, _) in (sympy_functions or functions)[:limit]:
+            calc.handle_output(f" - {PerformanceMonitor.short_path(filename)}:{line}({name}): {calls} calls, {fmt(cumulative * 1e9)} cumulative, {fmt(own * 1e9)} own")
+
+    def report_memory(self, calc: Calculator, report: PerformanceMonitor.MemoryReport, limit: int = 10) -> None:
+        """Outputs the peak memory allocated by a command and the sites with the most memory allocated"""
+        calc.handle_output("----------[ Memory ]----------")
+        calc.handle_output(f"Peak allocation: {PerformanceMonitor.format_size(report.peak)}")
+        calc.handle_output(f"Still allocated: {PerformanceMonitor.format_size(report.current)}")
+        calc.handle_output("Top allocation sites:")
+        for statistic in report.top(limit):
+            frame = statistic.traceback[0]
+            calc.handle_output(f" - {PerformanceMonitor.short_path(frame.filename)}:{frame.lineno}: {PerformanceMonitor.format_size(statistic.size)} in {statistic.count} blocks")
+
+    @staticmethod
+    def format_size(size: float) -> str:
+        """Returns a formatted size, given in bytes, as a str"""
+        for unit in ("B", "KiB", "MiB"):
+            if size < 1024:
+                return f"{size:.3g} {unit}"
+            size /= 1024
+        return f"{size:.3g} GiB"
+
+    def record(self, result: CalculatorResult | None) -> None:
+        """Records the latency of the finished spans of an interaction in :attr:`PerformanceMonitor.stats`. The phase which ends the interaction is still running, and is not recorded"""
+        if result is None:
+            return
+        self.interactions += 1
+        if result.handled_command is not None:
+            self.last_counters = dict(result.counters)
+        finished = [span for span in result.spans if span.end]
+        if finished:
+            duration = max(span.end for span in finished) - finished[0].start
+            self.record_value("interaction", duration)
+            if self.slow_threshold is not None and duration > self.slow_threshold:
+                self.log_slow_command(result, duration)
+        for _, span in result.walk_spans():
+            if span.end:
+                self.record_value(span.name if span.category in ("phase", "statement") else f"{span.name}.{span.category}", span.duration)
+        if self.trace_file is not None:
+            events = self.trace_events(result)
+            if self.trace_format == "chrome":
+                self.trace_file.writelines(json.dumps(PerformanceMonitor.chrome_event(e)) + ",\n" for e in events)
+            else:
+                self.trace_file.writelines(json.dumps(e) + "\n" for e in events)
+            self.trace_file.flush()
+
+    def trace_events(self, result: CalculatorResult) -> list[dict[str, Any]]:
+        """Converts the finished spans of an interaction to events, starting with an event for the whole interaction
+
+        Parameters
+        ----------
+        result : :class:`CalculatorResult`
+            The result of the interaction
+
+        Returns
+        -------
+        :class:`list[dict[str, Any]]`
+            An event for each span with the ``interaction`` number, the ``name`` and ``category`` of the span, its ``depth``, its ``start`` and ``duration`` in ns, the ``command`` of the interaction, the ``plugin`` and ``hook`` of a call to a plugin, the ``detail`` of the span, and the number of ``resends`` of the command which started before the span
+        """
+        finished = [span for span in result.spans if span.end]
+        if not finished:
+            return []
+        events = [{"interaction": self.interactions, "name": "interaction", "category": "interaction", "depth": 0, "start": finished[0].start, "duration": max(span.end for span in finished) - finished[0].start, "command": result.command, "plugin": None, "hook": None, "detail": None, "resends": 0}]
+        resends = 0
+        for depth, span in result.walk_spans():
+            if PerformanceMonitor.is_resend(span):
+                resends += 1
+            if not span.end:
+                continue
+            plugin = span.category not in ("phase", "statement")
+            events.append(
+                {
+                    "interaction": self.interactions,
+                    "name": span.name,
+                    "category": span.category,
+                    "depth": depth + 1,
+                    "start": span.start,
+                    "duration": span.duration,
+                    "command": result.command,
+                    "plugin": span.name if plugin else None,
+                    "hook": span.category if plugin else None,
+                    "detail": span.detail,
+                    "resends": resends,
+                }
+            )
+        return events
+
+    @staticmethod
+    def is_resend(span: CalculatorResult.Span) -> bool:
+        """Returns whether a span is the processing of a resent command"""
+        return span.category == "phase" and span.name == "resend"
+
+    def start_slow_log(self, threshold: float, path: str = "symcalc-slow.log", max_bytes: int = 2**20, backups: int = 3) -> None:
+        """Starts logging the commands which take longer than a threshold, replacing any log which was running
+
+        Parameters
+        ----------
+        threshold : :class:`float`
+            The duration of an interaction above which it is logged, in ms
+        path : :class:`str`
+            The path of the log file, which is appended to
+        max_bytes : :class:`int`
+            The size of the log file at which it is rotated
+        backups : :class:`int`
+            The number of rotated log files which are kept
+        """
+        self.stop_slow_log()
+        self.slow_log = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self.slow_threshold = int(threshold * 1e6)
+
+    def stop_slow_log(self) -> None:
+        """Stops logging slow commands, and closes the log file"""
+        self.slow_threshold = None
+        if self.slow_log is not None:
+            self.slow_log.close()
+            self.slow_log = None
+
+    def log_slow_command(self, result: CalculatorResult, duration: int) -> None:
+        """Writes an interaction to the slow command log
+
+        Parameters
+        ----------
+        result : :class:`CalculatorResult`
+            The result of the interaction
+        duration : :class:`int`
+            The duration of the interaction, in ns
+        """
+        if self.slow_log is None:
+            return
+        phases: dict[str, int] = {}
+        plugins: dict[str, int] = {}
+        resends = 0
+        for _, span in result.walk_spans():
+            resends += PerformanceMonitor.is_resend(span)
+            if not span.end or span.category == "statement":
+                continue
+            times, name = (phases, span.name) if span.category == "phase" else (plugins, f"{span.name}.{span.category}")
+            times[name] = times.get(name, 0) + span.duration
+        record = {
+            "time": datetime.datetime.now().astimezone().isoformat(),
+            "command": result.command,
+            "handled_command": result.handled_command,
+            "duration": duration,
+            "resends": resends,
+            "counters": dict(sorted(result.counters.items())),
+            "success": result.success,
+            "result_type": None if result.value is None else f"{type(result.value).__module__}.{type(result.value).__qualname__}",
+            "errors": [e.strip().split("\n")[-1] for e in result.errors],
+            "phases": phases,
+            "plugins": dict(sorted(plugins.items(), key=lambda x: -x[1])),
+        }
+        self.slow_log.emit(logging.makeLogRecord({"msg": json.dumps(record), "levelno": logging.WARNING, "levelname": "WARNING"}))
+
+    def slow_log_directive(self, calc: Calculator, command: str) -> None:
+        """Starts the slow command log with the threshold in ms and the optional path given as the argument, or stops it if the argument is ``off``"""
+        if command == "off":
+            self.stop_slow_log()
+            calc.handle_output("Slow command log stopped")
+            return
+        if not command:
+            if self.slow_log is None or self.slow_threshold is None:
+                calc.handle_output("Slow command log is off")
+            else:
+                calc.handle_output(f"Logging commands slower than {self.slow_threshold / 1e6:g} ms to {self.slow_log.baseFilename}")
+            return
+        threshold, *path = command.split(maxsplit=1)
+        try:
+            self.start_slow_log(float(threshold), *path)
+        except (ValueError, OSError) as e:
+            calc.handle_output(f"The slow command log could not be started: {e}")
+            return
+        assert self.slow_log is not None
+        calc.handle_output(f"Logging commands slower than {threshold} ms to {self.slow_log.baseFilename}")
+
+    def start_sampling(self, rate: float, path: str = "symcalc-samples.folded") -> None:
+        """Starts sampling the stack of every command, and writing the collapsed stacks to a file, replacing any sampling which was running
+
+        Parameters
+        ----------
+        rate : :class:`float`
+            The number of samples per second
+        path : :class:`str`
+            The path of the file, which is overwritten. The stacks of each command which was sampled are appended to the file when the interaction ends
+        """
+        if not rate > 0:
+            raise ValueError("The sampling rate must be positive")
+        self.stop_sampling()
+        self.sample_file = open(path, "w")
+        self.sample_interval = 1 / rate
+
+    def stop_sampling(self) -> None:
+        """Stops sampling the commands, and closes the file of collapsed stacks"""
+        self.sample_interval = None
+        if self.sample_file is not None:
+            self.sample_file.close()
+            self.sample_file = None
+
+    def sample_directive(self, calc: Calculator, command: str) -> None:
+        """Starts sampling at the rate per second and to the optional path given as the argument, or stops sampling if the argument is ``off``"""
+        if command == "off":
+            self.stop_sampling()
+            calc.handle_output("Sampling stopped")
+            return
+        if not command:
+            if self.sample_file is None or self.sample_interval is None:
+                calc.handle_output("Sampling is off")
+            else:
+                calc.handle_output(f"Sampling {1 / self.sample_interval:g} times per second to {self.sample_file.name}")
+            return
+        rate, *path = command.split(maxsplit=1)
+        try:
+            self.start_sampling(float(rate), *path)
+        except (ValueError, OSError) as e:
+            calc.handle_output(f"Sampling could not be started: {e}")
+            return
+        assert self.sample_file is not None
+        calc.handle_output(f"Sampling {rate} times per second to {self.sample_file.name}")
+
+    @staticmethod
+    def chrome_event(event: dict[str, Any]) -> dict[str, Any]:
+        """Converts an event of :meth:`PerformanceMonitor.trace_events` to a complete event of the Chrome Trace Event format"""
+        name = f"{event['plugin']}.{event['hook']}" if event["plugin"] is not None else event["name"]
+        args = {k: event[k] for k in ("interaction", "command", "plugin", "hook", "detail", "resends") if event[k] is not None}
+        return {"name": name, "cat": event["category"], "ph": "X", "ts": event["start"] / 1000, "dur": event["duration"] / 1000, "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+
+    def start_trace(self, path: str, format: str | None = None) -> None:
+        """Starts writing the spans of each interaction to a file, replacing any trace which was running
+
+        Parameters
+        ----------
+        path : :class:`str`
+            The path of the file, which is overwritten
+        format : :class:`str` | None
+            ``"chrome"`` for the Chrome Trace Event format, ``"jsonl"`` for JSON lines, or ``None`` to choose by the extension of the path
+        """
+        self.stop_trace()
+        if format is None:
+            format = "jsonl" if path.endswith(".jsonl") else "chrome"
+        if format not in ("chrome", "jsonl"):
+            raise ValueError(f"Unknown trace format {format}")
+        self.trace_format = format
+        self.trace_file = open(path, "w")
+        if format == "chrome":
+            # The closing bracket is optional in the JSON array format, so that an unfinished trace can still be loaded
+            self.trace_file.write("[\n")
+
+    def stop_trace(self) -> None:
+        """Stops writing the spans to the trace file, and closes it"""
+        if self.trace_file is None:
+            return
+        if self.trace_format == "chrome":
+            self.trace_file.write(json.dumps({"name": "trace_end", "ph": "i", "s": "g", "ts": time.perf_counter_ns() / 1000, "pid": os.getpid(), "tid": threading.get_ident()}) + "\n]\n")
+        self.trace_file.close()
+        self.trace_file = None
+
+    def trace_directive(self, calc: Calculator, command: str) -> None:
+        """Starts a trace to the path given as the argument, or stops the trace if no path is given"""
+        if not command:
+            if self.trace_file is None:
+                calc.handle_output("No trace is running")
+                return
+            name = self.trace_file.name
+            self.stop_trace()
+            calc.handle_output(f"Trace written to {name}")
+            return
+        try:
+            self.start_trace(command)
+        except OSError as e:
+            calc.handle_output(f"The trace could not be started: {e}")
+            return
+        calc.handle_output(f"Tracing to {command}")
+
+    def record_value(self, name: str, value: int) -> None:
+        """Records a latency, in ns, in the histogram of the given name"""
+        histogram = self.stats.get(name)
+        if histogram is None:
+            histogram = self.stats[name] = PerformanceMonitor.LatencyHistogram()
+        histogram.record(value)
+
+    def report_stats(self, calc: Calculator, command: str) -> None:
+        """Outputs the latency statistics of the session, ordered by the total time spent, or clears them if the argument is ``reset``"""
+        if command == "reset":
+            self.stats.clear()
+            calc.handle_output("Performance statistics cleared")
+            return
+        if not self.stats:
+            calc.handle_output("No performance statistics recorded")
+            return
+        fmt = PerformanceMonitor.PerformanceEvent.format_duration
+        calc.handle_output("----------[ Performance Statistics ]----------")
+        for name, h in sorted(self.stats.items(), key=lambda x: -x[1].total):
+            calc.handle_output(f" - {name}: {h.count} calls, p50 {fmt(h.percentile(50))}, p90 {fmt(h.percentile(90))}, p99 {fmt(h.percentile(99))}, max {fmt(h.max)}")
+
+    def report_counters(self, calc: Calculator, command: str) -> None:
+        """Outputs the pipeline counters of the session and of the last command, or clears them if the argument is ``reset``"""
+        if command == "reset":
+            calc.counters.clear()
+            self.last_counters = {}
+            calc.handle_output("Pipeline counters cleared")
+            return
+        if not calc.counters:
+            calc.handle_output("No pipeline counters recorded")
+            return
+        calc.handle_output("----------[ Pipeline Counters ]----------")
+        for name, n in sorted(calc.counters.items()):
+            calc.handle_output(f" - {name}: {n} ({self.last_counters.get(name, 0)})")
+
+    @staticmethod
+    def import_time(module: str = "symcalc") -> list[tuple[str, int, int]]:
+        """Imports a module in a new interpreter with ``-X importtime``
+
+        Parameters
+        ----------
+        module : :class:`str`
+            The name of the module to import
+
+        Returns
+        -------
+        :class:`list[tuple[str, int, int]]`
+            The name, the time excluding nested imports, and the time including nested imports of each module imported, in ns and in the order they finished importing
+        """
+        # The package must be importable from the new interpreter, even if it was not installed
+        path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env = os.environ | {"PYTHONPATH": os.pathsep.join(filter(None, [path, os.environ.get("PYTHONPATH")]))}
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, env=env)
+        times = []
+        for line in process.stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) == 3 and fields[0].strip().isdigit():
+                times.append((fields[2].strip(), int(fields[0]) * 1000, int(fields[1]) * 1000))
+        return times
+
+    def report_import_time(self, calc: Calculator, command: str) -> None:
+        """Outputs the time taken to import SymCalc. See :meth:`PerformanceMonitor.import_time`"""
+        times = PerformanceMonitor.import_time("symcalc")
+        if not times:
+            calc.handle_output("The import time could not be measured")
+            return
+        packages = defaultdict(int)
+        for name, self_time, _ in times:
+            packages[name.split(".")[0]] += self_time
+        fmt = PerformanceMonitor.PerformanceEvent.format_duration
+        calc.handle_output("----------[ Import Time ]----------")
+        calc.handle_output(f"Importing `symcalc` took {fmt(sum(packages.values()))}")
+        calc.handle_output("Packages:")
+        for name, total in sorted(packages.items(), key=lambda x: -x[1])[:10]:
+            calc.handle_output(f" - {name} took {fmt(total)}")
+        calc.handle_output("Slowest modules of symcalc:")
+        for name, _, total in sorted((t for t in times if t[0].startswith("symcalc.")), key=lambda x: -x[2])[:10]:
+            calc.handle_output(f" - {name} took {fmt(total)}")
 
     @CalculatorPlugin.if_enabled
     def begin_interaction(self, command: CalculatorCommand) -> None:
         self.profile.clear()
         self.profile.enable()
-        print("----------[ Output ]----------")
+        command.calc.handle_output("----------[ Output ]----------")
         self.profile.start_event("Begin interaction", f"Begin interaction `{command.command}`")
 
     def parse_command(self, command: CalculatorCommand) -> None:
@@ -258,6 +969,13 @@ class PerformanceMonitor(CalculatorPlugin):
         self.profile.end_event()
         self.profile.start_event("Resending", f"Resending `{command.command}`")
 
+    def end_execution(self, command: CalculatorCommand) -> None:
+        # Executed before the other plugins are notified of the execution
+        self.pause_profilers()
+        if command is command.calc.incomplete_command:
+            # A completed multi-line command does not end its interaction
+            self.stop_profilers(command.calc)
+
     def command_success(self, command: CalculatorCommand) -> None:
         self.profile.end_event()
         self.profile.start_event("Success handling", "Successfully executed command")
@@ -36,14 +36,14 @@ class PrintCommand(CalculatorPlugin):
     @CalculatorPlugin.if_enabled
     def parse_command(self, command: CalculatorCommand) -> None:
         # Print the command if the plugin is enabled
-        print(f"Parsed Command: {command.command}")
+        command.calc.handle_output(f"Parsed Command: {command.command}")
 
     @CalculatorPlugin.if_enabled
     def handle_command(self, command: CalculatorCommand) -> None:
         # Print the command if the plugin is enabled
-        print(f"Handled Command: {command.command}")
+        command.calc.handle_output(f"Handled Command: {command.command}")
 
     @CalculatorPlugin.if_enabled
     def handle_resend(self, command: CalculatorCommand) -> None:
         # Print the command if the plugin is enabled
-        print(f"Resent command: {command.command}")
+        command.calc.handle_output(f"Resent command: {command.command}")
@@ -78,7 +78,7 @@ class NotationConstants(CalculatorPlugin):
         self.checker = NotationConstants.CheckNames(calc.context, self.table)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> str | None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Apply the substitution if enabled
         assert self.checker
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 import ast
+import keyword
+import tokenize
 
 from ...calc import Calculator
 from ...command import CalculatorCommand
@@ -40,6 +42,17 @@ class NotationFactorial(CalculatorPlugin):
         self.register_toggle(calc, "na", "notation_factorial", True)
         self.checker = NotationFactorial.CheckSubscripts()
 
+    @CalculatorPlugin.if_enabled
+    def repair_token(self, command: CalculatorCommand, tokens: list[tokenize.TokenInfo], index: int) -> tuple[str, int] | None:
+        # Replace exclamation marks after an operand
+        token = tokens[index]
+        if token.string != "!" or token.type not in (tokenize.OP, tokenize.ERRORTOKEN) or index == 0:
+            return None
+        previous = tokens[index - 1]
+        if previous.type == tokenize.NUMBER or previous.type == tokenize.NAME and not keyword.iskeyword(previous.string) or previous.string in (")", "]", "!"):
+            return "[__factorial__]", 1
+        return None
+
     @CalculatorPlugin.if_enabled
     def handle_syntax_error_obj(self, command: CalculatorCommand, exc: SyntaxError) -> None:
         # Find exclamation mark using syntax errors
@@ -50,6 +63,6 @@ class NotationFactorial(CalculatorPlugin):
             command.resend_command = True
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST to apply the substitutions
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
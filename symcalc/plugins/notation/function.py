@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import ast
-import code
+import functools
 import inspect
+import keyword
+import tokenize
 from typing import Any
 
 import sympy
@@ -50,9 +52,13 @@ class NotationFunction(CalculatorPlugin):
         def _sympy_(self):
             return self.expr
 
+        @functools.cached_property
+        def arg_names(self) -> list[str]:
+            """The names of the parameters of the function, inspected once per function"""
+            return inspect.getfullargspec(self.func).args
+
         def __call__(self, *args: tuple, **kwargs: tuple) -> Any:
-            arg_spec = inspect.getargspec(self.func)
-            if len(args) == len(arg_spec.args) != 0:
+            if len(args) == len(self.arg_names) != 0:
                 compose = True
                 nargs = None
                 for a in args:
@@ -61,10 +67,10 @@ class NotationFunction(CalculatorPlugin):
                         break
                     if isinstance(a, NotationFunction.MathFunction):
                         if nargs is None:
-                            nargs = len(inspect.getargspec(a.func).args)
+                            nargs = len(a.arg_names)
                         else:
-                            if len(inspect.getargspec(a.func).args) != nargs:
-                                raise ValueError(f"Cannot compose multiple multivariable MathFunctions with differing number of parameters, got {len(inspect.getargspec(a.func).args)} and expected {nargs}")
+                            if len(a.arg_names) != nargs:
+                                raise ValueError(f"Cannot compose multiple multivariable MathFunctions with differing number of parameters, got {len(a.arg_names)} and expected {nargs}")
                 if compose:
                     return NotationFunction.ComposedMathFunction(self, args, nargs)  # type: ignore
             return self.func(*args, **kwargs)
@@ -78,7 +84,7 @@ class NotationFunction(CalculatorPlugin):
         def __pow__(self, other) -> NotationFunction.ComposedMathFunction:
             if other == -1:
                 raise NotImplementedError("Inverse function not implemented")
-            return NotationFunction.ComposedMathFunction(NotationFunction.MathFunction("(x)", sympy.Symbol("x") ** other, f"x**{other}", lambda x: x**other), [self], len(inspect.getargspec(self.func).args))
+            return NotationFunction.ComposedMathFunction(NotationFunction.MathFunction("(x)", sympy.Symbol("x") ** other, f"x**{other}", lambda x: x**other), [self], len(self.arg_names))
 
         def __repr__(self) -> str:
             return f"MathFunction({self.args} -> {self.expr_str})"
@@ -90,7 +96,7 @@ class NotationFunction(CalculatorPlugin):
             if args_func_narg is None:
                 args_symbols = [sympy.Symbol(f"arg{i+1}") for i in range(10)]
             elif args_func_narg == 1:
-                args_symbols = [sympy.Symbol(x) for x in inspect.getargspec(f.func).args]
+                args_symbols = [sympy.Symbol(x) for x in f.arg_names]
             else:
                 args_symbols = [sympy.Symbol(f"arg{i+1}") for i in range(args_func_narg)]
 
@@ -130,7 +136,7 @@ class NotationFunction(CalculatorPlugin):
             for index, name in zip(indexes, names):
                 stored = self.plugin.functions[name.id]
                 node.targets[index] = ast.Name(id=stored[0], ctx=ast.Load())
-            node.value = ast.Call(ast.Name(id="MathFunction", ctx=ast.Load()), [ast.Constant(f"({stored[1]})"), node.value, ast.Constant(ast.unparse(node.value)), ast.parse(f"lambda {stored[1]}:{ast.unparse(node.value)}")], [])
+            node.value = ast.Call(ast.Name(id="MathFunction", ctx=ast.Load()), [ast.Constant(f"({stored[1]})"), node.value, ast.Constant(ast.unparse(node.value)), ast.parse(f"lambda {stored[1]}:{ast.unparse(node.value)}", mode="eval").body], [])
             return self.generic_visit(node)
 
         def visit_NamedExpr(self, node: ast.NamedExpr) -> ast.AST | None:
@@ -138,7 +144,7 @@ class NotationFunction(CalculatorPlugin):
                 return self.generic_visit(node)
             stored = self.plugin.functions[node.target.id]
             node.target = ast.Name(id=stored[0], ctx=ast.Load())
-            node.value = ast.Call(ast.Name(id="MathFunction", ctx=ast.Load()), [ast.Constant(f"({stored[1]})"), node.value, ast.Constant(ast.unparse(node.value)), ast.parse(f"lambda {stored[1]}:{ast.unparse(node.value)}")], [])
+            node.value = ast.Call(ast.Name(id="MathFunction", ctx=ast.Load()), [ast.Constant(f"({stored[1]})"), node.value, ast.Constant(ast.unparse(node.value)), ast.parse(f"lambda {stored[1]}:{ast.unparse(node.value)}", mode="eval").body], [])
             return self.generic_visit(node)
 
     class FunctionDefinitionException(Exception):
@@ -162,6 +168,30 @@ class NotationFunction(CalculatorPlugin):
     def parse_command(self, command: CalculatorCommand) -> None:
         self.functions = {}
 
+    @CalculatorPlugin.if_enabled
+    def repair_token(self, command: CalculatorCommand, tokens: list[tokenize.TokenInfo], index: int) -> tuple[str, int] | None:
+        # Find function definitions of the form name(args) = expr or name(args) := expr
+        if tokens[index].type != tokenize.NAME or keyword.iskeyword(tokens[index].string):
+            return None
+        end = index + 1
+        if end >= len(tokens) or tokens[end].string != "(":
+            return None
+        end += 1
+        while end < len(tokens) and tokens[end].type == tokenize.NAME and tokens[end + 1].string in (",", ")"):
+            end += 2 if tokens[end + 1].string == "," else 1
+        if end + 1 >= len(tokens) or tokens[end].string != ")" or tokens[end + 1].string not in ("=", ":="):
+            return None
+        if tokens[end + 1].string == "=" and index and tokens[index - 1].type not in (tokenize.NEWLINE, tokenize.NL, tokenize.INDENT, tokenize.DEDENT) and tokens[index - 1].string not in (";", "="):
+            return None
+        try:
+            placeholder = self.found_function("".join(t.string for t in tokens[index : end + 1]))
+        except NotationFunction.FunctionDefinitionException as e:
+            command.calc.write_error(f"FunctionDefinitionException: {e.msg}\n")
+            command.print_error = False
+            command.abort = True
+            return None
+        return (placeholder, end + 1 - index) if placeholder is not None else None
+
     @CalculatorPlugin.if_enabled
     def handle_syntax_error_obj(self, command: CalculatorCommand, exc: SyntaxError) -> None:
         lines = command.command.split("\n")
@@ -180,7 +210,7 @@ class NotationFunction(CalculatorPlugin):
                 c = lines[exc.lineno - 1][: exc.offset - 1] + lines[exc.lineno - 1][exc.offset :]
                 t = lines[: exc.lineno - 1] + [c] + lines[exc.lineno :]
                 try:
-                    code.compile_command("\n".join(t))
+                    command.calc.compile_command("\n".join(t))
                 except SyntaxError as e:
                     if e.msg == 'expression cannot contain assignment, perhaps you meant "=="?' and e.offset is not None and e.end_offset is not None:
                         placeholder = self.found_function(c[e.offset - 1 : e.end_offset - 2])
@@ -190,7 +220,7 @@ class NotationFunction(CalculatorPlugin):
                         command.command = "\n".join(lines[: exc.lineno - 1] + [c] + lines[exc.lineno :])
                         command.resend_command = True
         except NotationFunction.FunctionDefinitionException as e:
-            print(f"FunctionDefinitionException: {e.msg}")
+            command.calc.write_error(f"FunctionDefinitionException: {e.msg}\n")
             command.print_error = False
             command.abort = True
 
@@ -210,6 +240,6 @@ class NotationFunction(CalculatorPlugin):
         return placeholder
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST to apply the substitutions
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
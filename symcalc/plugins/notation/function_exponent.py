@@ -79,8 +79,8 @@ class NotationFunctionExponent(CalculatorPlugin):
         self.checker = NotationFunctionExponent.CheckPows(calc)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # pass
         # print(command.command)
         # Walk the AST to apply the substitutions
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
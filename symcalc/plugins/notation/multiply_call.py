@@ -1,18 +1,22 @@
 from __future__ import annotations
 
 import ast
-import code
-import inspect
+import keyword
 import numbers
 import re as regex
+import string
+import tokenize
 from collections import defaultdict
+from typing import Any, Iterable
 
 import sympy
 import sympy.printing.printer
 
 from ...calc import Calculator
 from ...command import CalculatorCommand
+from ...context import CalculatorContext
 from ...plugin import CalculatorPlugin
+from .function import NotationFunction
 
 
 class NotationMultiplyCall(CalculatorPlugin):
@@ -45,6 +49,38 @@ class NotationMultiplyCall(CalculatorPlugin):
             2⋅x ⋅y
     """
 
+    class NameTrie:
+        """A trie of names, stored in reverse to find the known names which end at a position of an identifier"""
+
+        def __init__(self, names: Iterable[str] = ()):
+            self.root: dict[str, dict] = {}
+            for name in names:
+                self.add(name)
+
+        def add(self, name: str) -> None:
+            node = self.root
+            for c in reversed(name):
+                node = node.setdefault(c, {})
+            node[""] = {}
+
+        def remove(self, name: str) -> None:
+            node = self.root
+            for c in reversed(name):
+                if (node := node.get(c)) is None:
+                    return
+            node.pop("", None)
+
+        def longest_suffix(self, data: str, end: int) -> int | None:
+            """Returns the start of the longest name which is a suffix of ``data[:end]``, or ``None`` if there is no such name"""
+            node = self.root
+            start = None
+            i = end
+            while i > 0 and (node := node.get(data[i - 1])) is not None:
+                i -= 1
+                if "" in node:
+                    start = i
+            return start
+
     class CheckResolutions(ast.NodeTransformer):
         """Checks all of the resolutions of the ast to see there are better resolutions then leaving them unknown"""
 
@@ -92,9 +128,7 @@ class NotationMultiplyCall(CalculatorPlugin):
             if len(node.args) == 1 and not node.keywords:
                 if isinstance(node.func, ast.Call) and len(node.func.args) == 1 and not node.func.keywords and isinstance(node.func.args[0], ast.Name):
                     resolved = self.plugin.resolve(node.func.args[0].id)
-                    f = self.calc.getsym(resolved[-1]) if self.calc.chksym(resolved[-1]) else None
-                    fas = inspect.getfullargspec(f) if callable(f) else None
-                    if isinstance(f, sympy.core.function.FunctionClass) or fas is not None and (len(fas.args) == 1 or (not fas.args and fas.varargs is not None)):
+                    if self.calc.chksym(resolved[-1]) and self.calc.inspect_callable(self.calc.getsym(resolved[-1])).unary:
                         parent = node.func
                         child = node
                         child.func = node.func.args[0]
@@ -106,35 +140,176 @@ class NotationMultiplyCall(CalculatorPlugin):
             return new_node
 
     class CheckCalls(ast.NodeTransformer):
-        """Checks the ast for using brackets to denote multiplication by juxtaposition if the function is not normally callable"""
+        """Checks the ast for using brackets to denote multiplication by juxtaposition if the function is not normally callable. The callee is resolved statically from the calculator context, and only attribute and subscript chains are evaluated"""
+
+        chain_limit = 8
+        """The maximum number of attributes and subscripts in a chain that is evaluated"""
+
+        expression_functions = frozenset([sympy.sqrt, sympy.cbrt, sympy.root, sympy.real_root, sympy.diff, sympy.integrate, sympy.limit, sympy.series, sympy.summation, sympy.product, sympy.simplify, sympy.expand, sympy.factor, sympy.cancel, sympy.together, sympy.apart, sympy.collect, sympy.radsimp, sympy.ratsimp, sympy.trigsimp, sympy.powsimp, sympy.combsimp, sympy.nsimplify, sympy.expand_trig, sympy.expand_log, sympy.expand_complex, sympy.logcombine, sympy.N])
+        """The SymPy functions which give an expression when their first argument is a number or an expression"""
+
+        expression_methods = frozenset(["subs", "xreplace", "evalf", "n", "doit", "diff", "integrate", "limit", "series", "simplify", "expand", "factor", "cancel", "together", "apart", "collect", "rewrite", "trigsimp", "powsimp", "nsimplify"])
+        """The methods of SymPy expressions which give an expression"""
 
         def __init__(self, plugin: NotationMultiplyCall, calc: Calculator):
             self.plugin = plugin
             self.calc = calc
+            self.chains: dict[str, bool] = {}
 
         def visit_Call(self, node: ast.Call) -> ast.AST | None:
             new_node = self.generic_visit(node)
-            try:
-                if isinstance(new_node, ast.Call) and len(new_node.args) == 1 and isinstance(eval(ast.unparse(new_node.func), self.calc.context.__dict__, self.calc.context.__dict__), numbers.Number | sympy.core.Expr):
-                    return self.generic_visit(ast.BinOp(new_node.func, ast.Mult(), new_node.args[0]))
-            except Exception:
-                pass
+            if isinstance(new_node, ast.Call) and len(new_node.args) == 1 and self.is_number(new_node.func):
+                return self.generic_visit(ast.BinOp(new_node.func, ast.Mult(), new_node.args[0]))
             return new_node
 
+        def is_number(self, node: ast.expr) -> bool:
+            """Returns whether the expression evaluates to a number or a SymPy expression, without evaluating it
+
+            Parameters
+            ----------
+            node : :class:`ast.expr`
+                The expression to check
+
+            Returns
+            -------
+            :class:`bool`
+                Whether the expression is known to be a number or a SymPy expression
+            """
+            if isinstance(node, ast.Constant):
+                return isinstance(node.value, numbers.Number)
+            if isinstance(node, ast.Name):
+                try:
+                    return self.calc.inspect_callable(self.calc.getsym(node.id)).number
+                except KeyError:
+                    return False
+            if isinstance(node, ast.UnaryOp):
+                return isinstance(node.op, ast.UAdd | ast.USub) and self.is_number(node.operand)
+            if isinstance(node, ast.BinOp):
+                return isinstance(node.op, ast.Add | ast.Sub | ast.Mult | ast.Div | ast.FloorDiv | ast.Mod | ast.Pow) and self.is_number(node.left) and self.is_number(node.right)
+            if isinstance(node, ast.Call):
+                # Methods such as k.subs(x, 2) of an expression give an expression
+                if isinstance(node.func, ast.Attribute):
+                    return node.func.attr in self.expression_methods and self.is_number(node.func.value)
+                try:
+                    f = self.calc.getsym(node.func.id) if isinstance(node.func, ast.Name) else None
+                except KeyError:
+                    return False
+                # Sympifying a number literal, such as the numbers made exact by AutoExact, or a number gives a number
+                if self.is_sympify(f) and len(node.args) == 1:
+                    return self.is_number_literal(node.args[0].value) if isinstance(node.args[0], ast.Constant) else self.is_number(node.args[0])
+                # Functions defined with NotationFunction give an expression of numbers, and a composed function of functions
+                if isinstance(f, NotationFunction.MathFunction):
+                    return bool(node.args) and all(self.is_number(arg) for arg in node.args)
+                # Functions such as sqrt(2) or diff(x**2, x) give an expression of an expression
+                if self.is_expression_function(f):
+                    return bool(node.args) and self.is_number(node.args[0])
+                # Constructing a SymPy expression, such as sin(x) or Symbol("x"), gives an expression
+                return isinstance(f, type) and issubclass(f, sympy.core.Expr) and f is not sympy.Function
+            if isinstance(node, ast.Attribute | ast.Subscript):
+                return self.is_number_chain(node)
+            return False
+
+        def is_expression_function(self, f: Any) -> bool:
+            """Returns whether the value is one of :attr:`NotationMultiplyCall.CheckCalls.expression_functions`"""
+            try:
+                return f in self.expression_functions
+            except TypeError:
+                # Unhashable values are not SymPy functions
+                return False
+
+        @staticmethod
+        def is_sympify(f: Any) -> bool:
+            """Returns whether the value is :func:`sympy.sympify` or its shorthand :data:`sympy.S`"""
+            return f is sympy.sympify or f is sympy.S
+
+        def literal_index(self, node: ast.expr) -> Any:
+            """Returns the value of a constant subscript, including number literals made exact by AutoExact such as ``sympify('1', rational=True)``
+
+            Parameters
+            ----------
+            node : :class:`ast.expr`
+                The slice of the subscript
+
+            Returns
+            -------
+            Any
+                The value of the subscript
+
+            Raises
+            ------
+            :class:`ValueError`
+                If the subscript is not a constant
+            """
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd | ast.USub):
+                value = self.literal_index(node.operand)
+                return -value if isinstance(node.op, ast.USub) else value
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.args and isinstance(literal := node.args[0], ast.Constant) and isinstance(literal.value, str):
+                try:
+                    f = self.calc.getsym(node.func.id)
+                except KeyError:
+                    raise ValueError(f"Unknown name {node.func.id}")
+                if self.is_sympify(f):
+                    return ast.literal_eval(literal.value.strip())
+            return ast.literal_eval(node)
+
+        @staticmethod
+        def is_number_literal(value: Any) -> bool:
+            """Returns whether the value is a number or a string of a number literal, including repeating decimals such as ``0.1[3]``"""
+            if isinstance(value, numbers.Number):
+                return True
+            if not isinstance(value, str):
+                return False
+            if regex.match(r"^\d*\.\d*\[\d+\]$", value):
+                return True
+            try:
+                return isinstance(literal := ast.literal_eval(value.strip()), numbers.Number) and not isinstance(literal, bool)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                return False
+
+        def is_number_chain(self, node: ast.Attribute | ast.Subscript) -> bool:
+            """Returns whether a chain of attributes and constant subscripts of a name evaluates to a number or a SymPy expression. The chains are evaluated at most once per command"""
+            key = ast.unparse(node)
+            if (known := self.chains.get(key)) is not None:
+                return known
+            chain: list[ast.Attribute | ast.Subscript] = []
+            root = node
+            while isinstance(root, ast.Attribute | ast.Subscript) and len(chain) < self.chain_limit:
+                chain.append(root)
+                root = root.value
+            known = False
+            if isinstance(root, ast.Name):
+                try:
+                    value = self.calc.getsym(root.id)
+                    for link in reversed(chain):
+                        value = getattr(value, link.attr) if isinstance(link, ast.Attribute) else value[self.literal_index(link.slice)]
+                    known = isinstance(value, numbers.Number | sympy.core.Expr)
+                except Exception:
+                    pass
+            self.chains[key] = known
+            return known
+
     class NotationMultiplyHelper(CalculatorPlugin):
         """Helper plugin for NotationMultiply"""
 
-        def __init__(self, caller: ast.NodeTransformer):
+        def __init__(self, caller: NotationMultiplyCall.CheckCalls):
             super().__init__(self.__class__.__name__, 25)
             self.transformer = caller
 
-        def handle_command(self, command: CalculatorCommand) -> None:
+        def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
             """Check the ast for multiplication if two expressions are called"""
-            command.command_ast = ast.fix_missing_locations(self.transformer.visit(command.command_ast))
+            self.transformer.chains.clear()
+            return ast.fix_missing_locations(self.transformer.visit(tree))
+
+    base_trie: NotationMultiplyCall.NameTrie | None = None
+    """The names of :attr:`CalculatorContext.base`, shared by all instances of the plugin"""
 
     def __init__(self):
         super().__init__(self.__class__.__name__, 21)
         self.check_resolutions = None
+        self.session_trie = NotationMultiplyCall.NameTrie()
+        self.session_names: set[str] = set()
+        self.resolutions: dict[str, list[str]] = {}
+        self.resolutions_version = None
         self.resolutions_ignored_types_not_last = set(
             [
                 type(sympy.Basic),
@@ -149,32 +324,112 @@ class NotationMultiplyCall(CalculatorPlugin):
         )
 
     def resolve(self, data: str) -> list[str]:
+        """Splits a name into the names which are multiplied by juxtaposition. The resolutions are memoized, and are discarded when the calculator context has changed at the start of parsing or transforming a command
+
+        Parameters
+        ----------
+        data : :class:`str`
+            The name to resolve
+
+        Returns
+        -------
+        :class:`list[str]`
+            The resolved names, in order
+        """
         data = data.strip()
         if data.startswith("_"):
             return [data]
+        if (resolved := self.resolutions.get(data)) is None:
+            resolved = self.resolutions[data] = self.resolve_uncached(data)
+        return resolved.copy()
+
+    def resolve_uncached(self, data: str) -> list[str]:
+        # From the right, repeatedly take the longest known or indexed name, leaving unknown characters in their own name
         original_data = data
         end = len(data)
         ret = []
         while end > 0:
-            found = False
-            for i in range(end):
-                if data[i:end] and self.calc.chksym(data[i:end]) or regex.match(r"^[a-zA-Z]+_?[0-9]+$", data[i:end]):
-                    if (ret or end != len(data)) and self.calc.chksym(data[i:end]) and type(self.calc.getsym(data[i:end])) in self.resolutions_ignored_types_not_last:
-                        return [original_data]
-                    if end != len(data):
-                        ret.append(data[end:])
-                    ret.append(data[i:end])
-                    end = i
-                    data = data[:i]
-                    found = True
-            if not found:
-                if end == 1:
-                    ret.append(data)
-                    break
+            starts = [i for i in (self.base_trie.longest_suffix(data, end), self.session_trie.longest_suffix(data, end), self.indexed_start(data, end)) if i is not None]  # type: ignore
+            if starts:
+                i = min(starts)
+                if (ret or end != len(data)) and self.calc.chksym(data[i:end]) and type(self.calc.getsym(data[i:end])) in self.resolutions_ignored_types_not_last:
+                    return [original_data]
+                if end != len(data):
+                    ret.append(data[end:])
+                ret.append(data[i:end])
+                end = i
+                data = data[:i]
+            elif end == 1:
+                ret.append(data)
+                break
+            else:
                 end -= 1
         ret.reverse()
         return ret
 
+    def update_names(self) -> None:
+        """Updates the tries of known names with the bindings which changed in the calculator context, and discards the memoized resolutions"""
+        if (version := self.calc.context_version) == self.resolutions_version:
+            return
+        self.resolutions.clear()
+        self.resolutions_version = version
+        if NotationMultiplyCall.base_trie is None:
+            NotationMultiplyCall.base_trie = NotationMultiplyCall.NameTrie(k for k in CalculatorContext.base if k != "_")
+        names = set(self.calc.symbol_index)
+        names.discard("_")
+        for name in names - self.session_names:
+            self.session_trie.add(name)
+        for name in self.session_names - names:
+            self.session_trie.remove(name)
+        self.session_names = names
+
+    @staticmethod
+    def indexed_start(data: str, end: int) -> int | None:
+        """Returns the start of the longest name which is a suffix of ``data[:end]`` and matches ``^[a-zA-Z]+_?[0-9]+$``, such as ``x2`` or ``ab_12``, or ``None`` if there is no such name"""
+        digits = end
+        while digits > 0 and data[digits - 1] in string.digits:
+            digits -= 1
+        if digits == end:
+            return None
+        letters = digits - 1 if digits > 0 and data[digits - 1] == "_" else digits
+        i = letters
+        while i > 0 and data[i - 1] in string.ascii_letters:
+            i -= 1
+        return i if i < letters else None
+
+    def is_unary(self, data: str) -> bool:
+        """Returns whether the last resolution of the given name is a function of a single variable
+
+        Parameters
+        ----------
+        data : :class:`str`
+            The name to check
+
+        Returns
+        -------
+        :class:`bool`
+            Whether juxtaposing the name with another expression should call the function instead of multiplying
+        """
+        try:
+            resolved = self.resolve(data)
+            return self.calc.chksym(resolved[-1]) and self.calc.inspect_callable(self.calc.getsym(resolved[-1])).unary
+        except Exception:
+            return False
+
+    @staticmethod
+    def is_operand_end(token: tokenize.TokenInfo) -> bool:
+        """Returns whether the token can end an operand, such as a name, number, closing bracket or factorial"""
+        if token.type == tokenize.NAME:
+            return not keyword.iskeyword(token.string) and (token.string == "_" or not keyword.issoftkeyword(token.string))
+        return token.type == tokenize.NUMBER or token.string in (")", "]", "!") and token.type in (tokenize.OP, tokenize.ERRORTOKEN)
+
+    @staticmethod
+    def is_operand_start(token: tokenize.TokenInfo) -> bool:
+        """Returns whether the token can start an operand which is not already valid syntax after another operand, such as a name or a number"""
+        if token.type == tokenize.NAME:
+            return not keyword.iskeyword(token.string) and (token.string == "_" or not keyword.issoftkeyword(token.string))
+        return token.type == tokenize.NUMBER
+
     def hook(self, calc: Calculator) -> None:
         # Register the helper and the toggles for this plugin
         self.register_toggle(calc, "nm", "notation_multiply", True)
@@ -186,9 +441,21 @@ class NotationMultiplyCall(CalculatorPlugin):
         calc.register_plugin(self.helper)
 
     def parse_command(self, command: CalculatorCommand) -> None:
+        self.update_names()
         self.try_mult = True
         self.try_mult_prevent: defaultdict[int, set[int]] = defaultdict(set)
 
+    @CalculatorPlugin.if_enabled
+    def repair_token(self, command: CalculatorCommand, tokens: list[tokenize.TokenInfo], index: int) -> tuple[str, int] | None:
+        # Juxtaposed operands are multiplied, unless the left operand is a single variable function
+        if index == 0 or not self.is_operand_start(token := tokens[index]) or not self.is_operand_end(previous := tokens[index - 1]):
+            return None
+        if previous.type == tokenize.NUMBER and previous.end == token.start and token.string.startswith("_"):
+            return None
+        if previous.type == tokenize.NAME and self.is_unary(previous.string):
+            return f"({token.string})", 1
+        return f"*{token.string}", 1
+
     @CalculatorPlugin.if_enabled
     def handle_syntax_error_obj(self, command: CalculatorCommand, exc: SyntaxError) -> None:
         if exc.lineno is None or exc.end_lineno is None or exc.offset is None or exc.end_offset is None:
@@ -213,15 +480,8 @@ class NotationMultiplyCall(CalculatorPlugin):
                     attempt = lines.copy()
                     attempt[exc.lineno - 1] = f"{before}*{problem}{after}"
                     attempt = "\n".join(attempt)
-                    code.compile_command(attempt)
-                    try:
-                        resolved = self.resolve(before)
-                        left = self.calc.getsym(resolved[-1]) if self.calc.chksym(resolved[-1]) else None
-                        fas = inspect.getfullargspec(left) if callable(left) else None
-                        if isinstance(left, sympy.core.function.FunctionClass) or (fas is not None and (len(fas.args) == 1 or (fas.args is not None and fas.varargs is not None))):
-                            use_brackets = True
-                    except Exception:
-                        pass
+                    command.calc.compile_command(attempt)
+                    use_brackets = self.is_unary(before)
                     if use_brackets:
                         raise SyntaxError()
                     command.command = attempt
@@ -231,7 +491,7 @@ class NotationMultiplyCall(CalculatorPlugin):
                     pass
             lines[exc.lineno - 1] = f"{before}({problem}){after}"
             try:
-                code.compile_command("\n".join(lines))
+                command.calc.compile_command("\n".join(lines))
             except SyntaxError as e:
                 if e.lineno is None or e.offset is None or e.end_offset is None or (e.msg == exc.msg and problem == lines[e.lineno - 1][e.offset - 1 : e.end_offset - 1] and abs(exc.offset - e.offset) < 2):
                     return
@@ -242,26 +502,18 @@ class NotationMultiplyCall(CalculatorPlugin):
             problem = lines[exc.lineno - 1][exc.offset - 1 : exc.end_offset - 1]
             after = lines[exc.lineno - 1][exc.end_offset - 1 :]
             try:
-                code.compile_command(problem)
+                command.calc.compile_command(problem)
                 return
             except SyntaxError as e:
                 if e.offset is None or e.end_offset is None:
                     return
-                use_brackets = False
-                try:
-                    resolved = self.resolve(problem[: e.offset - 1])
-                    left = self.calc.getsym(resolved[-1]) if self.calc.chksym(resolved[-1]) else None
-                    fas = inspect.getfullargspec(left) if callable(left) else None
-                    if isinstance(left, sympy.core.function.FunctionClass) or (fas is not None and (len(fas.args) == 1 or (fas.args is not None and fas.varargs is not None))):
-                        use_brackets = True
-                except Exception:
-                    pass
+                use_brackets = self.is_unary(problem[: e.offset - 1])
                 if not use_brackets and exc.offset not in self.try_mult_prevent[exc.lineno - 1]:
                     try:
                         attempt = lines.copy()
                         attempt[exc.lineno - 1] = f"{before}{problem[: e.offset - 1]}*{problem[e.offset - 1:]}{after}"
                         attempt = "\n".join(attempt)
-                        code.compile_command(attempt)
+                        command.calc.compile_command(attempt)
                         command.command = attempt
                         command.resend_command = True
                         return
@@ -270,7 +522,7 @@ class NotationMultiplyCall(CalculatorPlugin):
                 n = f"{problem[: e.offset - 1]}({problem[e.offset - 1 : e.end_offset - 1]}){problem[e.end_offset - 1 :]}"
             lines[exc.lineno - 1] = f"{before}{n}{after}"
             try:
-                code.compile_command("\n".join(lines))
+                command.calc.compile_command("\n".join(lines))
             except SyntaxError as e:
                 if e.lineno is None or e.offset is None or e.end_offset is None or (e.msg == exc.msg and problem == lines[e.lineno - 1][e.offset - 1 : e.end_offset - 1] and abs(exc.offset - e.offset) < 2):
                     return
@@ -278,9 +530,9 @@ class NotationMultiplyCall(CalculatorPlugin):
             command.resend_command = True
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST to apply the substitution
-        new_ast = command.command_ast
-        new_ast = ast.fix_missing_locations(self.transform1.visit(new_ast))
+        self.update_names()
+        new_ast = ast.fix_missing_locations(self.transform1.visit(tree))
         new_ast = ast.fix_missing_locations(self.transform2.visit(new_ast))
-        command.command_ast = new_ast
+        return new_ast
@@ -44,6 +44,6 @@ class NotationOriginVectors(CalculatorPlugin):
         self.checker = NotationOriginVectors.CheckNames(calc)
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST and check for undefined symbols
-        command.command_ast = ast.fix_missing_locations(self.checker.visit(command.command_ast))
+        return ast.fix_missing_locations(self.checker.visit(tree))
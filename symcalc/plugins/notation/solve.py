@@ -127,9 +127,9 @@ class NotationSolve(CalculatorPlugin):
         self.transform4 = NotationSolve.EliminateEqualities()
 
     @CalculatorPlugin.if_enabled
-    def handle_command(self, command: CalculatorCommand) -> None:
+    def transform_command(self, command: CalculatorCommand, tree: ast.AST) -> ast.AST | None:
         # Walk the AST to apply the substitutions
-        new_ast = command.command_ast
+        new_ast = tree
         try:
             new_ast = ast.fix_missing_locations(self.transform1.visit(new_ast))
             new_ast = ast.fix_missing_locations(self.transform2.visit(new_ast))
@@ -137,4 +137,4 @@ class NotationSolve(CalculatorPlugin):
             new_ast = ast.fix_missing_locations(self.transform4.visit(new_ast))
         except ValueError as e:
             command.abort = True
-        command.command_ast = new_ast
+        return new_ast
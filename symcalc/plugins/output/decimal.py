@@ -37,20 +37,23 @@ class OutputDecimal(CalculatorPlugin):
     def hook(self, calc: Calculator) -> None:
         # Register the toggles for this plugin
         self.register_toggle(calc, "od", "output_decimal", True)
+        self.calc = calc
         setattr(calc.context, "output_decimal", self.output_decimal)
         setattr(calc.context, "check_number", self.check_number)
 
     @CalculatorPlugin.if_enabled
     def command_success(self, command: CalculatorCommand) -> None:
-        # Send the command to the interpreter to output the decimal represent
-        command.calc.interpret("try:\n\tdel _\nexcept NameError: pass\n")
+        # Send the assigned value to the interpreter to output the decimal represent
         if isinstance(command.command_ast, ast.Module | ast.Interactive) and isinstance(b := command.command_ast.body[-1], ast.Assign):
             c = self.last_result
             self.last_result = None
             command.calc.interpret("output_decimal(" + ast.unparse(b.targets[0]) + ")")
             self.last_result = c
-        else:
-            command.calc.interpret("try:\n\toutput_decimal(_)\nexcept NameError: pass\n")
+
+    @CalculatorPlugin.if_enabled
+    def command_result(self, command: CalculatorCommand, value: Any) -> None:
+        # Output the decimal represent of the result
+        self.output_decimal(value)
 
     def check_number(self, s: str | None) -> str | None:
         """Returns if the given string if it is a valid representation of a number
@@ -123,8 +126,9 @@ class OutputDecimal(CalculatorPlugin):
                     out_list.append(None)
             if should_print and out_list != [None] * len(out_list):
                 if not isinstance(self.last_result, list) or len(self.last_result) != len(out_list) or (True for i in range(len(out_list)) if self.last_result[i] == out_list[i]):
-                    print(f"Decimals: ", end="")
-                    sympy.pretty_print(out_list)
+                    self.calc.handle_output("Decimals: " + sympy.pretty(out_list))
+                    if self.calc.result is not None:
+                        self.calc.result.decimals = out_list
                     self.last_result = out_list
             return
         elif self.check_type(output):
@@ -140,6 +144,7 @@ class OutputDecimal(CalculatorPlugin):
                     if output.real == int(output.real) and output.imag == int(output.imag):
                         should_print = False
                 if should_print:
-                    print(f"Decimal: ", end="")
-                    sympy.pretty_print(d)
+                    self.calc.handle_output("Decimal: " + sympy.pretty(d))
+                    if self.calc.result is not None:
+                        self.calc.result.decimals = d
             self.last_result = d
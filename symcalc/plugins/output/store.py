@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Any
+
 import sympy
 
 from ...calc import Calculator
@@ -26,19 +28,19 @@ class OutputStore(CalculatorPlugin):
     def hook(self, calc: Calculator) -> None:
         # Register the toggles for this plugin
         self.context = calc.context
+        self.calc = calc
         self.register_toggle(calc, "os", "output_store", True)
         setattr(calc.context, "out", [None])
         setattr(calc.context, "output_store", self.output_store)
         self.last_found = None
 
     @CalculatorPlugin.if_enabled
-    def command_success(self, command: CalculatorCommand) -> None:
-        # Send the command to the interpreter to store the output
-        command.calc.interpret("try:\n\tdel _\nexcept NameError: pass\n")
+    def command_result(self, command: CalculatorCommand, value: Any) -> None:
+        # Store the result of the command
         if not command.calc.chksym("out"):
             setattr(command.calc.context, "out", [None])
             return
-        command.calc.interpret("try:\n\toutput_store(_)\nexcept NameError: pass\n")
+        self.output_store(value)
 
     def output_store(self, output) -> None:
         """Decide whether to store the output in the ``out`` variable if it is not already present. Available in the calculator context
@@ -52,8 +54,10 @@ class OutputStore(CalculatorPlugin):
             return
         if output in self.context.out and (n := self.context.out.index(output)):  # type:ignore
             if n != len(self.context.out) - 1 and n != self.last_found:  # type:ignore
-                print(f"Result in out[{n}]")
+                self.calc.handle_output(f"Result in out[{n}]")
             self.last_found = n
+            if self.calc.result is not None:
+                self.calc.result.out_index = n
             return
         if "__iter__" in dir(output):
             checks = []
@@ -70,7 +74,9 @@ class OutputStore(CalculatorPlugin):
             try:
                 if type(o) not in self.ignore_types and str(type(o)) != "<class 'sympy.core.assumptions.ManagedProperties'>":
                     self.context.out.append(output)  # type:ignore
-                    print(f"Result stored in out[{len(self.context.out)-1}]")  # type:ignore
+                    self.calc.handle_output(f"Result stored in out[{len(self.context.out)-1}]")  # type:ignore
+                    if self.calc.result is not None:
+                        self.calc.result.out_index = len(self.context.out) - 1  # type:ignore
                     break
             except AttributeError:
                 continue
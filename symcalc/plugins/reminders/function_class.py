@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Any
+
 import sympy
 
 from ...calc import Calculator
@@ -27,14 +29,15 @@ class ReminderFunctionClass(CalculatorPlugin):
         super().__init__(self.__class__.__name__, 10)
 
     def hook(self, calc: Calculator) -> None:
+        self.calc = calc
         setattr(calc.context, "output_functionclass", self.output_functionclass)
         self.register_toggle(calc, "rfc", "reminder_function_class", True)
 
     @CalculatorPlugin.if_enabled
-    def command_success(self, command: CalculatorCommand) -> None:
-        command.calc.interpret("try:\n\toutput_functionclass(_)\nexcept NameError: pass\n")
+    def command_result(self, command: CalculatorCommand, value: Any) -> None:
+        self.output_functionclass(value)
 
     def output_functionclass(self, out) -> None:
         """Checks if the output was a function class"""
         if isinstance(out, sympy.FunctionClass):
-            print(f"{out} is a function")
+            self.calc.handle_warning(f"{out} is a function")
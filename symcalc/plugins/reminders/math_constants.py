@@ -8,7 +8,7 @@ class ReminderMathConstants(CalculatorPlugin):
     """Calculator plugin to remind that ``E`` is capitalized and ``pi`` is not"""
 
     def __init__(self):
-        super().__init__(self.__class__.__name__, 10)
+        super().__init__(self.__class__.__name__, 4)
         self.eenabled = True
         self.pienabled = True
 
@@ -18,8 +18,8 @@ class ReminderMathConstants(CalculatorPlugin):
             return
         for s in command.command_symtable.get_symbols():
             if (d := s.get_name()) == "e" and self.eenabled:
-                print("`e` is a symbol. Did you mean `E`, Euler's number?")
+                command.calc.handle_warning("`e` is a symbol. Did you mean `E`, Euler's number?")
                 self.eenabled = False
             elif d == "Pi" and self.pienabled:
-                print("`Pi` is a symbol. Did you mean `pi`, 3.14?")
+                command.calc.handle_warning("`Pi` is a symbol. Did you mean `pi`, 3.14?")
                 self.pienabled = False
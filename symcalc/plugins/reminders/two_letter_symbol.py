@@ -11,7 +11,7 @@ class ReminderTwoLetterSymbol(CalculatorPlugin):
     """Calculator plugin to remind that symbols are not multiplied together automatically"""
 
     def __init__(self):
-        super().__init__(self.__class__.__name__, 10)
+        super().__init__(self.__class__.__name__, 4)
         self.enabled = True
         self.symbols = set()
 
@@ -33,4 +33,4 @@ class ReminderTwoLetterSymbol(CalculatorPlugin):
         for s in self.symbols:
             if command.calc.chksym(s) and isinstance(x := command.calc.getsym(s), sympy.Symbol) and str(x) == s:
                 command.calc.settings["reminder_two_letter_symbol"] = False
-                print(f"`{s}` was treated as a symbol. If you meant `{s[0]}*{s[1]}`, send `del {s}`, `{s[0]}` and then resend that command.")
+                command.calc.handle_warning(f"`{s}` was treated as a symbol. If you meant `{s[0]}*{s[1]}`, send `del {s}`, `{s[0]}` and then resend that command.")
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from typing import Any, Iterator
+
+
+class CalculatorResult:
+    """The structured result of a calculator interaction. Returned by :meth:`Calculator.evaluate` and available as :attr:`Calculator.result`"""
+
+    class Span:
+        """A timed part of an interaction, used as a context manager. Spans opened while another span of the same result is open are nested as its children"""
+
+        __slots__ = ("result", "name", "category", "detail", "start", "end", "children")
+
+        def __init__(self, result: CalculatorResult, name: str, category: str, detail: str | None = None):
+            """Initializes the span without starting it
+
+            Parameters
+            ----------
+            result : :class:`CalculatorResult`
+                The result which records the span
+            name : :class:`str`
+                The name of the span, such as the phase of the interaction or the name of a plugin
+            category : :class:`str`
+                The kind of span: ``"phase"`` for a phase of the interaction, ``"statement"`` for a statement of the command, or the name of the hook for a call to a plugin
+            detail : :class:`str` | None
+                Additional information, such as the code being executed
+            """
+            self.result = result
+            self.name = name
+            self.category = category
+            self.detail = detail
+            self.start = 0
+            """The time the span started, from :func:`time.perf_counter_ns`"""
+            self.end = 0
+            """The time the span ended, from :func:`time.perf_counter_ns`. ``0`` while the span is open"""
+            self.children: list[CalculatorResult.Span] = []
+            """The spans nested in this span, in the order they started"""
+
+        @property
+        def duration(self) -> int:
+            """The duration of the span in ns, or ``0`` while the span is open"""
+            return self.end - self.start if self.end else 0
+
+        def walk(self, depth: int = 0) -> Iterator[tuple[int, CalculatorResult.Span]]:
+            """Iterates over the span and its descendants in the order they started, with their depth"""
+            yield depth, self
+            for child in self.children:
+                yield from child.walk(depth + 1)
+
+        def __enter__(self) -> CalculatorResult.Span:
+            active = self.result.active_spans
+            (active[-1].children if active else self.result.spans).append(self)
+            active.append(self)
+            self.start = time.perf_counter_ns()
+            return self
+
+        def __exit__(self, *args) -> None:
+            self.end = time.perf_counter_ns()
+            active = self.result.active_spans
+            while active and active.pop() is not self:
+                pass
+
+        def __repr__(self) -> str:
+            return f"Span({self.name!r}, {self.category!r}, duration={self.duration})"
+
+    def __init__(self, command: str):
+        """Initializes an empty result
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The raw command that began the interaction
+        """
+        self.command = command
+        """The raw command that began the interaction"""
+        self.handled_command: str | None = None
+        """The command after being handled by all of the plugins. Multiple statements are separated by newlines. ``None`` if the command was never executed"""
+        self.value: Any = None
+        """The last value displayed during the interaction, or ``None`` if no value was displayed"""
+        self.success = False
+        """Whether every statement of the command executed successfully"""
+        self.complete = True
+        """Whether the command was complete. ``False`` if more input is required for a multi-line command"""
+        self.decimals: str | list[str | None] | None = None
+        """The decimal representation of the value, as reported by :class:`OutputDecimal`"""
+        self.out_index: int | None = None
+        """The index of the value in ``out``, as reported by :class:`OutputStore`"""
+        self.output: list[str] = []
+        """The messages written by the calculator and the plugins"""
+        self.warnings: list[str] = []
+        """The warnings and reminders written by the plugins"""
+        self.errors: list[str] = []
+        """The errors and tracebacks written during the interaction"""
+        self.timings: defaultdict[str, int] = defaultdict(int)
+        """The inclusive time spent in each phase of the interaction, in ns"""
+        self.spans: list[CalculatorResult.Span] = []
+        """The outermost spans of the interaction. See :class:`CalculatorResult.Span`"""
+        self.active_spans: list[CalculatorResult.Span] = []
+        """The spans which are open, from the outermost to the innermost"""
+        self.counters: defaultdict[str, int] = defaultdict(int)
+        """The work done by the pipeline during the interaction, such as the number of trial compiles and resends. See :meth:`Calculator.count`"""
+        self.terminated: str | None = None
+        """The limit which stopped the command when run by a :class:`CalculatorWorker`: ``"timeout"``, ``"memory"``, or ``"exited"`` if the worker process exited. ``None`` if the command was not stopped"""
+
+    def span(self, name: str, category: str, detail: str | None = None) -> CalculatorResult.Span:
+        """Creates a span to record a part of the interaction. See :class:`CalculatorResult.Span`"""
+        return CalculatorResult.Span(self, name, category, detail)
+
+    def walk_spans(self) -> Iterator[tuple[int, CalculatorResult.Span]]:
+        """Iterates over all of the spans in the order they started, with their depth"""
+        for span in self.spans:
+            yield from span.walk()
+
+    def __repr__(self) -> str:
+        return f"CalculatorResult({self.command!r} -> {self.value!r}, success={self.success})"
@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import os
+import signal
+import threading
+import time
+from typing import Callable, Iterable
+
+from .calc import Calculator
+from .defaultcalc import DefaultCalculator
+from .result import CalculatorResult
+
+
+def default_calculator() -> Calculator:
+    """Creates a :class:`DefaultCalculator` with the default plugins registered. The default factory of :class:`CalculatorWorker`"""
+    return DefaultCalculator().register_default_plugins()
+
+
+def serve(connection: multiprocessing.connection.Connection, factory: Callable[[], Calculator]) -> None:
+    """The main loop of a worker process. Creates the calculator and serves it with :func:`serve_calculator`
+
+    Parameters
+    ----------
+    connection : :class:`multiprocessing.connection.Connection`
+        The connection to the supervising :class:`CalculatorWorker`
+    factory : Callable[[], :class:`Calculator`]
+        Creates the calculator of the worker
+    """
+    serve_calculator(connection, factory())
+
+
+def serve_calculator(connection: multiprocessing.connection.Connection, calc: Calculator) -> None:
+    """Sends ``None`` to signal that the calculator is ready, then evaluates the commands received from the connection and sends back each :class:`CalculatorResult`, until ``None`` is received or the connection is closed
+
+    Parameters
+    ----------
+    connection : :class:`multiprocessing.connection.Connection`
+        The connection to the supervising :class:`CalculatorWorker`
+    calc : :class:`Calculator`
+        The calculator of the worker
+    """
+    connection.send(None)
+    while True:
+        try:
+            command = connection.recv()
+        except KeyboardInterrupt:
+            # An interruption which arrived after the command finished
+            continue
+        except EOFError:
+            break
+        if command is None:
+            break
+        try:
+            result = calc.evaluate(command)
+        except KeyboardInterrupt:
+            # An interruption which arrived outside of the executed code, such as in a plugin, abandons the rest of the command but keeps the session
+            result = calc.result if calc.result is not None and calc.result.command == command else CalculatorResult(command)
+            result.success = False
+            result.errors.append("KeyboardInterrupt\n")
+            calc.reset()
+        try:
+            connection.send(result)
+        except Exception as e:
+            result.warnings.append(f"The value could not be sent from the worker: {e!r}")
+            result.value = None
+            connection.send(result)
+
+
+def serve_zygote(connection: multiprocessing.connection.Connection, factory: Callable[[], Calculator]) -> None:
+    """The main loop of a zygote process. Creates the template calculator, then forks a session for each socket received from the connection and sends back the process ID of the session, until ``None`` is received or the connection is closed
+
+    Parameters
+    ----------
+    connection : :class:`multiprocessing.connection.Connection`
+        The connection to the supervising :class:`CalculatorZygote`
+    factory : Callable[[], :class:`Calculator`]
+        Creates the template calculator, which is copied into each session
+    """
+    calc = factory()
+    # Sessions are reaped automatically, since they are supervised by their workers instead
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    connection.send(None)
+    while True:
+        try:
+            if connection.recv() is None:
+                break
+            fd = multiprocessing.reduction.recv_handle(connection)
+        except KeyboardInterrupt:
+            continue
+        except EOFError:
+            break
+        pid = os.fork()
+        if pid == 0:
+            try:
+                connection.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                serve_calculator(multiprocessing.connection.Connection(fd), calc)
+            finally:
+                os._exit(0)
+        os.close(fd)
+        connection.send(pid)
+
+
+class CalculatorZygote:
+    """Creates a calculator once in a zygote process, and forks ready sessions from it for :class:`CalculatorWorker`. Each session is a copy of the template calculator, so importing SymPy, registering the plugins, and creating the context is only paid for once.
+
+    .. code-block::
+
+        >>> with CalculatorZygote() as zygote:
+        ...     workers = [CalculatorWorker(zygote=zygote, timeout=5) for _ in range(8)]
+
+    .. note:: The zygote requires :func:`os.fork`, and is only available on POSIX systems. The factory should not start threads, since only the thread which forks is copied into the sessions
+    """
+
+    def __init__(self, factory: Callable[[], Calculator] = default_calculator, start_method: str = "spawn"):
+        """Initializes the zygote. The zygote process is started with the first session
+
+        Parameters
+        ----------
+        factory : Callable[[], :class:`Calculator`]
+            Creates the template calculator in the zygote process. Must be picklable, such as a module level function or a class. Defaults to :func:`default_calculator`
+        start_method : :class:`str`
+            The :mod:`multiprocessing` start method of the zygote process
+
+        Raises
+        ------
+        :class:`OSError`
+            If :func:`os.fork` is not available
+        """
+        if not hasattr(os, "fork"):
+            raise OSError("A zygote requires os.fork")
+        self.factory = factory
+        self.mp_context = multiprocessing.get_context(start_method)
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.connection: multiprocessing.connection.Connection | None = None
+        self.lock = threading.RLock()
+
+    def __enter__(self) -> CalculatorZygote:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the zygote process is running"""
+        return self.process is not None and self.process.is_alive()
+
+    def start(self) -> None:
+        """Starts the zygote process if it is not running, and waits for its template calculator to be created
+
+        Raises
+        ------
+        :class:`EOFError`
+            The zygote process exited before its template calculator was created
+        """
+        with self.lock:
+            if self.alive:
+                return
+            self.kill()
+            self.connection, child = self.mp_context.Pipe()
+            self.process = self.mp_context.Process(target=serve_zygote, args=(child, self.factory), name="CalculatorZygote", daemon=True)
+            self.process.start()
+            child.close()
+            self.connection.recv()
+
+    def fork(self) -> tuple[int, multiprocessing.connection.Connection]:
+        """Forks a session from the zygote, starting the zygote if it is not running
+
+        Returns
+        -------
+        :class:`tuple[int, multiprocessing.connection.Connection]`
+            The process ID of the session and the connection to it, which is served by :func:`serve_calculator`
+
+        Raises
+        ------
+        :class:`EOFError`
+            The zygote process exited
+        """
+        with self.lock:
+            self.start()
+            assert self.connection is not None and self.process is not None
+            parent, child = multiprocessing.Pipe()
+            try:
+                self.connection.send(True)
+                multiprocessing.reduction.send_handle(self.connection, child.fileno(), self.process.pid)
+                pid = self.connection.recv()
+            except Exception:
+                parent.close()
+                raise
+            finally:
+                child.close()
+            return pid, parent
+
+    def kill(self) -> None:
+        """Kills the zygote process. The sessions which were already forked keep running"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.process = None
+
+    def close(self) -> None:
+        """Stops the zygote process. The sessions which were already forked keep running"""
+        with self.lock:
+            if self.alive:
+                assert self.connection is not None and self.process is not None
+                try:
+                    self.connection.send(None)
+                    self.process.join(1)
+                except OSError:
+                    pass
+            self.kill()
+
+
+class CalculatorWorker:
+    """Runs a :class:`Calculator` in a supervised worker process, which enforces a wall-clock limit and a memory limit on each command.
+
+    The worker process is reused across commands, so the session survives between commands. When a command exceeds the time limit, it is first interrupted as if by ``SIGINT``, which abandons the rest of the command, including the plugins handling it, and keeps the session. If it does not stop within the grace period, or if the worker exceeds the memory limit, the worker process is killed. The session is then lost, and a new worker process is started for the next command.
+
+    .. code-block::
+
+        >>> with CalculatorWorker(timeout=5, memory_limit=2**30) as worker:
+        ...     worker.evaluate("factorial(10**9)").terminated
+        'timeout'
+
+    Workers can also be forked from a :class:`CalculatorZygote`, which starts each session in milliseconds instead of importing and creating the calculator again.
+
+    .. note:: The memory limit is measured as the resident set size from ``/proc``, and is not enforced on systems without it
+    """
+
+    def __init__(self, factory: Callable[[], Calculator] = default_calculator, timeout: float | None = None, memory_limit: int | None = None, grace: float = 1, start_method: str = "spawn", zygote: CalculatorZygote | None = None):
+        """Initializes the worker. The worker process is started with the first command
+
+        Parameters
+        ----------
+        factory : Callable[[], :class:`Calculator`]
+            Creates the calculator in the worker process. Must be picklable, such as a module level function or a class. Defaults to :func:`default_calculator`
+        timeout : :class:`float` | None
+            The maximum number of seconds for each command, or ``None`` for no limit
+        memory_limit : :class:`int` | None
+            The maximum resident set size of the worker process in bytes, or ``None`` for no limit
+        grace : :class:`float`
+            The number of seconds to wait for an interrupted command before killing the worker process
+        start_method : :class:`str`
+            The :mod:`multiprocessing` start method of the worker process
+        zygote : :class:`CalculatorZygote` | None
+            The zygote to fork the worker process from, in which case ``factory`` and ``start_method`` are not used. ``None`` to start the worker process with :mod:`multiprocessing`
+        """
+        self.factory = factory
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.grace = grace
+        self.poll_interval = 0.05
+        """The number of seconds between checks of the limits while waiting for a command"""
+        self.mp_context = multiprocessing.get_context(start_method)
+        self.zygote = zygote
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.pid: int | None = None
+        """The process ID of the worker process, or ``None`` if it is not running"""
+        self.connection: multiprocessing.connection.Connection | None = None
+        self.lock = threading.Lock()
+        self.restarts = 0
+        """The number of times the worker process was killed and replaced"""
+
+    def __enter__(self) -> CalculatorWorker:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the worker process is running"""
+        if self.process is not None:
+            return self.process.is_alive()
+        if self.pid is None:
+            return False
+        try:
+            os.kill(self.pid, 0)
+        except OSError:
+            return False
+        return True
+
+    def start(self) -> None:
+        """Starts the worker process if it is not running, and waits for its calculator to be created
+
+        Raises
+        ------
+        :class:`EOFError`
+            The worker process exited before its calculator was created
+        """
+        if self.alive:
+            return
+        self.kill()
+        if self.zygote is not None:
+            self.pid, self.connection = self.zygote.fork()
+        else:
+            self.connection, child = self.mp_context.Pipe()
+            self.process = self.mp_context.Process(target=serve, args=(child, self.factory), name="CalculatorWorker", daemon=True)
+            self.process.start()
+            self.pid = self.process.pid
+            child.close()
+        self.connection.recv()
+
+    def kill(self) -> None:
+        """Kills the worker process, losing the session"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.process = None
+        elif self.pid is not None:
+            # Forked sessions are reaped by the zygote
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.pid = None
+
+    def close(self) -> None:
+        """Stops the worker process once it finishes the current command"""
+        with self.lock:
+            if self.alive:
+                assert self.connection is not None
+                try:
+                    self.connection.send(None)
+                    if self.process is not None:
+                        self.process.join(self.grace)
+                    else:
+                        deadline = time.monotonic() + self.grace
+                        while self.alive and time.monotonic() < deadline:
+                            time.sleep(self.poll_interval / 10)
+                except OSError:
+                    pass
+            self.kill()
+
+    def rss(self) -> int | None:
+        """Returns the resident set size of the worker process in bytes, or ``None`` if it cannot be measured"""
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def evaluate(self, command: str) -> CalculatorResult:
+        """Push a command to the calculator in the worker process. See :meth:`Calculator.evaluate`
+
+        Parameters
+        ----------
+        command : :class:`str`
+            The command to be pushed to the calculator
+
+        Returns
+        -------
+        :class:`CalculatorResult`
+            The structured result of the interaction. If a limit was exceeded, :attr:`CalculatorResult.terminated` is set
+        """
+        with self.lock:
+            try:
+                self.start()
+            except (EOFError, OSError):
+                return self.terminate(command, "exited", "WorkerExited: the worker process exited before the calculator was created")
+            assert self.connection is not None
+            self.connection.send(command)
+            start = time.monotonic()
+            interrupted = None
+            while True:
+                try:
+                    if self.connection.poll(self.poll_interval):
+                        result: CalculatorResult = self.connection.recv()
+                        if interrupted is not None:
+                            result.terminated = "timeout"
+                            result.errors.append(f"TimeoutError: the command was interrupted after {self.timeout} seconds\n")
+                        return result
+                except (EOFError, OSError):
+                    return self.terminate(command, "exited", "WorkerExited: the worker process exited unexpectedly")
+                if self.memory_limit is not None and (rss := self.rss()) is not None and rss > self.memory_limit:
+                    return self.terminate(command, "memory", f"MemoryError: the worker process used {rss} bytes, exceeding the limit of {self.memory_limit} bytes")
+                elapsed = time.monotonic() - start
+                if self.timeout is not None and elapsed > self.timeout:
+                    if interrupted is None and os.name == "posix":
+                        interrupted = elapsed
+                        os.kill(self.pid, signal.SIGINT)  # type: ignore
+                    elif interrupted is None or elapsed > interrupted + self.grace:
+                        return self.terminate(command, "timeout", f"TimeoutError: the command did not finish within {self.timeout} seconds")
+
+    def evaluate_many(self, commands: Iterable[str]) -> list[CalculatorResult]:
+        """Push a batch of commands to the calculator in the worker process in order. See :meth:`CalculatorWorker.evaluate`
+
+        Parameters
+        ----------
+        commands : Iterable[:class:`str`]
+            The commands to be pushed to the calculator
+
+        Returns
+        -------
+        :class:`list[CalculatorResult]`
+            The structured result of each interaction
+        """
+        return [self.evaluate(command) for command in commands]
+
+    def terminate(self, command: str, reason: str, message: str) -> CalculatorResult:
+        """Kills the worker process and returns the result of the command which was running"""
+        self.kill()
+        self.restarts += 1
+        result = CalculatorResult(command)
+        result.terminated = reason
+        result.errors.append(message + "\n")
+        return result
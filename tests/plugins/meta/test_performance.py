@@ -0,0 +1,262 @@
+import json
+import random
+import tracemalloc
+
+from symcalc import CalculatorPlugin
+from symcalc.plugins.meta.performance import PerformanceMonitor
+from tests import TestCalculator, random_str
+
+
+def test_plugin_performance_instantiate():
+    PerformanceMonitor()
+
+
+def test_plugin_performance_hook():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    assert plugin in calc.plugins
+    assert plugin.helper in calc.plugins
+    assert "perfstats" in calc.directives
+
+
+def test_plugin_performance_histogram():
+    histogram = PerformanceMonitor.LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    values = [random.randint(0, 10**9) for i in range(10000)]
+    for v in values:
+        histogram.record(v)
+    values.sort()
+    assert histogram.count == len(values)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1] == histogram.percentile(100)
+    for p in [1, 50, 90, 99]:
+        exact = values[len(values) * p // 100 - 1]
+        assert exact <= histogram.percentile(p) <= exact * (1 + 2 ** (1 - histogram.precision))
+    assert len(histogram.buckets) <= 30 * 2**histogram.precision
+
+
+def test_plugin_performance_stats():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    for i in range(5):
+        calc.evaluate("1 + 1")
+    assert plugin.stats["interaction"].count == plugin.stats["statement"].count == 5
+    assert plugin.stats["PerformanceMonitor.parse_command"].count == 5
+    assert "end_interaction" not in plugin.stats
+    output = calc.evaluate("/perfstats").output
+    assert output[0] == "----------[ Performance Statistics ]----------"
+    assert any(line.startswith(" - statement: 5 calls, p50 ") for line in output)
+    calc.evaluate("/perfstats reset")
+    assert plugin.stats == {} or all(h.count == 1 for h in plugin.stats.values())
+
+
+def test_plugin_performance_trace(tmp_path):
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    chrome = tmp_path / "trace.json"
+    lines = tmp_path / "trace.jsonl"
+    calc.evaluate(f"/trace {chrome}")
+    calc.evaluate("1 + 1")
+    calc.evaluate(f"/trace {lines}")
+    calc.evaluate("2 + 2")
+    calc.evaluate("/trace")
+    assert plugin.trace_file is None
+
+    trace = json.loads(chrome.read_text())
+    assert trace[-1]["name"] == "trace_end"
+    complete = [e for e in trace if e["ph"] == "X"]
+    assert {e["args"]["command"] for e in complete} == {f"/trace {chrome}", "1 + 1"}
+    assert any(e["name"] == "PerformanceMonitor.parse_command" and e["args"]["hook"] == "parse_command" for e in complete)
+    interactions = [e for e in complete if e["name"] == "interaction"]
+    assert all(a["ts"] < b["ts"] for a, b in zip(interactions, interactions[1:]))
+
+    events = [json.loads(line) for line in lines.read_text().splitlines()]
+    assert {e["command"] for e in events} == {f"/trace {lines}", "2 + 2"}
+    statements = [e for e in events if e["category"] == "statement"]
+    assert [e["detail"] for e in statements] == ["2 + 2"]
+    assert all(e["duration"] > 0 and e["resends"] == 0 for e in events)
+
+
+def test_plugin_performance_trace_resends():
+    class Resend(CalculatorPlugin):
+        def __init__(self):
+            super().__init__("Resend", 0)
+
+        def handle_runtime_error(self, command, data):
+            if command.command == "undefined_name":
+                command.command = "2 + 3"
+                command.resend_command = True
+
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    calc.register_plugin(Resend())
+    events = plugin.trace_events(calc.evaluate("undefined_name"))
+    assert events[0]["name"] == "interaction" and events[0]["command"] == "undefined_name"
+    assert all(e["interaction"] == plugin.interactions for e in events)
+    executions = [e for e in events if e["name"] == "execute"]
+    assert executions[0]["resends"] == 0 and executions[-1]["resends"] == 1
+    assert any(e["plugin"] == "Resend" and e["hook"] == "handle_runtime_error" for e in events)
+
+
+def test_plugin_performance_profile():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    calc.evaluate("/prof")
+    assert plugin.profile_next
+    output = calc.evaluate("sympy.factorint(2**64 + 1)").output
+    assert not plugin.profile_next and plugin.profiler is None
+    assert output[0] == "----------[ Profile ]----------"
+    assert output[1] == "Top SymPy functions by cumulative time:"
+    assert any("(factorint)" in line for line in output)
+    assert plugin.last_profile is not None
+    assert calc.evaluate("1 + 1").output == []
+
+
+def test_plugin_performance_memory():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    calc.evaluate("/mem")
+    output = calc.evaluate("x = [[i] * 100 for i in range(1000)]").output
+    assert not tracemalloc.is_tracing()
+    assert output[0] == "----------[ Memory ]----------"
+    assert plugin.last_memory is not None
+    assert plugin.last_memory.peak >= plugin.last_memory.current > 800000
+    assert plugin.last_memory.top(1)[0].size > 800000
+    assert calc.evaluate("1 + 1").output == []
+
+
+def test_plugin_performance_memory_already_tracing():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    tracemalloc.start()
+    try:
+        kept = [[i] * 100 for i in range(100)]
+        calc.evaluate("/mem")
+        output = calc.evaluate("x = [[i] * 100 for i in range(1000)]").output
+        assert output[0] == "----------[ Memory ]----------"
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_tracemalloc_memory() > 0 and tracemalloc.get_traced_memory()[0] > 0
+        assert kept
+    finally:
+        tracemalloc.stop()
+
+
+def test_plugin_performance_profilers_multiline(tmp_path):
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    calc.evaluate("/prof")
+    calc.evaluate("/mem")
+    calc.evaluate(f"/sample 1000 {tmp_path / 'samples.folded'}")
+    assert not calc.evaluate("for i in range(3):").complete
+    calc.evaluate("    x = sum(j * j for j in range(10**5))")
+    output = calc.evaluate("").output
+    assert "----------[ Profile ]----------" in output
+    assert "----------[ Memory ]----------" in output
+    assert plugin.profiler is None and plugin.sampler is None
+    assert not plugin.tracing_memory and not tracemalloc.is_tracing()
+    assert calc.evaluate("1 + 1").output == []
+
+
+def test_plugin_performance_profilers_execution_only():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    allocated = []
+
+    class Allocating(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), 1)
+
+        def command_success(self, command):
+            allocated.append(len(bytearray(10**7)))
+
+    calc.register_plugin(Allocating())
+    calc.evaluate("/mem")
+    calc.evaluate("x = 1; y = 2")
+    assert len(allocated) == 2
+    assert plugin.last_memory is not None and plugin.last_memory.peak < 10**6
+
+
+def test_plugin_performance_sample(tmp_path):
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    path = tmp_path / "samples.folded"
+    assert calc.evaluate(f"/sample 1000 {path}").output == [f"Sampling 1000 times per second to {path}"]
+    calc.evaluate("1 + 1")
+    calc.evaluate("sum(i * i for i in range(10**6))")
+    assert plugin.sampler is None
+    assert plugin.last_samples is not None and plugin.last_samples.samples > 0
+    assert plugin.last_samples.thread.is_alive() is False
+    calc.evaluate("/sample off")
+    assert plugin.sample_file is None
+    calc.evaluate("sum(i * i for i in range(10**6))")
+    assert calc.evaluate("/sample").output == ["Sampling is off"]
+    lines = path.read_text().splitlines()
+    assert lines
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) >= plugin.last_samples.samples
+    assert any(line.startswith("<module> (<console>:1);<genexpr> (<console>:1) ") for line in lines)
+    assert calc.evaluate("/sample fast").output[0].startswith("Sampling could not be started: ")
+
+
+def test_plugin_performance_slow_log(tmp_path):
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    path = tmp_path / "slow.log"
+    calc.evaluate(f"/slowlog 50 {path}")
+    assert plugin.slow_threshold == 50_000_000
+    calc.evaluate("1 + 1")
+    calc.evaluate("__import__('time').sleep(0.06) or 2 + 2")
+    calc.evaluate("/slowlog off")
+    assert plugin.slow_log is None
+    calc.evaluate("__import__('time').sleep(0.06)")
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["command"] == "__import__('time').sleep(0.06) or 2 + 2"
+    assert records[0]["handled_command"] == records[0]["command"]
+    assert records[0]["duration"] > 50_000_000
+    assert records[0]["resends"] == 0
+    assert records[0]["counters"]["interpret"] == 1
+    assert records[0]["result_type"] == "builtins.int"
+    assert records[0]["phases"]["execute"] > 50_000_000
+    assert "PerformanceMonitor.parse_command" in records[0]["plugins"]
+
+
+def test_plugin_performance_slow_log_rotate(tmp_path):
+    plugin = PerformanceMonitor()
+    calc = TestCalculator()
+    calc.register_plugin(plugin)
+    plugin.start_slow_log(0, str(tmp_path / "slow.log"), max_bytes=1000, backups=2)
+    for i in range(20):
+        calc.evaluate(f"{i} + 1")
+    plugin.stop_slow_log()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["slow.log", "slow.log.1", "slow.log.2"]
+
+
+def test_plugin_performance_counters():
+    calc = TestCalculator()
+    plugin = PerformanceMonitor()
+    calc.register_plugin(plugin)
+    assert calc.evaluate("/counters").output == ["No pipeline counters recorded"]
+    calc.evaluate("1 + 1")
+    calc.evaluate("2 + 2")
+    assert plugin.last_counters["compile_command"] == 1
+    output = calc.evaluate("/counters").output
+    assert output[0] == "----------[ Pipeline Counters ]----------"
+    assert " - compile_command: 2 (1)" in output
+    assert any(line.startswith(" - ast.parse: ") for line in output)
+    calc.evaluate("/counters reset")
+    assert "compile_command" not in calc.counters and plugin.last_counters == {}
+    calc.evaluate("/pp")
+    output = calc.evaluate("3 + 3").output
+    assert any(line.startswith("Counters: ") and "compile_command 1" in line for line in output)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import sympy
+from symcalc import CalculatorPlugin
 from symcalc.plugins.notation.factorial import NotationFactorial
 from tests import TestCalculator, random_int
 
@@ -49,6 +50,24 @@ def test_plugin_notation_factorial_use_nested():
     assert abs(calc.command("log(log((exp(2)!+1)!))!") - 117321252.926657) <= 0.00001  # type: ignore
 
 
+def test_plugin_notation_factorial_repair_single_pass():
+    calc = TestCalculator()
+    plugin = NotationFactorial()
+    calc.register_plugin_and_enable(plugin)
+    resent = []
+
+    class Counter(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(self.__class__.__name__, 0)
+
+        def handle_resend(self, command):
+            resent.append(command.command)
+
+    calc.register_plugin(Counter())
+    assert calc.command("3! + 4! + (2!)!") == 32
+    assert resent == ["3[__factorial__] + 4[__factorial__] + (2[__factorial__])[__factorial__]"]
+
+
 def test_plugin_notation_factorial_example():
     calc = TestCalculator()
     plugin = NotationFactorial()
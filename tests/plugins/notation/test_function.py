@@ -0,0 +1,25 @@
+from symcalc.plugins.notation.function import NotationFunction
+from tests import TestCalculator
+
+
+def test_plugin_notation_function_instantiate():
+    NotationFunction()
+
+
+def test_plugin_notation_function_hook():
+    calc = TestCalculator()
+    plugin = NotationFunction()
+    calc.register_plugin_and_enable(plugin)
+    assert plugin in calc.plugins
+
+
+def test_plugin_notation_function_use_basic():
+    calc = TestCalculator()
+    calc.register_plugin_and_enable(NotationFunction())
+
+    calc.command("x = Symbol('x')")
+    calc.command("f(x) = 2*x + 2")
+    calc.command("g(x) = x**2")
+    assert calc.command("f(3)") == 8
+    assert calc.command("g(f(1))") == 16
+    assert calc.command("f(g)(2)") == 10
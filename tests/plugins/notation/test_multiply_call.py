@@ -0,0 +1,121 @@
+import sympy
+from symcalc import DefaultCalculator
+from symcalc.plugins.notation.function import NotationFunction
+from symcalc.plugins.notation.multiply_call import NotationMultiplyCall
+from tests import TestCalculator
+
+
+def test_plugin_notation_multiply_call_instantiate():
+    NotationMultiplyCall()
+
+
+def test_plugin_notation_multiply_call_hook():
+    calc = TestCalculator()
+    plugin = NotationMultiplyCall()
+    calc.register_plugin_and_enable(plugin)
+    assert plugin in calc.plugins
+    assert plugin.helper in calc.plugins
+
+
+def test_plugin_notation_multiply_call_resolve():
+    calc = TestCalculator()
+    plugin = NotationMultiplyCall()
+    calc.register_plugin_and_enable(plugin)
+    calc.mksym("a b x y")
+    plugin.update_names()
+
+    assert plugin.resolve("x") == ["x"]
+    assert plugin.resolve("_abc") == ["_abc"]
+    assert plugin.resolve("abxsin") == ["a", "b", "x", "sin"]
+    assert plugin.resolve("xpi") == ["x", "pi"]
+    assert plugin.resolve("x2y") == ["x2", "y"]
+    assert plugin.resolve("ab_12") == ["ab_12"]
+    assert plugin.resolve("sinx") == ["sinx"]
+    assert plugin.resolve("abs") == ["abs"]
+
+
+def test_plugin_notation_multiply_call_resolve_context_changed():
+    calc = TestCalculator()
+    plugin = NotationMultiplyCall()
+    calc.register_plugin_and_enable(plugin)
+    calc.mksym("a b x y")
+    plugin.update_names()
+
+    assert plugin.resolve("abxy") == ["a", "b", "x", "y"]
+    calc.command("xy = 2")
+    plugin.update_names()
+    assert plugin.resolve("abxy") == ["a", "b", "xy"]
+    calc.command("ab = 3")
+    calc.command("del xy")
+    plugin.update_names()
+    assert plugin.resolve("abxy") == ["ab", "x", "y"]
+    calc.command("ab = sin")
+    plugin.update_names()
+    assert plugin.resolve("abxy") == ["abxy"]
+
+
+def test_plugin_notation_multiply_call_use_basic():
+    calc = TestCalculator()
+    calc.register_plugin_and_enable(NotationMultiplyCall())
+
+    calc.command("a = 2")
+    calc.command("b = 3")
+    assert calc.command("2ab") == 12
+    assert calc.command("2 a b") == 12
+    assert calc.command("ab(a+1)") == 18
+
+
+def test_plugin_notation_multiply_call_check_calls():
+    calc = TestCalculator()
+    calc.register_plugin_and_enable(NotationMultiplyCall())
+
+    calc.command("a = 2")
+    calc.command("x = Symbol('x')")
+    calc.command("l = [3, x]")
+    assert calc.command("a(5)") == 10
+    assert calc.command("(a + 1)(5)") == 15
+    assert calc.command("sin(x)(2)") == 2 * calc.command("sin(x)")
+    assert calc.command("l[-1](4)") == 4 * calc.getsym("x")
+    assert calc.command("sympy.pi(2)") == 2 * calc.getsym("pi")
+    assert isinstance(calc.command("Function('f')(x)"), sympy.core.function.AppliedUndef)
+
+
+def test_plugin_notation_multiply_call_check_calls_functions():
+    calc = TestCalculator()
+    calc.register_plugin_and_enable(NotationMultiplyCall())
+    calc.register_plugin_and_enable(NotationFunction())
+
+    calc.command("x = Symbol('x')")
+    x = calc.getsym("x")
+    calc.command("f(x) = x + 1")
+    calc.command("g(x) = x**2")
+    calc.command("k = x**2 + x")
+    assert calc.command("sqrt(2)(3)") == 3 * sympy.sqrt(2)
+    assert calc.command("f(x)(2)") == 2 * (x + 1)
+    assert calc.command("diff(x**2,x)(3)") == 6 * x
+    assert calc.command("k.subs(x,2)(3)") == 18
+    assert calc.command("f(g)(2)") == 5
+
+
+def test_plugin_notation_multiply_call_check_calls_default_plugins():
+    calc = DefaultCalculator().register_default_plugins()
+
+    x = sympy.Symbol("x")
+    calc.evaluate("x + 1")
+    assert calc.evaluate("out[1](2)").value == 2 * x + 2
+    assert calc.evaluate("out[-1](3)").value == 6 * x + 6
+    calc.evaluate("k = [x, 2]")
+    assert calc.evaluate("k[0](3)").value == 3 * x
+    assert calc.evaluate("k[-1](x)").value == 2 * x
+    assert calc.evaluate("S(2)(x)").value == 2 * x
+
+
+def test_plugin_notation_multiply_call_check_calls_no_evaluation():
+    calc = TestCalculator()
+    calc.register_plugin_and_enable(NotationMultiplyCall())
+
+    calc.command("calls = []")
+    calc.command("def g():\n    calls.append(1)\n    return 2\n")
+    calc.command("")
+    calc.command("g()(3)")
+    assert calc.getsym("calls") == [1]
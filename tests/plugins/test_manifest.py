@@ -0,0 +1,23 @@
+from symcalc import plugins
+from symcalc.plugin import CalculatorPlugin
+from symcalc.plugins import manifest
+
+
+def test_manifest_up_to_date():
+    # Regenerate with python -m symcalc.plugins.manifest
+    assert manifest.generate() == manifest.manifest
+
+
+def test_manifest_load():
+    for entry in manifest.manifest:
+        plugin = entry.load()
+        assert issubclass(plugin, CalculatorPlugin)
+        assert plugin().priority == entry.priority
+    assert plugins.get_plugins()[: len(manifest.manifest)] == [entry.load() for entry in manifest.manifest]
+
+
+def test_manifest_entry():
+    entry = manifest.PluginEntry.inspect(manifest.manifest[0].load())
+    assert entry == manifest.manifest[0]
+    assert eval(repr(entry), vars(manifest)) == entry
+    assert entry != manifest.manifest[1]
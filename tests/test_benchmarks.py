@@ -0,0 +1,61 @@
+from benchmarks.examples import Example, Transcript, main, report, run
+
+docstring = """A plugin
+
+    .. code-block::
+
+        Calculator >>> 1 + 1
+        2
+        Calculator >>> if True:
+        ... 3
+        ...
+        3
+
+    .. code-block::
+
+        not a transcript
+
+    .. note:: Nested
+
+        .. code-block::
+
+            Calculator >>> x
+            ...
+            x
+
+"""
+
+
+def test_benchmarks_extract():
+    transcripts = Transcript.extract("Plugin", docstring)
+    assert [(t.source, t.index) for t in transcripts] == [("Plugin", 0), ("Plugin", 1)]
+    assert [(e.command, e.continuation, e.expected) for e in transcripts[0].examples] == [("1 + 1", [], ["2"]), ("if True:", ["3", ""], ["3"])]
+    assert transcripts[1].examples[0].expected == ["...", "x"]
+    assert Transcript.extract("Plugin", None) == []
+
+
+def test_benchmarks_match():
+    example = Example("x", ["a", "...", "c"])
+    assert example.matches(["a", "b", "c"])
+    assert example.matches(["New symbol: x", "a", "c", "Result stored in out[1]"])
+    assert not example.matches(["c", "a"])
+    assert Example("x", []).matches([])
+
+
+def test_benchmarks_run(tmp_path):
+    transcripts = Transcript.collect(["AutoExact", "OutputStore"])
+    assert {t.source for t in transcripts} == {"AutoExact", "OutputStore"}
+    assert Transcript.collect(["AddFactorDB"]) == []
+    results = run(transcripts, repeat=2)
+    summary = results["summary"]
+    assert summary["examples"] == summary["matched"] == len(results["examples"]) > 0
+    assert all(len(e["durations"]) == 2 and 0 < e["min"] <= e["median"] for e in results["examples"])
+    assert summary["throughput"] > 0
+    lines = report(results, results)
+    assert all(line.startswith("ok ") and "(+0.0%)" in line for line in lines[:-2])
+    assert lines[-2] == f"{summary['matched']}/{summary['examples']} examples matched"
+
+    path = tmp_path / "results.json"
+    assert main(["-n", "1", "-s", "OutputStore", "-o", str(path), "--check"]) == 0
+    assert main(["-n", "1", "-s", "OutputStore", "-c", str(path)]) == 0
+    assert path.read_text().startswith("{")
@@ -1,6 +1,9 @@
+import ast
+import asyncio
 import code
+import time
 import pytest
-from symcalc import Calculator, CalculatorPlugin, CalculatorContext
+from symcalc import Calculator, CalculatorPlugin, CalculatorContext, DefaultCalculator
 
 from tests import random_str, DefaultPlugin
 
@@ -72,6 +75,16 @@ def test_calc_register_directive():
         calc.register_directive(c, directive)
 
 
+def test_calc_directive_argument():
+    arguments = []
+    calc = Calculator()
+    calc.register_directive("d", lambda calc, command: arguments.append(command))
+    calc.command("/d")
+    calc.command("/d  some argument ")
+    calc.command("/dd")
+    assert arguments == ["", "some argument"]
+
+
 def test_calc_notify_assert_fail():
     class BeginInteractionFail(DefaultPlugin):
         def begin_interaction(self, command):
@@ -882,3 +895,351 @@ def test_calc_command_multiline():
 
     t = random_str()
     assert t + a == calc.getsym(name)(t)
+
+
+def test_calc_evaluate(capfd):
+    calc = Calculator()
+    name = random_str()
+    result = calc.evaluate(f"{name} = 3")
+    assert result.success
+    result = calc.evaluate(f"{name} * 2")
+    assert result.value == 6
+    assert calc.result is result
+    assert not calc.silent
+    assert capfd.readouterr().out == ""
+
+
+def test_calc_evaluate_many():
+    calc = Calculator()
+    results = calc.evaluate_many(["a = 2", "a + 1", "1/0", "a * 3"])
+    assert [r.success for r in results] == [True, True, False, True]
+    assert [r.value for r in results] == [None, 3, None, 6]
+
+
+def test_calc_command_prints(capfd):
+    calc = Calculator()
+    calc.command("2 + 3")
+    assert capfd.readouterr().out.strip() == "5"
+    assert calc.result is not None and calc.result.value == 5
+
+
+def test_calc_dispatch_overridden_hooks():
+    calc = Calculator()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), -1)
+
+        def handle_command(self, command):
+            pass
+
+    plugin = Plugin()
+    calc.register_plugin(plugin)
+    assert plugin in calc.get_dispatch("handle_command")
+    assert plugin not in calc.get_dispatch("parse_command")
+    assert plugin in calc.get_dispatch("parse_command", "handle_command")
+
+
+def test_calc_dispatch_toggles():
+    calc = Calculator()
+    name = random_str()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), -1)
+            self.count = 0
+
+        def hook(self, calc):
+            self.register_toggle(calc, name, name, True)
+
+        @CalculatorPlugin.if_enabled
+        def handle_command(self, command):
+            self.count += 1
+
+    plugin = Plugin()
+    calc.register_plugin(plugin)
+    calc.command("pass")
+    assert plugin in calc.get_dispatch("handle_command")
+    calc.command(f"/{name}")
+    assert plugin not in calc.get_dispatch("handle_command")
+    calc.command("pass")
+    calc.settings[name] = True
+    assert plugin in calc.get_dispatch("handle_command")
+    calc.command("pass")
+    assert plugin.count == 2
+
+
+def test_calc_transform_command():
+    calc = Calculator()
+    seen = []
+
+    class Rename(CalculatorPlugin):
+        def __init__(self, priority, old, new):
+            super().__init__(random_str(), priority)
+            self.old = old
+            self.new = new
+
+        def transform_command(self, command, tree):
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name) and node.id == self.old:
+                    node.id = self.new
+            return tree
+
+    class Handler(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), 1)
+
+        def handle_command(self, command):
+            seen.append(command.command)
+
+    class Unchanged(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), 2)
+
+        def transform_command(self, command, tree):
+            return None
+
+    calc.register_plugin(Rename(0, "a", "b"))
+    calc.register_plugin(Handler())
+    calc.register_plugin(Unchanged())
+    calc.register_plugin(Rename(3, "b", "c"))
+    calc.register_plugin(Rename(4, "c", "d"))
+    calc.context.d = 5
+    result = calc.evaluate("a + 1")
+    assert seen == ["b + 1"]
+    assert result.handled_command == "d + 1"
+    assert result.value == 6
+
+
+def test_calc_transform_command_default_plugins():
+    calc = DefaultCalculator().register_default_plugins()
+    result = calc.evaluate("y = 2x + sin x")
+    assert result.success
+    # The transformations of the default plugins are applied in a single pass
+    assert result.counters["ast.commit"] == 1
+    assert result.counters["ast.transform"] == len(calc.get_dispatch("transform_command"))
+
+
+def test_calc_repair_token():
+    calc = Calculator()
+    offered = []
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self, priority, old, new):
+            super().__init__(random_str(), priority)
+            self.old = old
+            self.new = new
+
+        def repair_token(self, command, tokens, index):
+            offered.append((self.old, index))
+            if tokens[index].string == self.old:
+                return self.new, 1
+            return None
+
+    calc.register_plugin(Plugin(0, "?", "+"))
+    calc.register_plugin(Plugin(1, "$", "-"))
+    result = calc.evaluate("10 ? 3 $ 2 ? 1")
+    assert result.handled_command == "10 + 3 - 2 + 1"
+    assert result.value == 12
+    assert ("$", 1) not in offered and ("$", 3) in offered
+    assert calc.evaluate("1 +* 2").errors
+
+
+def test_calc_interpret_code_cache():
+    calc = Calculator()
+    calc.code_cache_size = 3
+    name = random_str()
+    calc.command(f"{name} = 0")
+    for i in range(5):
+        calc.command(f"{name} += 1")
+    assert calc.getsym(name) == 5
+    assert len(calc.code_cache) == 2
+    for i in range(5):
+        calc.command(f"{name} += {i}")
+    assert len(calc.code_cache) == 3
+    assert calc.getsym(name) == 15
+
+
+def test_calc_command_result():
+    calc = Calculator()
+    values = []
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), -1)
+
+        def command_result(self, command, value):
+            values.append((command.command, value))
+
+    calc.register_plugin(Plugin())
+    calc.command("2 + 3")
+    calc.command("a = 4")
+    calc.command("print(a)")
+    calc.command("1/0")
+    calc.command("a; a * 2")
+    assert values == [("2 + 3", 5), ("a", 4), ("a * 2", 8)]
+
+
+def test_calc_context_version():
+    calc = Calculator()
+    version = calc.context_version
+    assert calc.context_version == version
+
+    calc.command("2 + 3")
+    calc.command("sin(1)")
+    assert calc.context_version == version
+
+    calc.command("a = 4")
+    assert calc.context_version > version
+    assert calc.symbol_index["a"] == 4
+    version = calc.context_version
+
+    calc.command("a = 4.5")
+    assert calc.context_version > version
+    version = calc.context_version
+
+    calc.mksym("x")
+    assert calc.context_version > version
+    version = calc.context_version
+
+    calc.command("def f():\n    global b\n    b = 1\n")
+    calc.command("")
+    version = calc.context_version
+    calc.command("f()")
+    assert calc.context_version > version
+    assert calc.chksym("b")
+    version = calc.context_version
+
+    calc.command("del a")
+    assert calc.context_version > version
+    assert "a" not in calc.symbol_index
+    assert not calc.chksym("a")
+    version = calc.context_version
+
+    # Bindings made directly on the context are found at the start of the next command
+    calc.context.c = 2
+    assert calc.context_version == version
+    calc.command("1 + 1")
+    assert calc.context_version > version
+    assert calc.symbol_index["c"] == 2
+
+
+def test_calc_inspect_callable():
+    calc = Calculator()
+
+    def two(a, b):
+        pass
+
+    assert calc.inspect_callable(calc.getsym("sin")).unary
+    assert calc.inspect_callable(calc.getsym("sin")).function_class
+    assert calc.inspect_callable(lambda x: x).unary
+    assert calc.inspect_callable(print).unary
+    assert not calc.inspect_callable(two).unary
+    assert calc.inspect_callable(two).spec.args == ["a", "b"]  # type: ignore
+    assert not calc.inspect_callable(max).unary
+    assert calc.inspect_callable(max).spec is None
+    assert calc.inspect_callable(3).number and not calc.inspect_callable(3).unary
+    assert calc.inspect_callable(calc.getsym("pi")).number
+
+    info = calc.inspect_callable(two)
+    assert calc.inspect_callable(two) is info
+    calc.command("2 + 3")
+    assert calc.inspect_callable(two) is info
+    calc.command("a = 1")
+    assert calc.inspect_callable(two) is not info
+
+    calc.callable_cache_size = 2
+    info = calc.inspect_callable(two)
+    calc.inspect_callable(max)
+    assert calc.inspect_callable(two) is info
+    calc.inspect_callable(print)
+    assert len(calc.callable_cache) == 2
+    assert id(max) not in calc.callable_cache
+    assert calc.inspect_callable(two) is info
+
+
+def test_calc_acommand(capfd):
+    calc = Calculator()
+    assert asyncio.run(calc.acommand("2 + 3"))
+    assert capfd.readouterr().out.strip() == "5"
+    result = asyncio.run(calc.aevaluate("_ * 2"))
+    assert result.success and result.value == 10
+    assert capfd.readouterr().out == ""
+
+
+def test_calc_aevaluate_timeout():
+    calc = Calculator()
+    events = []
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), -1)
+
+        def command_success(self, command):
+            events.append(("success", command.command))
+
+        def command_fail(self, command):
+            events.append(("fail", command.command))
+
+        def end_interaction(self, command):
+            events.append(("end", command.command))
+
+    calc.register_plugin(Plugin())
+
+    async def run():
+        with pytest.raises(TimeoutError):
+            await calc.aevaluate("sum(1 for i in iter(int, 1))", timeout=0.1)
+        return await calc.aevaluate("1 + 1")
+
+    result = asyncio.run(run())
+    assert result.value == 2
+    assert events == [("fail", "sum(1 for i in iter(int, 1))"), ("end", "sum(1 for i in iter(int, 1))"), ("success", "1 + 1"), ("end", "1 + 1")]
+
+
+def test_calc_aevaluate_abandon():
+    calc = Calculator()
+    calc.interrupt_grace = 0.2
+
+    async def run():
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await calc.aevaluate("__import__('time').sleep(1)", timeout=0.1)
+        assert time.monotonic() - start < 0.8
+        assert calc.result is not None and calc.result.warnings
+        # The next command waits for the abandoned one
+        result = await calc.aevaluate("1 + 1")
+        assert time.monotonic() - start > 1
+        return result
+
+    result = asyncio.run(run())
+    assert result.success and result.value == 2
+
+
+def test_calc_aevaluate_cancel():
+    calc = Calculator()
+
+    async def run():
+        task = asyncio.create_task(calc.aevaluate("sum(1 for i in iter(int, 1))"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert calc.result is not None and not calc.result.success
+        return await calc.aevaluate("a = 3; a")
+
+    assert asyncio.run(run()).value == 3
+
+
+def test_calc_aevaluate_sessions():
+    calcs = [Calculator() for i in range(8)]
+
+    async def run():
+        slow = asyncio.create_task(calcs[0].aevaluate("sum(1 for i in iter(int, 1))", timeout=0.5))
+        results = await asyncio.gather(*[c.aevaluate(f"x = {i}; x * 2") for i, c in enumerate(calcs[1:], 1)])
+        with pytest.raises(TimeoutError):
+            await slow
+        return results
+
+    results = asyncio.run(run())
+    assert [r.value for r in results] == [i * 2 for i in range(1, 8)]
+    assert [c.getsym("_") for c in calcs[1:]] == [i * 2 for i in range(1, 8)]
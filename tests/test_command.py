@@ -21,6 +21,7 @@ def test_command_instantiate():
     assert not command.resend_command
     assert not command.print_error
     assert not command.success
+    assert command.value is None
 
 
 def test_command_get_set_command():
@@ -104,3 +105,23 @@ def test_command_repr():
     calc = Calculator()
     command = CalculatorCommand(calc, c := random_str())
     assert c in repr(command)
+
+
+def test_command_ast_set_lazy():
+    calc = Calculator()
+    names = [random_str() for i in range(3)]
+    command = CalculatorCommand(calc, " + ".join(names))
+    command.valid_syntax = True
+    assert command._command_symtable is None
+
+    class Transformer(ast.NodeTransformer):
+        def visit_Name(self, node):
+            return ast.Name(id=node.id.lower(), ctx=node.ctx)
+
+    tree = ast.fix_missing_locations(Transformer().visit(command.command_ast))
+    command.command_ast = tree
+    assert command.command_ast is tree
+    assert command._command_symtable is None
+    assert command.command == " + ".join(n.lower() for n in names)
+    assert set(s.get_name() for s in command.command_symtable.get_symbols()) == set(n.lower() for n in names)
+    assert command.command_symtable is command.command_symtable
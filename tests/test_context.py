@@ -1,8 +1,11 @@
 import code
+import inspect
+import math
+import sys
 from typing import Any, Callable
 
 import sympy
-from symcalc import CalculatorContext
+from symcalc import Calculator, CalculatorContext
 
 from tests import random_str
 
@@ -17,8 +20,30 @@ def test_context_instantiate():
     context = CalculatorContext()
 
     assert context.sympy is sympy
-    for x in sympy.__dict__:
-        assert x in context.__dict__
+    for x in sympy.__all__:
+        assert getattr(context, x) is sympy.__dict__[x]
+    assert context.__name__ == sympy.__name__
+
+
+def test_context_layered():
+    context = CalculatorContext()
+    other = CalculatorContext()
+
+    assert context.__dict__["__builtins__"] is CalculatorContext.base
+    assert "sin" not in context.__dict__
+    assert len(context.__dict__) < 20
+
+    exec("sin = 3", context.__dict__, context.__dict__)
+    exec("x = cos(0) + abs(-1)", context.__dict__, context.__dict__)
+
+    assert context.sin == 3
+    assert context.x == 2
+    assert other.sin is sympy.sin
+    assert "x" not in other.__dict__
+    assert CalculatorContext.base["sin"] is sympy.sin
+
+    exec("del sin", context.__dict__, context.__dict__)
+    assert context.sin is sympy.sin
 
 
 def test_context_use_exec():
@@ -64,3 +89,21 @@ def test_context_use_console():
     assert isinstance(get_context_value(context, names[2], cmp_is), type)
     assert isinstance(get_context_value(context, names[3], cmp_is), get_context_value(context, names[2], cmp_is))
     assert get_context_value(context, names[3], cmp_is) is get_context_value(context, names[4], cmp_is)
+
+
+def test_context_lazy():
+    sys.modules.pop("colorsys", None)
+    function = CalculatorContext.LazyCallable("colorsys", "rgb_to_hsv")
+    assert "colorsys" not in sys.modules
+    assert inspect.getfullargspec(function).args == ["r", "g", "b"]
+    assert "colorsys" in sys.modules
+    assert function(1, 0, 0) == (0, 1, 1)
+
+    module = CalculatorContext.LazyObject("fractions")
+    assert module.Fraction(1, 2) * 2 == 1
+    assert "Fraction" in dir(module)
+    assert repr(CalculatorContext.LazyObject("math", "pi")) == repr(math.pi)
+
+    calc = Calculator()
+    setattr(calc.context, "hsv", function)
+    assert calc.evaluate("hsv(0, 1, 0)").value == (1 / 3, 1, 1)
@@ -0,0 +1,91 @@
+import gc
+import urllib.request
+
+from symcalc import Calculator, CalculatorMetrics, CalculatorPlugin, CalculatorResult
+from symcalc.plugins.output.store import OutputStore
+
+
+class FailingPlugin(CalculatorPlugin):
+    def __init__(self):
+        super().__init__("FailingPlugin", 0)
+
+    def command_success(self, command):
+        if command.command == "fail":
+            raise RuntimeError()
+
+    def handle_runtime_error(self, command, data):
+        if command.command == "undefined_name":
+            command.command = "fail = 2"
+            command.resend_command = True
+
+
+def test_metrics_histogram():
+    histogram = CalculatorMetrics.Histogram([1.0, 0.1])
+    for v in [0.05, 0.1, 0.5, 5]:
+        histogram.observe(v)
+    assert histogram.buckets == [0.1, 1.0]
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == 5.65
+
+
+def test_metrics_record():
+    metrics = CalculatorMetrics()
+    calc = metrics.attach(Calculator())
+    calc.register_plugin(FailingPlugin())
+    calc.register_plugin(OutputStore())
+    calc.evaluate("1 + 1")
+    calc.evaluate("undefined_name")
+    calc.evaluate("fail")
+    assert metrics.sessions == len(metrics.active_sessions) == 1
+    assert metrics.interactions == {"success": 3, "error": 0}
+    assert metrics.interaction_duration.count == 3
+    assert metrics.phase_duration["execute"].count == 3
+    assert "end_interaction" not in metrics.phase_duration
+    assert metrics.resends == 1
+    assert metrics.plugin_errors == {"FailingPlugin": 1}
+    assert metrics.out_store_size() == 1
+    result = CalculatorResult("1 + 1")
+    result.terminated = "timeout"
+    metrics.record(result)
+    metrics.record(None)
+    assert metrics.terminations == {"timeout": 1}
+    assert metrics.interactions["error"] == 1
+    metrics.attach(Calculator())
+    gc.collect()
+    assert metrics.sessions == 2 and len(metrics.active_sessions) == 1
+
+
+def test_metrics_exposition(tmp_path):
+    metrics = CalculatorMetrics(buckets=[0.5, 10.0])
+    calc = metrics.attach(Calculator())
+    calc.register_plugin(FailingPlugin())
+    calc.evaluate("fail = 1")
+    calc.evaluate("fail")
+    text = metrics.exposition()
+    lines = text.splitlines()
+    assert lines[-1] == "# EOF"
+    assert "# TYPE symcalc_interaction_duration_seconds histogram" in lines
+    assert 'symcalc_interaction_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'symcalc_interaction_duration_seconds_bucket{le="10.0"} 2' in lines
+    assert "symcalc_interaction_duration_seconds_count 2" in lines
+    assert 'symcalc_phase_duration_seconds_bucket{phase="execute",le="+Inf"} 2' in lines
+    assert 'symcalc_interactions_total{result="success"} 2' in lines
+    assert 'symcalc_plugin_errors_total{plugin="FailingPlugin"} 1' in lines
+    assert "symcalc_sessions_total 1" in lines
+    assert all(line.startswith("# ") or line.startswith("symcalc_") for line in lines)
+    assert CalculatorMetrics.format_labels(plugin='a"b\\c\nd') == '{plugin="a\\"b\\\\c\\nd"}'
+
+    path = tmp_path / "symcalc.prom"
+    metrics.write(str(path))
+    assert path.read_text() == text
+    assert list(tmp_path.iterdir()) == [path]
+
+    server = metrics.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            assert response.headers["Content-Type"] == CalculatorMetrics.content_type
+            assert response.read().decode().splitlines()[-1] == "# EOF"
+    finally:
+        server.shutdown()
+        server.server_close()
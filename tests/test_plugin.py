@@ -171,4 +171,5 @@ def test_plugin_no_action():
     new = {}
     new.update(calc.context.__dict__)
 
+    assert new.pop("_") == 3
     assert original == new
@@ -0,0 +1,198 @@
+import sympy
+from symcalc import Calculator, CalculatorPlugin, CalculatorResult
+from symcalc.plugins.output.decimal import OutputDecimal
+from symcalc.plugins.output.store import OutputStore
+
+from tests import random_str
+
+
+def test_result_instantiate():
+    command = random_str()
+    result = CalculatorResult(command)
+    assert result.command == command
+    assert result.handled_command is None
+    assert result.value is None
+    assert not result.success
+    assert result.complete
+    assert result.output == result.warnings == result.errors == []
+    assert len(result.timings) == 0
+
+
+def test_result_value(capfd):
+    calc = Calculator()
+    result = calc.evaluate("2 + 3")
+    assert result is calc.result
+    assert result.value == 5
+    assert result.success
+    assert result.handled_command == "2 + 3"
+    assert capfd.readouterr().out == ""
+
+
+def test_result_no_value():
+    calc = Calculator()
+    name = random_str()
+    result = calc.evaluate(f"{name} = 3")
+    assert result.value is None
+    assert result.success
+    assert calc.getsym(name) == 3
+
+
+def test_result_multiple_statements():
+    calc = Calculator()
+    result = calc.evaluate("a = 2; a * 3")
+    assert result.value == 6
+    assert result.handled_command == "a = 2\na * 3"
+    assert result.success
+
+
+def test_result_runtime_error(capfd):
+    calc = Calculator()
+    result = calc.evaluate("1/0")
+    assert not result.success
+    assert len(result.errors) == 1
+    assert "ZeroDivisionError" in result.errors[0]
+    assert capfd.readouterr().err == ""
+
+
+def test_result_syntax_error():
+    calc = Calculator()
+    result = calc.evaluate("1 +* 2")
+    assert not result.success
+    assert result.handled_command is None
+    assert "SyntaxError" in result.errors[0]
+
+
+def test_result_multiline():
+    calc = Calculator()
+    name = random_str()
+    assert not calc.evaluate(f"def {name}(s):").complete
+    assert not calc.evaluate("  return 2 * s").complete
+    result = calc.evaluate("")
+    assert result.complete
+    assert result.success
+    assert calc.evaluate(f"{name}(4)").value == 8
+
+
+def test_result_plugin_output():
+    calc = Calculator()
+    calc.register_plugin(OutputDecimal())
+    calc.register_plugin(OutputStore())
+    result = calc.evaluate("sqrt(2)")
+    assert result.value == sympy.sqrt(2)
+    assert result.decimals == str(sympy.sqrt(2).evalf())
+    assert result.out_index == 1
+    assert "Result stored in out[1]" in result.output
+
+
+def test_result_plugin_exception(capfd):
+    calc = Calculator()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__(random_str(), -1)
+
+        def handle_command(self, command):
+            raise RuntimeError()
+
+    calc.register_plugin(Plugin())
+    result = calc.evaluate("1")
+    assert not result.success
+    assert "RuntimeError" in result.errors[0]
+    assert capfd.readouterr().err == ""
+
+
+def test_result_timings():
+    calc = Calculator()
+    result = calc.evaluate("2 + 3")
+    for phase in ["begin_interaction", "parse", "handle", "execute", "success", "end_interaction"]:
+        assert result.timings[phase] > 0
+
+
+def test_result_spans():
+    calc = Calculator()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__("SpanPlugin", 0)
+
+        def handle_resend(self, command):
+            pass
+
+        def handle_runtime_error(self, command, data):
+            if command.command == "undefined_name":
+                command.command = "2 + 3"
+                command.resend_command = True
+
+    calc.register_plugin(Plugin())
+    result = calc.evaluate("1; undefined_name")
+    assert result.value == 5
+    assert result.active_spans == []
+    spans = [(depth, span.name, span.category) for depth, span in result.walk_spans()]
+    assert spans[0] == (0, "begin_interaction", "phase")
+    assert spans[-1] == (0, "end_interaction", "phase")
+    statements = [span for span in result.spans if span.category == "statement"]
+    assert [span.detail for span in statements] == ["1", "undefined_name"]
+    assert [span.name for span in statements[1].children] == ["handle", "execute", "resend", "execute", "success", "result"]
+    assert statements[1].children[1].children[0].children[0].name == "SpanPlugin"
+    assert statements[1].children[1].children[0].children[0].category == "handle_runtime_error"
+    assert statements[1].children[2].children[0].category == "handle_resend"
+    for depth, span in result.walk_spans():
+        assert span.duration > 0
+        assert all(span.start <= child.start and child.end <= span.end for child in span.children)
+    assert CalculatorResult("").spans == []
+
+
+def test_result_spans_repair():
+    calc = Calculator()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__("RepairPlugin", 0)
+
+        def repair_token(self, command, tokens, index):
+            if tokens[index].string == "!":
+                return "+", 1
+
+    calc.register_plugin(Plugin())
+    result = calc.evaluate("2 ! 3")
+    assert result.value == 5
+    repair = next(span for depth, span in result.walk_spans() if span.name == "repair")
+    assert repair.category == "phase"
+    # One span for each token, including the NEWLINE and ENDMARKER tokens
+    assert len(repair.children) == 5
+    assert all(span.name == "RepairPlugin" and span.category == "repair_token" for span in repair.children)
+    assert result.timings["repair"] >= sum(span.duration for span in repair.children)
+
+
+def test_result_counters():
+    calc = Calculator()
+
+    class Plugin(CalculatorPlugin):
+        def __init__(self):
+            super().__init__("CountPlugin", 0)
+
+        def handle_syntax_error_obj(self, command, exc):
+            if command.calc.compile_command("2 + 3") is not None:
+                command.command = "2 + 3"
+                command.resend_command = True
+
+        def command_success(self, command):
+            command.calc.interpret("None")
+
+    calc.register_plugin(Plugin())
+    result = calc.evaluate("2 +* 3")
+    assert result.value == 5
+    assert result.counters["resend"] == 1
+    assert result.counters["compile_command"] == 3
+    assert result.counters["compile_command.CountPlugin"] == 1
+    assert result.counters["interpret"] == 2
+    assert result.counters["interpret.CountPlugin"] == 1
+    assert result.counters["ast.parse"] >= 1
+    result = calc.evaluate("2 + 3")
+    assert result.counters["code_cache.hit"] == 2
+    assert "resend" not in result.counters
+    assert calc.counters["resend"] == 1
+    assert calc.counters["compile_command"] == 4
+    assert calc.compile_command("if True:") is None
+    assert calc.counters["compile_command"] == 5
+    assert len(CalculatorResult("").counters) == 0
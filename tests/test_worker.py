@@ -0,0 +1,102 @@
+import os
+import time
+
+import pytest
+from symcalc import Calculator, CalculatorCommand, CalculatorPlugin, CalculatorWorker, CalculatorZygote
+
+
+class SlowPlugin(CalculatorPlugin):
+    def __init__(self):
+        super().__init__("SlowPlugin", 0)
+
+    def command_success(self, command: CalculatorCommand) -> None:
+        if "slow" in command.command:
+            time.sleep(2)
+
+
+def slow_calculator() -> Calculator:
+    return Calculator().register_plugin(SlowPlugin())
+
+
+def test_worker_instantiate():
+    worker = CalculatorWorker(Calculator)
+    assert not worker.alive
+    worker.close()
+
+
+def test_worker_evaluate():
+    with CalculatorWorker(Calculator) as worker:
+        assert worker.evaluate("a = 2").success
+        pid = worker.process.pid  # type: ignore
+        result = worker.evaluate("a * 3")
+        assert result.success and result.value == 6
+        assert [r.value for r in worker.evaluate_many(["a + 1", "1/0"])] == [3, None]
+        assert worker.process.pid == pid  # type: ignore
+        assert worker.restarts == 0
+        assert worker.evaluate("lambda: 1").warnings
+    assert not worker.alive
+
+
+def test_worker_timeout_interrupt():
+    with CalculatorWorker(Calculator, timeout=0.2) as worker:
+        worker.evaluate("a = 2")
+        result = worker.evaluate("sum(1 for i in iter(int, 1))")
+        assert not result.success
+        assert result.terminated == "timeout"
+        assert result.errors
+        assert worker.evaluate("a").value == 2
+        assert worker.restarts == 0
+
+
+def test_worker_timeout_interrupt_plugin():
+    with CalculatorWorker(slow_calculator, timeout=0.3) as worker:
+        worker.evaluate("a = 2")
+        start = time.monotonic()
+        result = worker.evaluate("slow = 1")
+        assert time.monotonic() - start < 1
+        assert not result.success
+        assert result.terminated == "timeout"
+        assert worker.restarts == 0
+        assert worker.evaluate("a").value == 2
+        assert worker.evaluate("slow").value == 1
+
+
+def test_worker_timeout_kill():
+    with CalculatorWorker(Calculator, timeout=0.2, grace=0.2) as worker:
+        worker.evaluate("a = 2")
+        result = worker.evaluate("__import__('signal').signal(2, __import__('signal').SIG_IGN); sum(1 for i in iter(int, 1))")
+        assert not result.success
+        assert result.terminated == "timeout"
+        assert worker.restarts == 1
+        assert not worker.evaluate("a").success
+        assert worker.evaluate("1 + 1").value == 2
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="The memory limit requires /proc")
+def test_worker_memory_limit():
+    with CalculatorWorker(Calculator, timeout=30, memory_limit=300 * 2**20) as worker:
+        result = worker.evaluate("x = bytearray(400 * 2**20); sum(1 for i in iter(int, 1))")
+        assert result.terminated == "memory"
+        assert worker.restarts == 1
+        assert worker.evaluate("1 + 1").value == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="The zygote requires os.fork")
+def test_worker_zygote():
+    with CalculatorZygote(Calculator) as zygote:
+        first = CalculatorWorker(zygote=zygote, timeout=0.2, grace=0.2)
+        second = CalculatorWorker(zygote=zygote)
+        assert first.evaluate("a = 2").success
+        assert first.evaluate("a * 3").value == 6
+        assert not second.evaluate("a").success
+        assert first.pid != second.pid != zygote.process.pid  # type: ignore
+        result = first.evaluate("__import__('signal').signal(2, __import__('signal').SIG_IGN); sum(1 for i in iter(int, 1))")
+        assert result.terminated == "timeout"
+        assert first.restarts == 1
+        assert not first.evaluate("a").success
+        assert first.evaluate("1 + 1").value == 2
+        first.close()
+        second.close()
+        assert not first.alive and not second.alive
+        assert zygote.alive
+    assert not zygote.alive